@@ -0,0 +1,350 @@
+"""
+Benchmark cases for the planning, payload, logging and end-to-end creation paths
+"""
+import csv
+import itertools
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.harness import measure_seconds, measure_throughput, result
+from utils.campaign_builder import clear_payload_cache, create_adset_via_api
+from utils.config_loader import BASE_DIR, DICTIONARIES_DIR, registry
+from utils.logging import LOG_HEADER, log_campaign_creation
+from utils.naming import generate_campaign_name
+from utils.tier_utils import (
+    determine_tier_and_countries,
+    format_tier_for_naming,
+    get_all_countries_for_tier,
+    get_geo_cover_for_tier,
+    get_tier_for_countries
+)
+
+
+# Registered cases: name → (function, group)
+CASES = {}
+
+# Synthetic logs.csv sizes (the 1M file is skipped with --quick)
+LOG_SIZES = (10_000, 100_000, 1_000_000)
+QUICK_LOG_SIZES = (10_000, 100_000)
+
+# log_campaign_creation calls measured per file
+LOG_APPENDS = 200
+
+# Project written into the end-to-end fixture dictionaries
+BENCH_PROJECT = 'Bench'
+
+
+def benchmark(name, group):
+    """Register a benchmark case. The function takes a BenchContext and returns {name: result}."""
+    def decorator(func):
+        CASES[name] = (func, group)
+        return func
+    return decorator
+
+
+class BenchContext:
+    """Shared state of one suite run: seeded random data, scratch directory, options"""
+
+    def __init__(self, workdir, quick=False, seed=20251116, latency=0.0):
+        self.workdir = workdir
+        self.quick = quick
+        self.seed = seed
+        self.latency = latency
+        self.tiers_data = registry['tiers']
+        self.tiers = list(self.tiers_data)
+
+    def random(self):
+        # A fresh generator per case: cases do not depend on each other's draws
+        return random.Random(self.seed)
+
+    def tier_countries(self, tier):
+        return get_all_countries_for_tier(tier)
+
+
+def _naming_params(ctx, count=512):
+    rnd = ctx.random()
+    params = []
+    for _ in range(count):
+        tier = rnd.choice(ctx.tiers)
+        countries = ctx.tier_countries(tier)
+        naming_countries = rnd.sample(countries, min(len(countries), rnd.randint(0, 4))) if countries else []
+        params.append({
+            'os': rnd.choice(['AND', 'IOS']),
+            'tier': format_tier_for_naming(tier),
+            'naming_countries': naming_countries,
+            'gender': rnd.choice(['M', 'F', 'MF']),
+            'age': rnd.choice(['18-65+', '21-65+', '25-45']),
+            'opt_model': rnd.choice(['CPA', 'CPI', 'tROAS']),
+            'event': rnd.choice([None, '4_sessions', '40_ads']),
+            'date': '16112025',
+            'autor': 'KH',
+            'campaign_type': rnd.choice(['CBO', 'noCBO']),
+            'bid_strategy_short': rnd.choice(['bc', 'cc', 'lc', 'ai']),
+            'lang': 'ALL',
+            'extra': rnd.choice(['', 'account_1', 'account_2'])
+        })
+    return params
+
+
+@benchmark('naming.generate_campaign_name', 'naming')
+def bench_naming(ctx):
+    params = _naming_params(ctx)
+    return {'naming.generate_campaign_name': result(
+        measure_throughput(generate_campaign_name, params), 'ops/s', {'distinct_params': len(params)}
+    )}
+
+
+def _country_lists(ctx, count=512):
+    """Synthetic targeting lists: single-tier, mixed-tier and lists with unknown codes"""
+    rnd = ctx.random()
+    all_countries = sorted({code for tier in ctx.tiers for code in ctx.tier_countries(tier)})
+    lists = []
+    for i in range(count):
+        kind = i % 4
+        if kind in (0, 1):
+            countries = ctx.tier_countries(rnd.choice(ctx.tiers))
+            codes = rnd.sample(countries, min(len(countries), rnd.randint(1, 12))) if countries else []
+        elif kind == 2:
+            codes = rnd.sample(all_countries, rnd.randint(2, 40))
+        else:
+            codes = rnd.sample(all_countries, rnd.randint(1, 6)) + ['XX', 'ZZ']
+        lists.append(codes)
+    return lists
+
+
+@benchmark('tiers.determine_tier_and_countries', 'tiers')
+def bench_determine_tier(ctx):
+    lists = _country_lists(ctx)
+    return {'tiers.determine_tier_and_countries': result(
+        measure_throughput(determine_tier_and_countries, lists), 'ops/s', {'lists': len(lists)}
+    )}
+
+
+@benchmark('tiers.get_tier_for_countries', 'tiers')
+def bench_tier_for_countries(ctx):
+    lists = _country_lists(ctx)
+    return {'tiers.get_tier_for_countries': result(
+        measure_throughput(get_tier_for_countries, lists), 'ops/s', {'lists': len(lists)}
+    )}
+
+
+class StubResponse:
+    status_code = 200
+
+    def __init__(self, object_id):
+        self._object_id = object_id
+
+    def json(self):
+        return {'id': self._object_id}
+
+
+class StubClient:
+    """Transport stub: returns an ID without any network I/O"""
+
+    api_config = {'base_url': 'http://stub', 'api_version': 'v23.0', 'access_token': 'stub'}
+
+    def __init__(self):
+        self._ids = itertools.count(1)
+
+    def post(self, path, **kwargs):
+        return StubResponse(str(next(self._ids)))
+
+
+def _adset_params(ctx, count=256):
+    """Ad set parameters of a matrix sweep: every tier x genders x ages x bids"""
+    rnd = ctx.random()
+    geo = {tier: get_geo_cover_for_tier(tier) for tier in ctx.tiers}
+    params = []
+    for _ in range(count):
+        tier = rnd.choice(ctx.tiers)
+        cover = geo[tier]
+        params.append({
+            'daily_budget': rnd.choice([10.0, 25.0, 50.0]),
+            'optimization_goal': 'APP_INSTALLS',
+            'bid_strategy': 'LOWEST_COST_WITH_BID_CAP',
+            'bid_amount': rnd.choice([0.2, 0.3, 0.4]),
+            'custom_event_type': None,
+            'custom_event_str': None,
+            'object_store_url': 'https://play.google.com/store/apps/details?id=com.example',
+            'application_id': '1234567890',
+            'targeting_countries': ctx.tier_countries(tier),
+            'country_group_keys': cover.country_groups or None,
+            'extra_countries': cover.countries if cover.country_groups else None,
+            'excluded_countries': cover.excluded_countries or None,
+            'age_min': rnd.choice([18, 21, 25]),
+            'age_max': 65,
+            'genders': rnd.choice([[1], [2], [1, 2]]),
+            'user_os': 'android',
+            'locales': rnd.choice([[], [6], [6, 24]])
+        })
+    return params
+
+
+@benchmark('payload.create_adset_via_api', 'payload')
+def bench_adset_payload(ctx):
+    client = StubClient()
+    params = _adset_params(ctx)
+
+    def create(adset_params):
+        return create_adset_via_api('123', '456', 'AND_Latam_M_18-65+_CPI', adset_params,
+                                    use_targeting_spec=True, client=client)
+
+    def create_cold(adset_params):
+        clear_payload_cache()
+        return create(adset_params)
+
+    clear_payload_cache()
+    warm = measure_throughput(create, params)
+    cold = measure_throughput(create_cold, params)
+    clear_payload_cache()
+    return {
+        'payload.create_adset_via_api': result(warm, 'ops/s', {'distinct_params': len(params)}),
+        'payload.create_adset_via_api.cold_cache': result(cold, 'ops/s', {'distinct_params': len(params)})
+    }
+
+
+def _write_synthetic_log(ctx, path, rows):
+    rnd = ctx.random()
+    names = [generate_campaign_name(params) for params in _naming_params(ctx, 1024)]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(LOG_HEADER)
+        campaign_id = 120000000000000000
+        for i in range(rows):
+            writer.writerow([
+                names[i % len(names)],
+                campaign_id + 2 * i,
+                campaign_id + 2 * i + 1,
+                f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} 12:00:00"
+            ])
+
+
+@benchmark('logging.log_campaign_creation', 'logging')
+def bench_log(ctx):
+    results = {}
+    for rows in (QUICK_LOG_SIZES if ctx.quick else LOG_SIZES):
+        path = os.path.join(ctx.workdir, f"logs_{rows}.csv")
+        _write_synthetic_log(ctx, path, rows)
+
+        counter = itertools.count()
+
+        def append(_):
+            n = next(counter)
+            log_campaign_creation(f"AND_Latam_M_18-65+_CPI_16112025_KH_noCBO_bc_ALL_{n}", n, n, logs_file=path)
+
+        rate = measure_throughput(append, range(LOG_APPENDS), repeat=3, min_time=0.1)
+        results[f"logging.log_campaign_creation.{rows // 1000}k_rows"] = result(
+            rate, 'ops/s', {'rows': rows, 'appends_per_round': LOG_APPENDS}
+        )
+        os.remove(path)
+    return results
+
+
+def prepare_dictionaries(directory):
+    """
+    Copy of the dictionaries with a single-valued benchmark project
+    (the first project, list values reduced to their first element)
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(DICTIONARIES_DIR):
+        if name.endswith('.json') and name not in ('projects.json', 'api_config.json'):
+            with open(os.path.join(DICTIONARIES_DIR, name), 'rb') as src:
+                with open(os.path.join(directory, name), 'wb') as dst:
+                    dst.write(src.read())
+
+    projects = registry['projects']
+    source = next(iter(projects.values()))
+    project = {
+        key: value if key == 'account_names' or not isinstance(value, list) else value[0]
+        for key, value in source.items()
+    }
+    with open(os.path.join(directory, 'projects.json'), 'w', encoding='utf-8') as f:
+        json.dump({BENCH_PROJECT: project}, f, ensure_ascii=False, indent=2)
+    return directory
+
+
+# Runs the CLI against fixture dictionaries
+_E2E_BOOTSTRAP = """
+import json, sys
+config = json.loads(sys.argv[1])
+sys.path.insert(0, config['root'])
+from utils import config_loader
+config_loader.registry.directory = config['dictionaries']
+import create_campaign_universal as cli
+sys.argv = ['create_campaign_universal.py'] + config['args']
+cli.main()
+"""
+
+
+def _run_cli(ctx, args):
+    config = {
+        'root': BASE_DIR,
+        'dictionaries': os.path.join(ctx.workdir, 'dictionaries'),
+        'args': args
+    }
+    completed = subprocess.run(
+        [sys.executable, '-c', _E2E_BOOTSTRAP, json.dumps(config)],
+        cwd=ctx.workdir,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"CLI run failed ({completed.returncode}):\n{completed.stdout[-2000:]}")
+    return completed.stdout
+
+
+@benchmark('e2e.all_tiers', 'e2e')
+def bench_e2e(ctx):
+    from utils.mock_graph_server import MockGraphServer, MockGraphState
+
+    prepare_dictionaries(os.path.join(ctx.workdir, 'dictionaries'))
+    tiers = len(ctx.tiers)
+    results = {}
+
+    with MockGraphServer(MockGraphState(latency=ctx.latency, seed=ctx.seed)).start() as server:
+        for label, extra in (('concurrent', ['--concurrency', '8']), ('batch', ['--batch'])):
+            logs_file = os.path.join(ctx.workdir, f"e2e_{label}.csv")
+            args = [
+                '--project', BENCH_PROJECT, '--all-tiers', '--gender', 'M', '--age', '18-65+',
+                '--budget', '10', '--bid', '0.3', '--yes',
+                '--api-base', server.base_url,
+                '--logs-file', logs_file,
+                '--journal', os.path.join(ctx.workdir, f"e2e_{label}.jsonl")
+            ] + extra
+
+            def run():
+                if os.path.exists(logs_file):
+                    os.remove(logs_file)
+                _run_cli(ctx, args)
+                with open(logs_file, 'r', encoding='utf-8') as f:
+                    created = sum(1 for _ in f) - 1
+                if created != tiers:
+                    raise RuntimeError(f"e2e {label}: expected {tiers} campaigns in the log, got {created}")
+
+            # Warm-up run (imports, OS caches); it is not measured
+            run()
+            results[f"e2e.all_tiers.{label}"] = result(
+                measure_seconds(run, repeat=1 if ctx.quick else 3),
+                's',
+                {'campaigns': tiers, 'mock_latency': ctx.latency, 'mode': label}
+            )
+    return results
+
+
+def run_cases(names=None, quick=False, latency=0.0, seed=20251116, progress=None):
+    """Run the selected cases (all by default) in a scratch directory; returns {name: result}"""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='campaign-bench-') as workdir:
+        ctx = BenchContext(workdir, quick=quick, seed=seed, latency=latency)
+        for name, (func, group) in CASES.items():
+            if names and name not in names and group not in names:
+                continue
+            if progress:
+                progress(name)
+            results.update(func(ctx))
+    return results
@@ -0,0 +1,164 @@
+"""
+Benchmark harness: timing loops, machine calibration, JSON baselines and comparison
+"""
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARKS_DIR, 'baseline.json')
+
+RESULTS_VERSION = 1
+
+# Allowed slowdown against the baseline before a benchmark counts as a regression
+DEFAULT_TOLERANCE = 0.25
+
+
+def measure_throughput(func, items, repeat=5, min_time=0.2):
+    """
+    Operations per second of func(item) over items (best of `repeat` rounds).
+    Each round loops over items as many times as needed to run for at least min_time.
+    """
+    items = list(items)
+    # Warm-up round (imports, caches, first-call costs)
+    for item in items:
+        func(item)
+
+    best = None
+    for _ in range(repeat):
+        ops = 0
+        started = time.perf_counter()
+        while True:
+            for item in items:
+                func(item)
+            ops += len(items)
+            elapsed = time.perf_counter() - started
+            if elapsed >= min_time:
+                break
+        rate = ops / elapsed
+        best = rate if best is None else max(best, rate)
+    return best
+
+
+def measure_seconds(func, repeat=3):
+    """Best wall time of func() in seconds"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _calibration_work(n):
+    # Mix of the operations the hot paths use: dict lookups, string formatting, list building
+    table = {f"K{i}": i for i in range(64)}
+    out = []
+    for i in range(n):
+        key = f"K{i & 63}"
+        out.append(f"{key}_{table[key]}")
+    return len(out)
+
+
+def calibrate():
+    """
+    Machine speed (calibration loop operations per second).
+    Results are divided by it, so a baseline recorded on another machine stays comparable.
+    """
+    return measure_throughput(_calibration_work, [2000], repeat=5, min_time=0.2) * 2000
+
+
+def result(value, unit, params=None):
+    """One benchmark result: unit 'ops/s' (higher is better) or 's' (lower is better)"""
+    return {
+        'value': value,
+        'unit': unit,
+        'better': 'higher' if unit == 'ops/s' else 'lower',
+        'params': params or {}
+    }
+
+
+def build_report(results, calibration, quick=False):
+    return {
+        'version': RESULTS_VERSION,
+        'created_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'environment': {
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'executable': sys.executable,
+            'quick': quick
+        },
+        'calibration': calibration,
+        'results': results
+    }
+
+
+def save_report(report, path):
+    """Write a report atomically"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    os.replace(temp_path, path)
+
+
+def load_report(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    if report.get('version') != RESULTS_VERSION:
+        raise ValueError(f"Unsupported benchmark report version in {path}: {report.get('version')}")
+    return report
+
+
+def _normalized(entry, calibration):
+    """Result in machine-independent units (relative to the calibration loop)"""
+    if entry['better'] == 'higher':
+        return entry['value'] / calibration
+    return entry['value'] * calibration
+
+
+def compare_reports(current, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare a report with a baseline.
+    Returns rows (name, baseline value, current value, change, status), where change is
+    the calibration-normalized speedup (+) or slowdown (-) and status is
+    ok / regression / improved / new / missing.
+    """
+    rows = []
+    names = list(current['results']) + [name for name in baseline['results'] if name not in current['results']]
+    for name in names:
+        now = current['results'].get(name)
+        before = baseline['results'].get(name)
+        if now is None or before is None:
+            rows.append((name, before and before['value'], now and now['value'], None,
+                         'missing' if now is None else 'new'))
+            continue
+
+        ratio = _normalized(now, current['calibration']) / _normalized(before, baseline['calibration'])
+        # Speedup > 0, slowdown < 0 whatever the unit
+        change = ratio - 1 if now['better'] == 'higher' else 1 / ratio - 1
+        if change < -tolerance:
+            status = 'regression'
+        elif change > tolerance:
+            status = 'improved'
+        else:
+            status = 'ok'
+        rows.append((name, before['value'], now['value'], change, status))
+    return rows
+
+
+def format_value(value, unit):
+    if value is None:
+        return '-'
+    if unit == 'ops/s':
+        return f"{value:,.0f} ops/s"
+    return f"{value * 1000:,.1f} ms"
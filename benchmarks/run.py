@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for campaign planning, payload building, logging and end-to-end creation
+Results are saved as JSON; compared against a baseline, a slowdown beyond the tolerance fails the run
+"""
+import argparse
+import os
+import sys
+
+# Run as "python -m benchmarks.run" or "python benchmarks/run.py" from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.cases import CASES, run_cases
+from benchmarks.harness import (
+    DEFAULT_BASELINE,
+    DEFAULT_TOLERANCE,
+    build_report,
+    calibrate,
+    compare_reports,
+    format_value,
+    load_report,
+    save_report
+)
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    groups = sorted({group for _, group in CASES.values()})
+    parser = argparse.ArgumentParser(
+        description='Run the benchmark suite',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Cases: {', '.join(CASES)}
+Groups: {', '.join(groups)}
+
+Usage examples:
+  # Run everything and compare with benchmarks/baseline.json
+  python -m benchmarks.run --compare
+
+  # Quick run (no 1M-row log file, single e2e round)
+  python -m benchmarks.run --quick --only naming,tiers,payload
+
+  # Record a new baseline
+  python -m benchmarks.run --save-baseline
+        """
+    )
+    parser.add_argument('--only', help='Comma-separated case names or groups to run')
+    parser.add_argument('--quick', action='store_true', help='Smaller data sets and fewer rounds')
+    parser.add_argument('--out', metavar='FILE', help='Write results as JSON')
+    parser.add_argument('--compare', metavar='BASELINE', nargs='?', const=DEFAULT_BASELINE,
+                       help=f'Compare with a baseline report (default {os.path.relpath(DEFAULT_BASELINE)}); '
+                            'exits with 1 on regressions')
+    parser.add_argument('--save-baseline', metavar='FILE', nargs='?', const=DEFAULT_BASELINE,
+                       help=f'Save results as the baseline (default {os.path.relpath(DEFAULT_BASELINE)})')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                       help=f'Allowed slowdown before a regression is reported (default {DEFAULT_TOLERANCE})')
+    parser.add_argument('--latency', type=float, default=0.0,
+                       help='Mock Graph API latency for the e2e cases, seconds (default 0)')
+    parser.add_argument('--seed', type=int, default=20251116, help='Seed of the synthetic data')
+
+    args = parser.parse_args()
+
+    args.only = [name.strip() for name in args.only.split(',') if name.strip()] if args.only else None
+    if args.only:
+        unknown = [name for name in args.only if name not in CASES and name not in groups]
+        if unknown:
+            parser.error(f"unknown cases or groups: {', '.join(unknown)}")
+    return args
+
+
+def print_results(report):
+    width = max((len(name) for name in report['results']), default=10)
+    print(f"\n{'Benchmark':<{width}}  {'Result':>18}")
+    print("-" * (width + 20))
+    for name, entry in report['results'].items():
+        print(f"{name:<{width}}  {format_value(entry['value'], entry['unit']):>18}")
+    print(f"\nCalibration: {report['calibration']:,.0f} ops/s (Python {report['environment']['python']})")
+
+
+def print_comparison(rows, baseline_path, tolerance):
+    print(f"\nCompared with {baseline_path} (tolerance {tolerance:.0%}, normalized by calibration):")
+    width = max((len(row[0]) for row in rows), default=10)
+    for name, before, now, change, status in rows:
+        change_str = f"{change:+.1%}" if change is not None else '-'
+        mark = {'regression': '✗', 'improved': '↑', 'ok': '✓'}.get(status, '?')
+        print(f"  {mark} {name:<{width}}  {change_str:>8}  {status}")
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+
+    baseline = None
+    if args.compare:
+        try:
+            baseline = load_report(args.compare)
+        except (OSError, ValueError) as e:
+            print(f"Error: cannot read baseline: {e}")
+            sys.exit(1)
+
+    print("Calibrating...")
+    calibration = calibrate()
+    results = run_cases(
+        args.only,
+        quick=args.quick,
+        latency=args.latency,
+        seed=args.seed,
+        progress=lambda name: print(f"Running {name}...")
+    )
+    report = build_report(results, calibration, quick=args.quick)
+    print_results(report)
+
+    if args.out:
+        save_report(report, args.out)
+        print(f"\nResults: {args.out}")
+    if args.save_baseline:
+        save_report(report, args.save_baseline)
+        print(f"\nBaseline saved: {args.save_baseline}")
+
+    if baseline is not None:
+        rows = compare_reports(report, baseline, args.tolerance)
+        if args.only:
+            # Cases that were not selected are not missing
+            rows = [row for row in rows if row[4] != 'missing']
+        print_comparison(rows, args.compare, args.tolerance)
+        regressions = [row[0] for row in rows if row[4] == 'regression']
+        if regressions:
+            print(f"\n✗ {len(regressions)} regression(s): {', '.join(regressions)}")
+            sys.exit(1)
+        print("\n✓ No regressions")
+
+
+if __name__ == '__main__':
+    main()
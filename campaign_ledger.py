@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Campaign ledger tool: migrate logs.csv into the SQLite ledger, query it
+by name, IDs, creation time or any parsed naming field, and reconcile it
+against the campaigns and ad sets that actually exist in the ad accounts
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from utils.config_loader import registry
+from utils.ledger import FILTER_COLUMNS, LEDGER_COLUMNS, get_ledger
+from utils.logging import DEFAULT_LEDGER_PATH
+
+
+# Columns printed by "query" unless --columns is given
+DEFAULT_QUERY_COLUMNS = ['created_at', 'campaign_name', 'campaign_id', 'adset_id', 'account_id']
+
+# Findings of each type printed by "reconcile" (all of them go to --report)
+RECONCILE_PRINT_LIMIT = 20
+
+
+def parse_where(values, parser):
+    """FIELD=VALUE[,VALUE...] filters → {field: [values]}"""
+    where = {}
+    for item in values or []:
+        field, sep, value = item.partition('=')
+        field = field.strip()
+        if not sep or not field:
+            parser.error(f"--where expects FIELD=VALUE, got '{item}'")
+        if field not in FILTER_COLUMNS:
+            parser.error(f"unknown field '{field}' (choose from {', '.join(FILTER_COLUMNS)})")
+        where.setdefault(field, []).extend(part.strip() for part in value.split(',') if part.strip())
+    return where
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Migrate logs.csv into the SQLite campaign ledger, query it and reconcile it with the ad accounts',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Filter fields: {', '.join(FILTER_COLUMNS)}
+
+Usage examples:
+  # One-shot migration (safe to repeat: campaigns already in the ledger are skipped)
+  python campaign_ledger.py migrate --logs-file logs.csv
+
+  # Latam CPA campaigns created in March, as CSV
+  python campaign_ledger.py query --where tier=Latam --where opt_model=CPA --since 2025-03-01 --until 2025-03-31 --format csv
+
+  # Look up a campaign by ad set ID, with its spec
+  python campaign_ledger.py query --adset-id 120210000000000 --format json
+
+  # Totals per account and tier
+  python campaign_ledger.py stats
+
+  # Compare the ledger with every account in accounts.json, full list of findings as JSONL
+  python campaign_ledger.py reconcile --report reconcile.jsonl
+
+  # Only objects changed since the previous reconcile of account_1
+  python campaign_ledger.py reconcile --account account_1 --incremental
+        """
+    )
+    parser.add_argument('--ledger', metavar='PATH', default=DEFAULT_LEDGER_PATH,
+                       help=f'Ledger file (default {DEFAULT_LEDGER_PATH})')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    migrate = commands.add_parser('migrate', help='Copy logs.csv entries into the ledger')
+    migrate.add_argument('--logs-file', default='logs.csv', help='CSV log to migrate (default logs.csv)')
+
+    query = commands.add_parser('query', help='Find campaigns in the ledger')
+    query.add_argument('--name', action='append', help='Exact campaign name (repeatable)')
+    query.add_argument('--campaign-id', action='append', help='Campaign ID (repeatable)')
+    query.add_argument('--adset-id', action='append', help='Ad set ID (repeatable)')
+    query.add_argument('--account', action='append', help='Ad account ID (repeatable)')
+    query.add_argument('--where', action='append', metavar='FIELD=VALUE',
+                      help='Naming field filter, comma-separated values mean "any of" (repeatable)')
+    query.add_argument('--since', help='Created at or after (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)')
+    query.add_argument('--until', help='Created before (a date alone includes the whole day)')
+    query.add_argument('--limit', type=int, help='Max rows')
+    query.add_argument('--newest-first', action='store_true', help='Newest campaigns first')
+    query.add_argument('--format', choices=['table', 'csv', 'json'], default='table',
+                      help='Output format (default table; json is one object per line, with the spec)')
+    query.add_argument('--columns', help=f"Comma-separated columns (default {','.join(DEFAULT_QUERY_COLUMNS)})")
+
+    commands.add_parser('stats', help='Totals per source, account and tier')
+
+    reconcile = commands.add_parser('reconcile', help='Diff the ledger against live campaigns and ad sets')
+    reconcile.add_argument('--account', action='append',
+                          help='Account name from accounts.json (repeatable, default: all accounts)')
+    reconcile.add_argument('--incremental', action='store_true',
+                          help='Only objects updated since the previous reconcile of each account')
+    reconcile.add_argument('--report', metavar='FILE', help='Write every finding as JSONL')
+    reconcile.add_argument('--print-limit', type=int, default=RECONCILE_PRINT_LIMIT,
+                          help=f'Findings printed per type (default {RECONCILE_PRINT_LIMIT})')
+    reconcile.add_argument('--page-size', type=int, help='Objects per Graph API page (default: the largest)')
+    reconcile.add_argument('--api-base', metavar='URL',
+                          help='Override the Graph API base URL (e.g. a standalone mock server)')
+
+    args = parser.parse_args()
+
+    if args.command == 'query':
+        args.where = parse_where(args.where, parser)
+        for field, values in [
+            ('campaign_name', args.name),
+            ('campaign_id', args.campaign_id),
+            ('adset_id', args.adset_id),
+            ('account_id', args.account)
+        ]:
+            if values:
+                args.where.setdefault(field, []).extend(values)
+        args.columns = [column.strip() for column in args.columns.split(',')] if args.columns else DEFAULT_QUERY_COLUMNS
+        unknown = [column for column in args.columns if column not in LEDGER_COLUMNS]
+        if unknown:
+            parser.error(f"unknown columns: {', '.join(unknown)}")
+
+    return args
+
+
+def run_migrate(ledger, args):
+    if not os.path.exists(args.logs_file):
+        print(f"Error: {args.logs_file} not found")
+        sys.exit(1)
+    print(f"Migrating {args.logs_file} → {ledger.path}...")
+    read, added = ledger.migrate_csv(args.logs_file)
+    print(f"✓ {read} rows read, {added} added, {read - added} already in the ledger")
+    print(f"Ledger: {ledger.count()} campaigns")
+
+
+def run_query(ledger, args):
+    rows = ledger.query(
+        where=args.where,
+        since=args.since,
+        until=args.until,
+        limit=args.limit,
+        newest_first=args.newest_first
+    )
+
+    if args.format == 'json':
+        for row in rows:
+            row.pop('id', None)
+            print(json.dumps(row, ensure_ascii=False))
+        return
+
+    if args.format == 'csv':
+        writer = csv.writer(sys.stdout)
+        writer.writerow(args.columns)
+        for row in rows:
+            writer.writerow([row[column] if row[column] is not None else '' for column in args.columns])
+        return
+
+    count = 0
+    for row in rows:
+        print("  ".join(str(row[column]) if row[column] is not None else '-' for column in args.columns))
+        count += 1
+    print(f"\n{count} campaign(s)")
+
+
+def run_stats(ledger):
+    stats = ledger.stats()
+    print(f"Ledger: {stats['path']}")
+    print(f"Campaigns: {stats['campaigns']}")
+    if not stats['campaigns']:
+        return
+    print(f"Period: {stats['first_created_at']} — {stats['last_created_at']}")
+    if stats['unparsed_names']:
+        print(f"Names not matching the naming format: {stats['unparsed_names']}")
+    for title, key in [('Sources', 'sources'), ('Accounts', 'accounts'), ('Tiers', 'tiers')]:
+        print(f"\n{title}:")
+        for value, count in stats[key].items():
+            print(f"  {value}: {count}")
+
+
+def create_api_client(args):
+    """Graph API client for reconcile and bulk updates (--api-base points it at a mock server)"""
+    from utils.http_client import GraphClient
+
+    if args.api_base:
+        # api_config.json is not needed for a mock server
+        api_config = dict(registry.get('api_config') or {})
+        api_config['base_url'] = args.api_base.rstrip('/')
+        api_config.setdefault('api_version', 'v23.0')
+        api_config.setdefault('access_token', 'mock-token')
+        return GraphClient(api_config)
+    return GraphClient(registry['api_config'])
+
+
+def run_reconcile(ledger, args):
+    from utils.reconcile import FINDING_TYPES, LIST_PAGE_LIMIT, Reconciler
+
+    all_accounts = registry['accounts']
+    names = args.account or list(all_accounts)
+    unknown = [name for name in names if name not in all_accounts]
+    if unknown:
+        print(f"Error: unknown accounts: {', '.join(unknown)} (see accounts.json)")
+        sys.exit(1)
+    accounts = {name: str(all_accounts[name]) for name in names}
+
+    reconciler = Reconciler(
+        ledger,
+        create_api_client(args),
+        incremental=args.incremental,
+        page_size=args.page_size or LIST_PAGE_LIMIT
+    )
+    mode = "incremental" if args.incremental else "full"
+    print(f"Reconciling {ledger.path} with {len(accounts)} account(s) ({mode})...")
+
+    report = open(args.report, 'w', encoding='utf-8') if args.report else None
+    try:
+        # Entries migrated from logs.csv have no account: missing only if no account has them
+        findings = reconciler.run(accounts, include_unattributed=not args.account)
+        for finding in findings:
+            if report:
+                report.write(json.dumps(finding, ensure_ascii=False) + '\n')
+            if reconciler.counts[finding['type']] <= args.print_limit:
+                detail = f" ({finding['detail']})" if finding['detail'] else ''
+                print(f"  ✗ {finding['type']}: {finding['id']} {finding['name']}{detail}")
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        if report:
+            report.close()
+
+    print("\nListed:")
+    for name, account_id in accounts.items():
+        listed = reconciler.listed.get(account_id, {})
+        print(f"  {name} ({account_id}): {listed.get('campaign', 0)} campaigns, {listed.get('adset', 0)} ad sets")
+
+    found = {kind: count for kind, count in reconciler.counts.items() if count}
+    if not found:
+        print("\n✓ Ledger matches the accounts")
+        return
+    print("\nFindings:")
+    for kind, count in found.items():
+        print(f"  {kind}: {count} — {FINDING_TYPES[kind]}")
+    if report:
+        print(f"\nReport: {args.report}")
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+
+    if args.command != 'migrate' and not os.path.exists(args.ledger):
+        print(f"Error: ledger {args.ledger} not found (create it with: python campaign_ledger.py migrate)")
+        sys.exit(1)
+
+    ledger = get_ledger(args.ledger)
+    try:
+        if args.command == 'migrate':
+            run_migrate(ledger, args)
+        elif args.command == 'query':
+            run_query(ledger, args)
+        elif args.command == 'reconcile':
+            run_reconcile(ledger, args)
+        else:
+            run_stats(ledger)
+    except BrokenPipeError:
+        # Output piped into head / less that exited early
+        sys.stderr.close()
+    finally:
+        ledger.close()
+
+
+if __name__ == '__main__':
+    main()
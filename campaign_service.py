@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""
+Long-running campaign creation service
+Keeps dictionaries, pooled HTTP connections and rate-limit state warm and
+accepts campaign specs over a local HTTP/JSON API (TCP or Unix socket)
+"""
+import argparse
+import json
+import os
+import queue
+import signal
+import socketserver
+import sys
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from create_campaign_universal import (
+    BREAKER_COOLDOWN,
+    BREAKER_THRESHOLD,
+    DEAD_LETTER_FILE,
+    DRY_RUN_DEAD_LETTER_FILE,
+    DRY_RUN_LEDGER_FILE,
+    DRY_RUN_LOGS_FILE,
+    MATRIX_FIELDS,
+    build_job,
+    count_launch_combinations,
+    create_balancer,
+    create_campaign_pair,
+    create_client,
+    duplicate_guard,
+    iter_campaign_data,
+    iter_launch_combinations,
+    journal_spec,
+    record_failure,
+    resolve_dead_letter_file,
+    resolve_launch,
+    resolve_logs_file,
+    start_locale_refresh,
+    validate_matrix,
+    write_metrics
+)
+from utils.country_set import get_country_universe
+from utils.dead_letter import DeadLetterFile, error_type
+from utils.journal import RunJournal
+from utils.logging import DEFAULT_LEDGER_PATH
+from utils.metrics import metrics
+from utils.pipeline import ConcurrentPipeline, IDLE
+from utils.plan import normalize_plan_row
+from utils.tier_utils import get_tier_index
+
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8787
+
+# Largest accepted request body (bytes)
+MAX_REQUEST_BYTES = 10 * 1024 * 1024
+
+# Max campaigns a single POST /campaigns may expand into (matrix specs)
+MAX_JOBS_PER_REQUEST = 10000
+
+# Finished jobs kept for GET /jobs/<key> (the journal keeps everything)
+JOB_HISTORY_LIMIT = 10000
+
+# How often the worker checks the queue while jobs are in flight, seconds
+QUEUE_POLL_INTERVAL = 0.2
+
+JOB_STATES = ('queued', 'running', 'completed', 'failed')
+
+
+def default_service_journal_path(directory='journals', now=None):
+    """Journal path of a service session (journals/service_YYYYMMDD_HHMMSS.jsonl)"""
+    now = now or datetime.now()
+    return os.path.join(directory, f"service_{now.strftime('%Y%m%d_%H%M%S')}.jsonl")
+
+
+def normalize_spec(spec):
+    """
+    Map one JSON campaign spec (plan row keys) to launch parameters.
+    List values of matrix fields (os, gender, age, opt_model, bid, account) are kept
+    as lists, so one spec can describe a whole matrix. Raises ValueError.
+    """
+    if not isinstance(spec, dict):
+        raise ValueError("spec must be a JSON object")
+
+    row = dict(spec)
+    matrix = {}
+    for field in MATRIX_FIELDS:
+        if isinstance(row.get(field), list):
+            values = row.pop(field)
+            if not values:
+                raise ValueError(f"'{field}' must not be an empty list")
+            if field == 'bid':
+                try:
+                    values = [float(value) for value in values]
+                except (TypeError, ValueError):
+                    raise ValueError(f"Field 'bid' must be a number or a list of numbers, got {values!r}")
+            matrix[field] = values
+
+    raw = {key: value for key, value in normalize_plan_row(row).items() if value is not None}
+    raw.update(matrix)
+    if raw.get('countries'):
+        raw['tier'] = None
+    return raw
+
+
+def expand_spec(spec, defaults=None, balancer=None, ledger=None):
+    """
+    Validate a spec and expand it into (campaign data, objective, ad set defaults).
+    The whole spec is checked before anything is queued: one bad combination rejects it.
+    With a balancer, campaigns without an explicit account are spread over the project's accounts.
+    With a ledger, a spec with a campaign name already in it is rejected.
+    Raises ValueError.
+    """
+    raw = dict(defaults or {})
+    raw.update(normalize_spec(spec))
+
+    if count_launch_combinations(raw) > MAX_JOBS_PER_REQUEST:
+        raise ValueError(f"spec expands into more than {MAX_JOBS_PER_REQUEST} combinations")
+
+    expanded = []
+    try:
+        validate_matrix(raw)
+        for combination in iter_launch_combinations(raw):
+            launch = resolve_launch(combination)
+            for camp_data in iter_campaign_data(launch, balancer):
+                # Caught here instead of failing later in the queue
+                if not camp_data['countries'] and not camp_data['is_worldwide']:
+                    raise ValueError(f"no countries for tier '{camp_data['tier_raw']}'")
+                expanded.append((camp_data, launch['objective'], launch['adset_defaults']))
+                if len(expanded) > MAX_JOBS_PER_REQUEST:
+                    raise ValueError(f"spec expands into more than {MAX_JOBS_PER_REQUEST} campaigns")
+    except KeyError as e:
+        raise ValueError(f"unknown value {e}")
+
+    if ledger is not None:
+        existing = ledger.existing_names(camp_data['name'] for camp_data, _, _ in expanded)
+        if existing:
+            raise ValueError(f"already in the ledger: {', '.join(sorted(existing))}")
+    return expanded
+
+
+class CampaignService:
+    """
+    Work queue in front of one pooled Graph API client.
+    Jobs from every caller share the client's connection pool and usage-based
+    rate limiting, and run through a single ConcurrentPipeline.
+    """
+
+    def __init__(
+        self,
+        client,
+        journal,
+        concurrency=8,
+        account_concurrency=None,
+        logs_file='logs.csv',
+        balancer=None,
+        ledger=None,
+        dead_letters=None
+    ):
+        self.client = client
+        self.journal = journal
+        self.logs_file = logs_file
+        # Failed campaigns (replay with create_campaign_universal.py --replay)
+        self.dead_letters = dead_letters
+        self.balancer = balancer
+        # Journal for duplicate-name checks (None: no check)
+        self.ledger = ledger
+        self.pipeline = ConcurrentPipeline(
+            self._run_job,
+            concurrency=concurrency,
+            per_account_limit=account_concurrency,
+            account_key=lambda job: job['camp_data']['account_id'],
+            poll_interval=QUEUE_POLL_INTERVAL
+        )
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._counts = dict.fromkeys(JOB_STATES, 0)
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._worker = None
+        self.started_at = datetime.now()
+
+    def start(self):
+        """Start the background worker"""
+        self._worker = threading.Thread(target=self._work, name='campaign-worker', daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stop taking queued jobs and wait for in-flight ones. Returns the number left queued."""
+        self._stopping.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+        with self._lock:
+            return self._counts['queued']
+
+    def _iter_queue(self):
+        """Queued jobs for the pipeline; IDLE while the queue is empty"""
+        while not self._stopping.is_set():
+            try:
+                yield self._queue.get(timeout=QUEUE_POLL_INTERVAL)
+            except queue.Empty:
+                yield IDLE
+
+    def _work(self):
+        for _, job, result, error in self.pipeline.run(self._iter_queue()):
+            if error:
+                # create_campaign_pair reports API errors itself; this is a bug in the worker
+                result = {
+                    'campaign_id': job.get('campaign_id'),
+                    'adset_id': None,
+                    'error': f"Error creating campaign or ad set: {error}"
+                }
+                record_failure(job, result, error_type(error), self.journal, self.dead_letters)
+                self._finish(job['key'], result)
+
+    def _run_job(self, job):
+        self._set_state(job['key'], 'running')
+        result = create_campaign_pair(job, self.client, self.journal, self.logs_file, self.dead_letters)
+        self._finish(job['key'], result)
+        return result
+
+    def _set_state(self, key, state, **fields):
+        with self._lock:
+            record = self._jobs.get(key)
+            if record is None:
+                return None
+            self._counts[record['state']] -= 1
+            self._counts[state] += 1
+            record['state'] = state
+            record.update(fields)
+            return record
+
+    def _finish(self, key, result):
+        state = 'failed' if result['error'] else 'completed'
+        record = self._set_state(
+            key,
+            state,
+            campaign_id=result['campaign_id'],
+            adset_id=result['adset_id'],
+            error=result['error'],
+            finished_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        )
+        if record is not None:
+            mark = '✗' if result['error'] else '✓'
+            print(f"[{key}] {mark} {record['name']}" + (f": {result['error']}" if result['error'] else ''))
+        self._trim_history()
+
+    def _trim_history(self):
+        with self._lock:
+            while len(self._jobs) > JOB_HISTORY_LIMIT:
+                key, record = next(iter(self._jobs.items()))
+                if record['state'] not in ('completed', 'failed'):
+                    break
+                del self._jobs[key]
+
+    def submit(self, payload):
+        """
+        Validate campaign specs and queue their jobs.
+        Payload: one spec, or {"specs": [...], "defaults": {...}}.
+        Returns {"accepted": [...], "rejected": [...]}.
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("request body must be a JSON object")
+        if 'specs' in payload:
+            specs = payload['specs']
+            if not isinstance(specs, list):
+                raise ValueError("'specs' must be a list")
+            defaults = normalize_spec(payload.get('defaults') or {})
+        else:
+            specs = [payload]
+            defaults = {}
+        if self._stopping.is_set():
+            raise RuntimeError("service is shutting down")
+
+        accepted = []
+        rejected = []
+        for number, spec in enumerate(specs, 1):
+            try:
+                expanded = expand_spec(spec, defaults, self.balancer, self.ledger)
+            except ValueError as e:
+                rejected.append({'spec': number, 'error': str(e)})
+                continue
+
+            for camp_data, objective, adset_defaults in expanded:
+                job = build_job(camp_data, objective, adset_defaults)
+                job['key'] = self.journal.planned(journal_spec(job))
+                record = {
+                    'key': job['key'],
+                    'spec': number,
+                    'name': camp_data['name'],
+                    'account_id': camp_data['account_id'],
+                    'tier': camp_data['tier'],
+                    'state': 'queued',
+                    'campaign_id': None,
+                    'adset_id': None,
+                    'error': None,
+                    'submitted_at': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                    'finished_at': None
+                }
+                with self._lock:
+                    self._jobs[job['key']] = record
+                    self._counts['queued'] += 1
+                self._queue.put(job)
+                accepted.append({key: record[key] for key in ('key', 'spec', 'name', 'account_id', 'tier')})
+
+        return {'accepted': accepted, 'rejected': rejected}
+
+    def job(self, key):
+        """Status of a job or None"""
+        with self._lock:
+            record = self._jobs.get(key)
+            return dict(record) if record else None
+
+    def status(self):
+        """Queue depth, job counts and current rate-limit usage"""
+        with self._lock:
+            counts = dict(self._counts)
+        return {
+            'started_at': self.started_at.strftime("%Y-%m-%d %H:%M:%S"),
+            'journal': self.journal.path,
+            'logs_file': self.logs_file,
+            'dead_letters': {
+                'path': self.dead_letters.path,
+                'count': self.dead_letters.count,
+                'unfinished': self.dead_letters.unfinished
+            } if self.dead_letters else None,
+            'open_circuits': [
+                {'account_id': account_id, 'endpoint': endpoint, 'failures': failures}
+                for (account_id, endpoint), failures in self.client.breaker.open_circuits().items()
+            ],
+            'concurrency': self.pipeline.concurrency,
+            'account_concurrency': self.pipeline.per_account_limit,
+            'jobs': counts,
+            'usage': self.client.scheduler.snapshot(),
+            'accounts': self.balancer.assigned() if self.balancer else None,
+            'stopping': self._stopping.is_set()
+        }
+
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON API:
+        POST /campaigns  — queue campaign specs (202 with job keys)
+        GET  /jobs/<key> — job status
+        GET  /status     — queue and rate-limit state
+        GET  /metrics    — phase timings and Graph API metrics (Prometheus text format)
+        GET  /healthz    — liveness check
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send(self, status, payload):
+        raw = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _error(self, status, message):
+        self._send(status, {'error': message})
+
+    def do_GET(self):
+        path = urlparse(self.path).path.rstrip('/')
+
+        if path == '/healthz':
+            self._send(200, {'status': 'ok'})
+        elif path == '/status':
+            self._send(200, self.service.status())
+        elif path == '/metrics':
+            raw = metrics.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+        elif path.startswith('/jobs/'):
+            record = self.service.job(path[len('/jobs/'):])
+            if record is None:
+                self._error(404, "job not found")
+            else:
+                self._send(200, record)
+        else:
+            self._error(404, f"unknown endpoint {path or '/'}")
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip('/')
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True
+            self._error(413, f"request body exceeds {MAX_REQUEST_BYTES} bytes")
+            return
+        body = self.rfile.read(length)
+
+        if path != '/campaigns':
+            self._error(404, f"unknown endpoint {path or '/'}")
+            return
+
+        try:
+            payload = json.loads(body.decode('utf-8') or 'null')
+        except ValueError as e:
+            self._error(400, f"invalid JSON: {e}")
+            return
+
+        try:
+            result = self.service.submit(payload)
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        except RuntimeError as e:
+            self._error(503, str(e))
+            return
+
+        self._send(202 if result['accepted'] else 400, result)
+        if result['accepted']:
+            # New languages are looked up in the background, like a CLI run does at exit
+            start_locale_refresh(self.server.args, self.service.client)
+
+
+class ThreadingUnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server on a Unix domain socket"""
+    daemon_threads = True
+
+    def server_bind(self):
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        super().server_bind()
+        # BaseHTTPRequestHandler expects these attributes
+        self.server_name = 'localhost'
+        self.server_port = 0
+
+
+def create_server(args, service):
+    """HTTP server on --socket or --host/--port"""
+    if args.socket:
+        server = ThreadingUnixHTTPServer(args.socket, ServiceRequestHandler)
+        address = f"unix:{args.socket}"
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), ServiceRequestHandler)
+        server.daemon_threads = True
+        address = f"http://{server.server_address[0]}:{server.server_address[1]}"
+    server.service = service
+    server.args = args
+    return server, address
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Campaign creation service: one warm process for all campaign requests',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Usage examples:
+  # Serve on localhost:8787
+  python campaign_service.py --concurrency 8
+
+  # Serve on a Unix socket against the mock Graph API
+  python campaign_service.py --socket /tmp/campaigns.sock --dry-run
+
+  # Queue a campaign
+  curl -s localhost:8787/campaigns -d '{"project": "DuoChat", "tier": "Latam", "gender": "M", "age": "18-65+", "budget": 50, "bid": 0.3}'
+        """
+    )
+
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'Listen address (default {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Listen port (default {DEFAULT_PORT})')
+    parser.add_argument('--socket', metavar='PATH', help='Listen on a Unix socket instead of TCP')
+    parser.add_argument('--concurrency', type=int, default=8,
+                       help='Number of campaigns created in parallel (default 8)')
+    parser.add_argument('--account-concurrency', type=int,
+                       help='Max campaigns created in parallel per ad account (default: no extra limit)')
+    parser.add_argument('--journal', help='Journal path (default: journals/service_<timestamp>.jsonl)')
+    parser.add_argument('--shard-accounts', action='store_true',
+                       help="Spread campaigns without an explicit account across the project's accounts, "
+                            "weighted by each account's remaining rate limit")
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Send requests to a local mock Graph API server instead of Facebook')
+    parser.add_argument('--mock-latency', type=float, default=0.0,
+                       help='Mock server response latency in seconds (with --dry-run)')
+    parser.add_argument('--mock-error-rate', type=float, default=0.0,
+                       help='Share of transient mock server errors, 0..1 (with --dry-run)')
+    parser.add_argument('--api-base', metavar='URL',
+                       help='Override the Graph API base URL (e.g. a standalone mock server)')
+    parser.add_argument('--logs-file',
+                       help=f'Campaign log file (default logs.csv, {DRY_RUN_LOGS_FILE} with --dry-run); '
+                            '*.db / *.sqlite files are SQLite ledgers')
+    parser.add_argument('--ledger', metavar='PATH', nargs='?', const=True,
+                       help=f'Log to the SQLite ledger instead of logs.csv (default {DEFAULT_LEDGER_PATH}, '
+                            f'{DRY_RUN_LEDGER_FILE} with --dry-run); specs with names already in it are rejected')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                       help='Accept specs even if the ledger already has a campaign with the same name')
+    parser.add_argument('--dead-letter', metavar='FILE',
+                       help=f'Where failed campaigns are written with their spec, error and attempt count '
+                            f'(default {DEAD_LETTER_FILE}, {DRY_RUN_DEAD_LETTER_FILE} with --dry-run)')
+    parser.add_argument('--breaker-threshold', type=int, default=BREAKER_THRESHOLD,
+                       help=f'Consecutive Graph API failures of an account / endpoint before its requests '
+                            f'fail fast (default {BREAKER_THRESHOLD}, 0 disables)')
+    parser.add_argument('--breaker-cooldown', type=float, default=BREAKER_COOLDOWN,
+                       help=f'Seconds before a probe request is sent to an open circuit (default {BREAKER_COOLDOWN:g})')
+    parser.add_argument('--metrics-out', metavar='FILE', action='append',
+                       help='Also write metrics on shutdown: JSON, or Prometheus textfile format for *.prom (repeatable)')
+
+    args = parser.parse_args()
+
+    resolve_logs_file(parser, args)
+    resolve_dead_letter_file(args)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be >= 1")
+
+    return args
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+
+    # Always on in the service: served by GET /metrics
+    metrics.enable()
+
+    # Tier index and country bitsets are built before the first request;
+    # dictionaries stay in memory, a changed JSON is re-read on a later request
+    with metrics.timer('phase_seconds', phase='load_dictionaries'):
+        get_tier_index()
+        get_country_universe()
+    client = create_client(args)
+
+    journal = RunJournal(args.journal or default_service_journal_path())
+    dead_letters = DeadLetterFile(args.dead_letter)
+    service = CampaignService(
+        client,
+        journal,
+        concurrency=args.concurrency,
+        account_concurrency=args.account_concurrency,
+        logs_file=args.logs_file,
+        balancer=create_balancer(args, client),
+        ledger=duplicate_guard(args),
+        dead_letters=dead_letters
+    ).start()
+
+    try:
+        server, address = create_server(args, service)
+    except OSError as e:
+        print(f"Error: cannot listen: {e}")
+        sys.exit(1)
+
+    # SIGTERM stops the service like Ctrl+C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    print("=" * 80)
+    print(f"Campaign service listening on {address}")
+    print(f"Journal: {journal.path}")
+    print(f"Dead letters: {dead_letters.path} (replay with python create_campaign_universal.py --replay {dead_letters.path})")
+    print("=" * 80)
+
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+    print("\nStopping: waiting for campaigns in progress...")
+    left = service.stop()
+    journal.close()
+    dead_letters.close()
+    if args.metrics_out:
+        write_metrics(args.metrics_out)
+    if left:
+        print(f"{left} queued campaigns were not started (resume with "
+              f"python create_campaign_universal.py --resume {journal.path})")
+    print("Service stopped.")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,25 +4,98 @@ Universal script for creating Facebook campaigns via API
 Supports creating a single campaign or campaigns for all tiers
 """
 import argparse
+import atexit
 import os
 import sys
 from datetime import datetime
+from itertools import islice, product
 from utils.tier_utils import (
-    load_tiers, 
     get_all_countries_for_tier, 
     format_tier_for_naming,
     get_all_worldwide_countries,
-    get_country_groups_for_tier
+    get_geo_cover_for_tier,
+    filter_countries,
+    determine_tier_and_countries
 )
-from utils.logging import log_campaign_creation
+from utils.country_set import get_geo_cover
+from utils.logging import DEFAULT_LEDGER_PATH, log_campaign_creation, logged_names, CampaignLogWriter, is_ledger_path
 from utils.naming import generate_campaign_name
-from utils.campaign_builder import create_campaign_via_api, create_adset_via_api
-from utils.config_loader import load_json
+from utils.campaign_builder import (
+    GraphAPIError,
+    create_campaign_via_api,
+    create_adset_via_api,
+    create_campaigns_batch
+)
+from utils.circuit_breaker import CircuitBreaker, CircuitOpenError
+from utils.dead_letter import DeadLetterFile, error_type, load_dead_letters, pending_dead_letters
+from utils.config_loader import registry
+from utils.pipeline import ConcurrentPipeline
+from utils.journal import RunJournal, load_journal, pending_entries, default_journal_path
+from utils.plan import read_plan, normalize_plan_row
+from utils.locale_resolver import get_locale_resolver
+from utils.metrics import metrics
+from utils.sharding import AccountBalancer
+
+
+# Allowed values of launch parameters (CLI choices and plan validation)
+LAUNCH_CHOICES = {
+    'os': ['AND', 'IOS'],
+    'gender': ['M', 'F', 'MF'],
+    'opt_model': ['CPA', 'CPI', 'tROAS'],
+    'bid_strategy': ['Bid cap', 'Cost per result goal', 'Lower cost', 'Ad impression'],
+    'campaign_type': ['CBO', 'noCBO']
+}
+
+# Defaults for optional launch parameters
+LAUNCH_DEFAULTS = {
+    'os': 'AND',
+    'opt_model': 'CPA',
+    'bid_strategy': 'Bid cap',
+    'campaign_type': 'noCBO',
+    'autor': 'KH'
+}
+
+# Bid strategy mapping for naming
+BID_STRATEGY_SHORT = {
+    'Bid cap': 'bc',
+    'Cost per result goal': 'cc',
+    'Lower cost': 'lc',
+    'Ad impression': 'ai'
+}
+
+
+# Launch parameters that accept a comma-separated list (matrix mode)
+MATRIX_FIELDS = ['os', 'gender', 'age', 'opt_model', 'bid', 'account']
+
+# Campaigns listed in the preview before the rest is summarized
+MATRIX_PREVIEW_LIMIT = 20
+
+# Account shown in previewed namings with --shard-accounts: the account is picked at dispatch
+ACCOUNT_CHOSEN_AT_DISPATCH = '<account>'
+
+
+# Jobs collected from a stream before sending them as /batch requests
+BATCH_JOBS_PER_DISPATCH = 250
 
+# Seconds to wait for the background adlocale refresh at the end of a run
+LOCALE_REFRESH_WAIT = 30
 
-def get_locale_ids(lang_code, locales_data):
-    """Map language codes to Facebook locale IDs"""
-    return locales_data.get(lang_code, [])
+# Logs file used by --dry-run (mock IDs never reach the real logs.csv)
+DRY_RUN_LOGS_FILE = 'logs.dry-run.csv'
+DRY_RUN_LEDGER_FILE = 'ledger.dry-run.db'
+
+# Campaigns that could not be created (resubmitted with --replay)
+DEAD_LETTER_FILE = 'dead_letters.jsonl'
+DRY_RUN_DEAD_LETTER_FILE = 'dead_letters.dry-run.jsonl'
+
+# Consecutive Graph API failures of an account / endpoint before its circuit opens,
+# and seconds before a probe request is let through
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 30.0
+
+# Errors of a single creation: the job is dead-lettered and the run goes on
+# (requests.RequestException is an OSError)
+CREATION_ERRORS = (GraphAPIError, CircuitOpenError, OSError, ValueError, KeyError)
 
 
 def get_restricted_countries():
@@ -30,6 +103,22 @@ def get_restricted_countries():
     return ["CU", "IR", "RU", "SD", "UK", "IC", "JB"]
 
 
+def parse_list(value):
+    """Comma-separated CLI value → list of strings (matrix mode)"""
+    items = [item.strip() for item in value.split(',') if item.strip()]
+    if not items:
+        raise argparse.ArgumentTypeError("expected at least one value")
+    return items
+
+
+def parse_float_list(value):
+    """Comma-separated CLI value → list of floats (matrix mode)"""
+    try:
+        return [float(item) for item in parse_list(value)]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected numbers, got '{value}'")
+
+
 def parse_arguments():
     """Parse command line arguments"""
     parser = argparse.ArgumentParser(
@@ -45,58 +134,185 @@ Usage examples:
   
   # Create WW campaign for any project
   python create_campaign_universal.py --project Likerro --tier WW --gender MF --age 21-65+ --budget 25 --opt-model tROAS --bid-strategy "Lower cost"
+  
+  # Matrix: every combination of genders, ages and accounts for all tiers
+  python create_campaign_universal.py --project DuoChat --all-tiers --gender M,F --age 18-65+,25-65+ --account "Acc 1,Acc 2" --budget 50 --bid 0.30,0.40
+  
+  # Spread all tiers across the project's accounts by rate-limit headroom
+  python create_campaign_universal.py --project DuoChat --all-tiers --gender M --age 18-65+ --budget 50 --bid 0.30 --shard-accounts
+  
+  # Create campaigns from a plan file without a confirmation prompt
+  python create_campaign_universal.py --plan plan.csv --yes --concurrency 8
+  
+  # Resume an interrupted run
+  python create_campaign_universal.py --resume journals/run_20251116_120000.jsonl
+  
+  # Resubmit campaigns that failed (dead_letters.jsonl)
+  python create_campaign_universal.py --replay --yes
+  
+  # Dry run against the bundled mock Graph API (no token, no live accounts)
+  python create_campaign_universal.py --plan plan.csv --yes --dry-run --concurrency 32
         """
     )
     
-    # Required parameters
-    parser.add_argument('--project', required=True, help='Project name (DuoChat, Likerro, Pheromance)')
-    parser.add_argument('--os', choices=['AND', 'IOS'], default='AND', help='Operating system')
-    parser.add_argument('--gender', choices=['M', 'F', 'MF'], required=True, help='Gender')
-    parser.add_argument('--age', required=True, help='Age (e.g., 18-65+, 21-65)')
-    parser.add_argument('--budget', type=float, required=True, help='Daily budget')
+    # Required parameters (not needed with --resume; with --plan they are per-row defaults)
+    parser.add_argument('--project', help='Project name (DuoChat, Likerro, Pheromance)')
+    # --os, --gender, --age, --opt-model, --bid and --account accept comma-separated lists:
+    # a campaign is created for every combination (matrix mode)
+    parser.add_argument('--os', type=parse_list,
+                       help=f"Operating system: {', '.join(LAUNCH_CHOICES['os'])} (default {LAUNCH_DEFAULTS['os']})")
+    parser.add_argument('--gender', type=parse_list, help=f"Gender: {', '.join(LAUNCH_CHOICES['gender'])}")
+    parser.add_argument('--age', type=parse_list, help='Age (e.g., 18-65+, 21-65)')
+    parser.add_argument('--budget', type=float, help='Daily budget')
     
     # Tier (either specific or --all-tiers)
-    tier_group = parser.add_mutually_exclusive_group(required=True)
+    tier_group = parser.add_mutually_exclusive_group()
     tier_group.add_argument('--tier', help='Specific tier (Tier-1, Latam, WW, etc.)')
     tier_group.add_argument('--all-tiers', action='store_true', help='Create campaigns for all tiers')
     
     # Optimization
-    parser.add_argument('--opt-model', choices=['CPA', 'CPI', 'tROAS'], default='CPA', help='Optimization model')
+    parser.add_argument('--opt-model', type=parse_list,
+                       help=f"Optimization model: {', '.join(LAUNCH_CHOICES['opt_model'])} "
+                            f"(default {LAUNCH_DEFAULTS['opt_model']})")
     parser.add_argument('--event', help='Event (only for CPA, e.g.: "4 sessions", "40 ads")')
     
     # Bid strategy
-    parser.add_argument('--bid-strategy', choices=['Bid cap', 'Cost per result goal', 'Lower cost', 'Ad impression'], 
-                       default='Bid cap', help='Bid strategy')
-    parser.add_argument('--bid', type=float, help='Bid value (required for Bid cap and Cost per result goal)')
+    parser.add_argument('--bid-strategy', choices=LAUNCH_CHOICES['bid_strategy'],
+                       default=LAUNCH_DEFAULTS['bid_strategy'], help='Bid strategy')
+    parser.add_argument('--bid', type=parse_float_list,
+                       help='Bid value (required for Bid cap and Cost per result goal)')
     
     # Additional parameters
     parser.add_argument('--language', help='Language (e.g.: "English", "Spanish")')
-    parser.add_argument('--campaign-type', choices=['CBO', 'noCBO'], default='noCBO', help='Campaign type')
-    parser.add_argument('--autor', default='KH', help='Campaign author')
-    parser.add_argument('--account', help='Account name (if not specified, first one from list is used)')
+    parser.add_argument('--campaign-type', choices=LAUNCH_CHOICES['campaign_type'],
+                       default=LAUNCH_DEFAULTS['campaign_type'], help='Campaign type')
+    parser.add_argument('--autor', default=LAUNCH_DEFAULTS['autor'], help='Campaign author')
+    parser.add_argument('--account', type=parse_list,
+                       help='Account name (if not specified, first one from list is used)')
+    parser.add_argument('--shard-accounts', action='store_true',
+                       help="Spread campaigns across all of the project's accounts (or the --account list), "
+                            "weighted by each account's remaining rate limit")
+    parser.add_argument('--batch', action='store_true',
+                       help='Create campaigns and ad sets through Graph API /batch requests (up to 50 operations each)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='Number of campaigns created in parallel (default 1)')
+    parser.add_argument('--account-concurrency', type=int,
+                       help='Max campaigns created in parallel per ad account (default: no extra limit)')
+    
+    # Journal / resume
+    parser.add_argument('--journal', help='Run journal path (default: journals/run_<timestamp>.jsonl)')
+    parser.add_argument('--resume', metavar='JOURNAL',
+                       help='Resume an interrupted run: skip finished campaigns, complete half-finished pairs')
+    parser.add_argument('--replay', metavar='FILE', nargs='?', const=True,
+                       help=f'Resubmit failed campaigns from a dead-letter file (default {DEAD_LETTER_FILE}, '
+                            f'{DRY_RUN_DEAD_LETTER_FILE} with --dry-run)')
+    parser.add_argument('--dead-letter', metavar='FILE',
+                       help=f'Where failed campaigns are written with their spec, error and attempt count '
+                            f'(default {DEAD_LETTER_FILE}, {DRY_RUN_DEAD_LETTER_FILE} with --dry-run)')
+    parser.add_argument('--breaker-threshold', type=int, default=BREAKER_THRESHOLD,
+                       help=f'Consecutive Graph API failures of an account / endpoint before its requests '
+                            f'fail fast (default {BREAKER_THRESHOLD}, 0 disables)')
+    parser.add_argument('--breaker-cooldown', type=float, default=BREAKER_COOLDOWN,
+                       help=f'Seconds before a probe request is sent to an open circuit (default {BREAKER_COOLDOWN:g})')
+    
+    # Bulk plan input
+    parser.add_argument('--plan', metavar='FILE',
+                       help='Create campaigns from a CSV or JSONL plan ("-" for stdin), one campaign spec per row')
+    parser.add_argument('--yes', action='store_true', help='Skip the confirmation prompt')
     
-    return parser.parse_args()
+    # Offline runs
+    parser.add_argument('--dry-run', action='store_true',
+                       help='Send requests to a local mock Graph API server instead of Facebook')
+    parser.add_argument('--mock-latency', type=float, default=0.0,
+                       help='Mock server response latency in seconds (with --dry-run)')
+    parser.add_argument('--mock-error-rate', type=float, default=0.0,
+                       help='Share of transient mock server errors, 0..1 (with --dry-run)')
+    parser.add_argument('--api-base', metavar='URL',
+                       help='Override the Graph API base URL (e.g. a standalone mock server)')
+    parser.add_argument('--refresh-locales', action='store_true',
+                       help='Refresh the adlocale cache for every language in languages.json and exit')
+    parser.add_argument('--logs-file',
+                       help=f'Campaign log file (default logs.csv, {DRY_RUN_LOGS_FILE} with --dry-run); '
+                            '*.db / *.sqlite files are SQLite ledgers')
+    parser.add_argument('--ledger', metavar='PATH', nargs='?', const=True,
+                       help=f'Log to the SQLite ledger instead of logs.csv (default {DEFAULT_LEDGER_PATH}, '
+                            f'{DRY_RUN_LEDGER_FILE} with --dry-run)')
+    parser.add_argument('--allow-duplicates', action='store_true',
+                       help='Create campaigns even if the ledger (or, for --replay, the log) already has a campaign with the same name')
+    parser.add_argument('--metrics-out', metavar='FILE', action='append',
+                       help='Write phase timings, Graph API latencies and retry / throttle counts on exit: '
+                            'JSON, or Prometheus textfile format for *.prom (repeatable)')
+    
+    args = parser.parse_args()
+    
+    resolve_logs_file(parser, args)
+    resolve_dead_letter_file(args)
+    
+    if not args.resume and not args.replay and not args.plan and not args.refresh_locales:
+        missing = [
+            name for name, value in [
+                ('--project', args.project),
+                ('--gender', args.gender),
+                ('--age', args.age),
+                ('--budget', args.budget)
+            ]
+            if value is None
+        ]
+        if not args.tier and not args.all_tiers:
+            missing.append('--tier/--all-tiers')
+        if missing:
+            parser.error(f"the following arguments are required: {', '.join(missing)}")
+    
+    return args
 
 
-def create_single_campaign_data(
-    project,
-    accounts,
-    tier_name,
-    params,
-    tiers_data
-):
-    """Create data for a single campaign"""
-    # Determine tier and countries
-    if tier_name == "WW":
+def resolve_logs_file(parser, args):
+    """Set args.logs_file from --logs-file / --ledger (CSV or SQLite ledger, dry-run defaults)"""
+    if args.ledger:
+        if args.logs_file:
+            parser.error("--ledger and --logs-file cannot be used together")
+        if args.ledger is True:
+            args.ledger = DRY_RUN_LEDGER_FILE if args.dry_run else DEFAULT_LEDGER_PATH
+        if not is_ledger_path(args.ledger):
+            parser.error("--ledger path must end with .db, .sqlite or .sqlite3")
+        args.logs_file = args.ledger
+    if not args.logs_file:
+        args.logs_file = DRY_RUN_LOGS_FILE if args.dry_run else 'logs.csv'
+
+
+def resolve_dead_letter_file(args):
+    """Set args.dead_letter (dry-run default); a bare --replay reads that file"""
+    if not args.dead_letter:
+        args.dead_letter = DRY_RUN_DEAD_LETTER_FILE if args.dry_run else DEAD_LETTER_FILE
+    if getattr(args, 'replay', None) is True:
+        args.replay = args.dead_letter
+
+
+def resolve_geo(tier_name, tiers_data, countries=None):
+    """
+    Countries, naming tier and geo targeting cover for a tier (or a list of countries).
+    Restricted countries are excluded.
+    """
+    if countries:
+        # Specific countries: tier is determined via tiers.json
+        resolved = determine_tier_and_countries(countries)
+        restricted = get_restricted_countries()
+        countries = filter_countries(resolved['countries'], restricted)
+        tier_raw = resolved['tier_raw'] or "WW"
+        tier = resolved['tier'] or "WW"
+        naming_countries = filter_countries(resolved['naming_countries'], restricted)
+        is_worldwide = False
+        # Exactly the listed countries, as country_groups + countries - excluded_countries
+        geo = get_geo_cover(countries, restricted)
+    elif tier_name == "WW":
         tier_raw = "WW"
         tier = "WW"
-        countries = get_all_worldwide_countries(tiers_data)
-        # Exclude restricted countries
+        # All tier countries except restricted ones (bitset difference)
         restricted = get_restricted_countries()
-        countries = [c for c in countries if c not in restricted]
+        countries = get_all_worldwide_countries(tiers_data, restricted)
         naming_countries = []  # For WW, don't list countries in naming
         is_worldwide = True
-        country_group_keys = ["worldwide"]
+        geo = None
     else:
         tier_mapping = {
             "Tier-1": "Tier1",
@@ -106,26 +322,50 @@ def create_single_campaign_data(
         }
         tier_raw = tier_mapping.get(tier_name, tier_name)
         tier = format_tier_for_naming(tier_raw)
-        countries = get_all_countries_for_tier(tier_raw)
         # Exclude restricted countries
         restricted = get_restricted_countries()
-        countries = [c for c in countries if c not in restricted]
+        countries = get_all_countries_for_tier(tier_raw, restricted)
         naming_countries = []  # For entire tier, don't list countries
         is_worldwide = False
-        country_group_keys = get_country_groups_for_tier(tier_raw)
+        geo = get_geo_cover_for_tier(tier_raw, restricted)
+    
+    return {
+        'tier': tier,
+        'tier_raw': tier_raw,
+        'countries': countries,
+        'naming_countries': naming_countries,
+        'is_worldwide': is_worldwide,
+        'country_group_keys': ["worldwide"] if is_worldwide else (geo.country_groups or None),
+        # With country_groups: countries added to the groups and countries of the groups outside the target
+        'extra_countries': geo.countries if geo and geo.country_groups else None,
+        'excluded_countries': geo.excluded_countries if geo else None
+    }
+
+
+def create_single_campaign_data(
+    project,
+    accounts,
+    tier_name,
+    params,
+    tiers_data,
+    countries=None
+):
+    """Create data for a single campaign (for a tier, or for a list of countries)"""
+    # Determine tier, countries and geo targeting
+    geo = resolve_geo(tier_name, tiers_data, countries)
     
     # Select account
     if params.get('account_name'):
         account_name = params['account_name']
     else:
         account_name = project['account_names'][0]
-    account_id = accounts[account_name]
+    account_id = None if account_name == ACCOUNT_CHOSEN_AT_DISPATCH else accounts[account_name]
     
     # Generate naming
     naming_params = {
         'os': params['os'],
-        'tier': tier,
-        'naming_countries': naming_countries,
+        'tier': geo['tier'],
+        'naming_countries': geo['naming_countries'],
         'gender': params['gender'],
         'age': params['age'],
         'opt_model': params['opt_model'],
@@ -138,245 +378,1109 @@ def create_single_campaign_data(
         'extra': account_name
     }
     
-    campaign_name = generate_campaign_name(naming_params)
+    with metrics.timer('phase_seconds', phase='naming'):
+        campaign_name = generate_campaign_name(naming_params)
     
     return {
         'name': campaign_name,
-        'tier': tier,
-        'tier_raw': tier_raw,
-        'countries': countries,
-        'is_worldwide': is_worldwide,
-        'country_group_keys': country_group_keys,
+        'tier': geo['tier'],
+        'tier_raw': geo['tier_raw'],
+        'countries': geo['countries'],
+        'is_worldwide': geo['is_worldwide'],
+        'country_group_keys': geo['country_group_keys'],
+        'extra_countries': geo['extra_countries'],
+        'excluded_countries': geo['excluded_countries'],
         'account_id': account_id,
         'account_name': account_name
     }
 
 
-def main():
-    """Main function"""
-    args = parse_arguments()
+def build_api_params(camp_data, adset_defaults):
+    """Build ad set API parameters for a single campaign"""
+    restricted = get_restricted_countries()
+    api_params = dict(adset_defaults)
+    api_params.update({
+        'targeting_countries': camp_data['countries'],
+        # country_groups + extra countries - excluded countries cover the target exactly
+        # (or is_worldwide); without groups the countries are listed one by one
+        'country_group_keys': camp_data.get('country_group_keys'),
+        'extra_countries': camp_data.get('extra_countries'),
+        'is_worldwide': camp_data.get('is_worldwide', False),
+        'excluded_countries': restricted + [
+            c for c in camp_data.get('excluded_countries') or [] if c not in restricted
+        ]
+    })
     
-    # Load dictionaries
-    projects = load_json('dictionares/projects.json')
-    accounts = load_json('dictionares/accounts.json')
-    objectives = load_json('dictionares/objectives.json')
-    optimization_goals = load_json('dictionares/optimization_goals.json')
-    bid_strategies = load_json('dictionares/bid_strategies.json')
-    api_config = load_json('dictionares/api_config.json')
-    tiers_data = load_tiers()
-    
-    # Load optional dictionaries
-    events = {}
-    event_types = {}
-    if args.event:
-        events = load_json('dictionares/events.json')
-        event_types = load_json('dictionares/event_types.json')
+    # Regional regulated categories for WW or if TW/SG in countries
+    if camp_data['tier'] == "WW" or "TW" in camp_data['countries'] or "SG" in camp_data['countries']:
+        api_params['regional_regulated_categories'] = ["TAIWAN_UNIVERSAL", "SINGAPORE_UNIVERSAL"]
     
-    languages = {}
-    locales_data = {}
-    if args.language:
-        languages = load_json('dictionares/languages.json')
-        locales_data = load_json('dictionares/locales.json')
+    return api_params
+
+
+def build_job(camp_data, objective_api, adset_defaults):
+    """Build a creation job (campaign data + API payload inputs) for a single campaign"""
+    return {
+        'camp_data': camp_data,
+        'objective': objective_api,
+        'adset_params': build_api_params(camp_data, adset_defaults),
+        'campaign_id': None,
+        'adset_id': None
+    }
+
+
+def journal_spec(job):
+    """Part of a job recorded in the journal (enough to replay it)"""
+    return {
+        'camp_data': job['camp_data'],
+        'objective': job['objective'],
+        'adset_params': job['adset_params']
+    }
+
+
+def record_failure(job, result, kind, journal=None, dead_letters=None):
+    """
+    Journal, count and dead-letter a failed creation (kind: see utils.dead_letter.ERROR_TYPES).
+    A campaign created without its ad set stays in the journal only: --resume finishes
+    the pair, while a replay of the spec would create a second campaign.
+    """
+    if journal:
+        journal.failed(job.get('key'), result['error'])
+    metrics.inc('campaigns_total', result='failed')
+    if not dead_letters:
+        return
+    if result['campaign_id']:
+        dead_letters.resumable(result['campaign_id'], letter_id=job.get('letter_id'))
+        return
+    dead_letters.failed(
+        journal_spec(job),
+        result['error'],
+        error_type=kind,
+        attempts=job.get('attempts', 0) + 1,
+        letter_id=job.get('letter_id')
+    )
+
+
+def record_success(job, result, journal=None, dead_letters=None):
+    """Journal and count a created campaign; a replayed one leaves the dead-letter file"""
+    if journal:
+        journal.completed(job.get('key'))
+    metrics.inc('campaigns_total', result='created')
+    if dead_letters and job.get('letter_id'):
+        dead_letters.replayed(job['letter_id'], result['campaign_id'], result['adset_id'])
+
+
+def create_campaign_pair(job, client, journal=None, logs_file='logs.csv', dead_letters=None):
+    """
+    Create a campaign, then its ad set, then log them.
+    Steps already recorded in the job (campaign_id / adset_id from a resumed journal) are skipped.
+    API, network and spec errors are dead-lettered; other exceptions propagate.
+    Returns a result dict with campaign_id, adset_id and error.
+    """
+    camp_data = job['camp_data']
+    key = job.get('key')
+    result = {'campaign_id': job.get('campaign_id'), 'adset_id': job.get('adset_id'), 'error': None}
     
-    # Get project data
-    if args.project not in projects:
-        print(f"Error: Project '{args.project}' not found in projects.json")
+    try:
+        # Create campaign
+        if not result['campaign_id']:
+            result['campaign_id'] = create_campaign_via_api(
+                camp_data['account_id'],
+                camp_data['name'],
+                job['objective'],
+                client=client
+            )
+            if journal:
+                journal.campaign_created(key, result['campaign_id'])
+        
+        # Create ad set
+        if not result['adset_id']:
+            result['adset_id'] = create_adset_via_api(
+                camp_data['account_id'],
+                result['campaign_id'],
+                camp_data['name'],
+                job['adset_params'],
+                use_targeting_spec=True,
+                client=client
+            )
+            if journal:
+                journal.adset_created(key, result['adset_id'])
+    except CREATION_ERRORS as e:
+        result['error'] = f"Error creating campaign or ad set: {e}"
+        record_failure(job, result, error_type(e), journal, dead_letters)
+        return result
+    
+    # Log
+    with metrics.timer('phase_seconds', phase='log'):
+        log_campaign_creation(
+            campaign_name=camp_data['name'],
+            campaign_id=result['campaign_id'],
+            adset_id=result['adset_id'],
+            logs_file=logs_file,
+            spec=journal_spec(job),
+            account_id=camp_data['account_id']
+        )
+    record_success(job, result, journal, dead_letters)
+    return result
+
+
+def report_result(i, total, camp_data, result, logs_file='logs.csv'):
+    """Print the outcome of a single campaign creation (logs_file: where it was logged)"""
+    position = f"{i}/{total}" if total else f"{i}"
+    print(f"\n[{position}] Tier {camp_data['tier']}: {camp_data['name']}")
+    
+    if result['campaign_id']:
+        print(f"  ✓ Campaign created: {result['campaign_id']}")
+    if result['adset_id']:
+        print(f"  ✓ Ad set created: {result['adset_id']}")
+    if result['error']:
+        print(f"  ✗ {result['error']}")
+    else:
+        print(f"  ✓ Entry added to {logs_file}")
+
+
+def create_campaigns_concurrently(
+    jobs,
+    client,
+    journal=None,
+    concurrency=1,
+    account_concurrency=None,
+    start=1,
+    total=None,
+    logs_file='logs.csv',
+    dead_letters=None
+):
+    """
+    Create campaigns in parallel; each campaign and its ad set still run in order.
+    Jobs may be a lazy iterator: they are pulled only as slots free up.
+    """
+    pipeline = ConcurrentPipeline(
+        lambda job: create_campaign_pair(job, client, journal, logs_file, dead_letters),
+        concurrency=concurrency,
+        per_account_limit=account_concurrency,
+        account_key=lambda job: job['camp_data']['account_id']
+    )
+    
+    if total is None and isinstance(jobs, list):
+        total = len(jobs)
+    for i, job, result, error in pipeline.run(jobs):
+        if error:
+            # Not an API error (create_campaign_pair handles those): still dead-lettered
+            result = {
+                'campaign_id': job.get('campaign_id'),
+                'adset_id': None,
+                'error': f"Error creating campaign or ad set: {error}"
+            }
+            record_failure(job, result, error_type(error), journal, dead_letters)
+        report_result(start + i - 1, total, job['camp_data'], result, logs_file)
+
+
+def create_campaigns_in_batches(
+    jobs,
+    client,
+    journal=None,
+    start=1,
+    total=None,
+    logs_file='logs.csv',
+    dead_letters=None
+):
+    """
+    Create campaigns and ad sets through Graph API /batch requests.
+    Failed pairs (or every pair of a failed /batch request) are dead-lettered.
+    """
+    specs = [
+        {
+            'account_id': job['camp_data']['account_id'],
+            'name': job['camp_data']['name'],
+            'objective': job['objective'],
+            'adset_params': job['adset_params'],
+            'use_targeting_spec': True
+        }
+        for job in jobs
+    ]
+    
+    # A failed /batch request fails only its own pairs; pairs from the other
+    # requests already exist and are journaled and logged as usual
+    results = create_campaigns_batch(specs, client=client)
+    
+    # Journal first, so a crash while logging can be resumed without duplicates
+    if journal:
+        for job, result in zip(jobs, results):
+            if result['campaign_id']:
+                journal.campaign_created(job['key'], result['campaign_id'])
+            if result['adset_id']:
+                journal.adset_created(job['key'], result['adset_id'])
+    
+    # One append + fsync for the whole batch result
+    with metrics.timer('phase_seconds', phase='log'):
+        with CampaignLogWriter(logs_file, buffer_size=len(results) or 1) as log_writer:
+            for job, result in zip(jobs, results):
+                if not result['error']:
+                    log_writer.log(
+                        job['camp_data']['name'],
+                        result['campaign_id'],
+                        result['adset_id'],
+                        spec=journal_spec(job),
+                        account_id=job['camp_data']['account_id']
+                    )
+    for job, result in zip(jobs, results):
+        if not result['error']:
+            record_success(job, result, journal, dead_letters)
+    
+    # Failures go to the dead-letter file only after the created pairs are recorded
+    for job, result in zip(jobs, results):
+        if result['error']:
+            kind = error_type(result['batch_error']) if result['batch_error'] else 'api'
+            record_failure(job, result, kind, journal, dead_letters)
+    
+    for i, (job, result) in enumerate(zip(jobs, results), start):
+        report_result(i, total, job['camp_data'], result, logs_file)
+
+
+def dispatch_jobs(jobs, args, client, journal=None, total=None, dead_letters=None):
+    """
+    Send jobs to the API via /batch or the concurrent pipeline.
+    Jobs may be a list or a lazy iterator (plan streams, matrix sweeps).
+    """
+    if total is None and isinstance(jobs, list):
+        total = len(jobs)
+    
+    if not args.batch:
+        create_campaigns_concurrently(
+            jobs,
+            client,
+            journal,
+            concurrency=args.concurrency,
+            account_concurrency=args.account_concurrency,
+            total=total,
+            logs_file=args.logs_file,
+            dead_letters=dead_letters
+        )
+        return
+    
+    jobs = iter(jobs)
+    start = 1
+    while True:
+        chunk = list(islice(jobs, BATCH_JOBS_PER_DISPATCH))
+        if not chunk:
+            break
+        
+        # Half-finished pairs (campaign without ad set) cannot use batch dependencies
+        fresh = [job for job in chunk if not job.get('campaign_id')]
+        partial = [job for job in chunk if job.get('campaign_id')]
+        if fresh:
+            create_campaigns_in_batches(
+                fresh, client, journal, start=start, total=total, logs_file=args.logs_file, dead_letters=dead_letters
+            )
+        if partial:
+            create_campaigns_concurrently(
+                partial,
+                client,
+                journal,
+                concurrency=args.concurrency,
+                account_concurrency=args.account_concurrency,
+                start=start + len(fresh),
+                total=total,
+                logs_file=args.logs_file,
+                dead_letters=dead_letters
+            )
+        start += len(chunk)
+
+
+def create_client(args):
+    """
+    Pooled Graph API client for the run.
+    With --dry-run a mock Graph API server is started in the background;
+    with --api-base requests go to the given base URL.
+    Requests to an account / endpoint with --breaker-threshold consecutive failures fail fast.
+    """
+    # requests / http.server are imported only once a run actually talks to an API
+    from utils.http_client import GraphClient
+    
+    pool_size = max(args.concurrency, 10)
+    breaker = CircuitBreaker(args.breaker_threshold, args.breaker_cooldown)
+    
+    if args.dry_run:
+        from utils.mock_graph_server import MockGraphServer, MockGraphState
+        api_version = (registry.get('api_config') or {}).get('api_version', 'v23.0')
+        state = MockGraphState(latency=args.mock_latency, error_rate=args.mock_error_rate)
+        server = MockGraphServer(state).start()
+        print(f"\nDry run: requests go to mock Graph API at {server.base_url}, log: {args.logs_file}")
+        return GraphClient(server.api_config(api_version), pool_size=pool_size, breaker=breaker)
+    
+    if args.api_base:
+        api_config = dict(registry.get('api_config') or {})
+        api_config['base_url'] = args.api_base.rstrip('/')
+        api_config.setdefault('api_version', 'v23.0')
+        api_config.setdefault('access_token', 'mock-token')
+        print(f"\nAPI base: {api_config['base_url']}")
+        return GraphClient(api_config, pool_size=pool_size, breaker=breaker)
+    
+    return GraphClient(registry['api_config'], pool_size=pool_size, breaker=breaker)
+
+
+def resume_run(args):
+    """Finish an interrupted run recorded in a journal"""
+    entries = load_journal(args.resume)
+    pending = pending_entries(entries)
+    
+    print("=" * 80)
+    print("RESUMING RUN")
+    print("=" * 80)
+    print(f"Journal: {args.resume}")
+    print(f"Completed: {len(entries) - len(pending)} of {len(entries)}")
+    
+    # A failed spec is also in the dead-letter file: skip it if a replay already created it
+    existing = set() if args.allow_duplicates else logged_names(
+        (entry['spec']['camp_data']['name'] for entry in pending.values() if not entry['campaign_id']),
+        args.logs_file
+    )
+    
+    jobs = []
+    for key, entry in pending.items():
+        name = entry['spec']['camp_data']['name']
+        if entry['adset_id']:
+            state = "campaign and ad set created, not logged"
+        elif entry['campaign_id']:
+            state = f"campaign {entry['campaign_id']} created, ad set missing"
+        elif name in existing:
+            print(f"  {name}: already in {args.logs_file}, skipped")
+            continue
+        else:
+            state = "not created"
+        print(f"  {name}: {state}")
+        
+        job = dict(entry['spec'])
+        job.update({'key': key, 'campaign_id': entry['campaign_id'], 'adset_id': entry['adset_id']})
+        jobs.append(job)
+    
+    if not jobs:
+        print("\nNothing to resume.")
+        return
+    
+    print("=" * 80)
+    
+    if not args.yes:
+        confirmation = input("\nResume these campaigns? (yes/no): ").strip().lower()
+        if confirmation != 'yes':
+            print("Resume cancelled.")
+            return
+    
+    client = create_client(args)
+    
+    print("\nCreating campaigns via API...")
+    with RunJournal(args.resume) as journal, DeadLetterFile(args.dead_letter) as dead_letters:
+        dispatch_jobs(jobs, args, client, journal, dead_letters=dead_letters)
+    
+    report_failures(client, dead_letters, journal)
+    print("\n" + "=" * 80)
+    print("DONE!")
+    print("=" * 80)
+
+
+def report_failures(client, dead_letters, journal):
+    """Print circuits left open and where failed campaigns were written"""
+    for (account_id, endpoint), failures in client.breaker.open_circuits().items():
+        print(f"\n✗ Circuit open: account {account_id} /{endpoint} ({failures} consecutive failures)")
+    if dead_letters.unfinished:
+        print(f"\n✗ Unfinished: {dead_letters.unfinished} campaign(s) created without an ad set "
+              f"(finish with --resume {journal.path})")
+    if dead_letters.count:
+        print(f"\n✗ Failed: {dead_letters.count} campaign(s) written to {dead_letters.path} "
+              f"(retry with --replay {dead_letters.path})")
+
+
+def replay_run(args):
+    """Resubmit campaigns from a dead-letter file through the normal pipeline"""
+    if not os.path.exists(args.replay):
+        print(f"Error: {args.replay} not found")
         sys.exit(1)
     
-    project = projects[args.project]
+    entries = load_dead_letters(args.replay)
+    pending = pending_dead_letters(entries)
+    # A campaign may have been created after all (e.g. by an earlier replay or a
+    # manual retry): specs whose name is already in the log are not resubmitted.
+    # Entries written before half-created pairs moved to the journal carry a
+    # campaign_id; such a pair is not in the log yet.
+    existing = set() if args.allow_duplicates else logged_names(
+        (entry['name'] for entry in pending.values() if not entry.get('campaign_id')),
+        args.logs_file
+    )
+    
+    print("=" * 80)
+    print("REPLAYING FAILED CAMPAIGNS")
+    print("=" * 80)
+    print(f"Dead letters: {args.replay}")
+    print(f"Replayed: {len(entries) - len(pending)} of {len(entries)}")
+    
+    for entry in pending.values():
+        state = f"{entry['error_type']}, attempt {entry['attempts']}"
+        if entry.get('campaign_id'):
+            state += f", campaign {entry['campaign_id']} created, ad set missing"
+        if entry['name'] in existing:
+            state += f", already in {args.logs_file}: will be skipped"
+        print(f"  {entry['name']}: {state}")
+    
+    if not pending:
+        print("\nNothing to replay.")
+        return
+    
+    print("=" * 80)
+    
+    if not args.yes:
+        confirmation = input("\nResubmit these campaigns? (yes/no): ").strip().lower()
+        if confirmation != 'yes':
+            print("Replay cancelled.")
+            return
+    
+    client = create_client(args)
+    
+    # New failures are appended to the same file under the same ids (attempts + 1)
+    with RunJournal(args.journal or default_journal_path()) as journal, DeadLetterFile(args.replay) as dead_letters:
+        print(f"\nJournal: {journal.path} (resume with --resume {journal.path})")
+        jobs = []
+        for letter_id, entry in pending.items():
+            if entry['name'] in existing:
+                dead_letters.replayed(letter_id)
+                continue
+            job = dict(entry['spec'])
+            job['key'] = journal.planned(entry['spec'])
+            if entry.get('campaign_id'):
+                journal.campaign_created(job['key'], entry['campaign_id'])
+            job.update({
+                'campaign_id': entry.get('campaign_id'),
+                'adset_id': None,
+                'letter_id': letter_id,
+                'attempts': entry['attempts']
+            })
+            jobs.append(job)
+        
+        print("\nCreating campaigns via API...")
+        dispatch_jobs(jobs, args, client, journal, dead_letters=dead_letters)
+    
+    report_failures(client, dead_letters, journal)
+    print("\n" + "=" * 80)
+    print("DONE!")
+    print("=" * 80)
+
+
+def launch_params_from_args(args):
+    """Launch parameters (same keys as plan rows) taken from CLI arguments"""
+    return {
+        'project': args.project,
+        'tier': 'all' if args.all_tiers else args.tier,
+        'countries': None,
+        'os': args.os,
+        'gender': args.gender,
+        'age': args.age,
+        'opt_model': args.opt_model,
+        'event': args.event,
+        'bid_strategy': args.bid_strategy,
+        'bid': args.bid,
+        'budget': args.budget,
+        # With --shard-accounts the --account list is the pool to spread over, not a matrix field
+        'account': None if args.shard_accounts else args.account,
+        'account_pool': args.account if args.shard_accounts else None,
+        'language': args.language,
+        'campaign_type': args.campaign_type,
+        'autor': args.autor
+    }
+
+
+def parse_age(age):
+    """Age range string (e.g. 18-65+) → (age_min, age_max); raises ValueError"""
+    age_parts = age.replace('+', '').split('-')
+    try:
+        age_min = int(age_parts[0])
+        age_max = int(age_parts[1]) if len(age_parts) > 1 else 65
+    except ValueError:
+        raise ValueError(f"Invalid age '{age}' (expected e.g. 18-65+)")
+    return age_min, age_max
+
+
+def resolve_launch(raw):
+    """
+    Validate one set of launch parameters (CLI arguments or a plan row)
+    and map them to naming and API values.
+    Raises ValueError if a parameter is missing or unknown.
+    """
+    params = dict(LAUNCH_DEFAULTS)
+    params.update({key: value for key, value in raw.items() if value is not None})
+    
+    for field in ('project', 'gender', 'age', 'budget'):
+        if params.get(field) is None:
+            raise ValueError(f"'{field}' must be specified")
+    if not params.get('tier') and not params.get('countries'):
+        raise ValueError("'tier' or 'countries' must be specified")
+    
+    for field, choices in LAUNCH_CHOICES.items():
+        if params[field] not in choices:
+            raise ValueError(f"'{field}' must be one of {', '.join(choices)}, got '{params[field]}'")
+    
+    # Dictionaries are loaded lazily through the shared registry
+    projects = registry['projects']
+    tiers_data = registry['tiers']
+    
+    # Get project data
+    if params['project'] not in projects:
+        raise ValueError(f"Project '{params['project']}' not found in projects.json")
+    
+    project = projects[params['project']]
+    
+    # Only account_names may list several values; any other field must be a single value
+    for field, value in project.items():
+        if field != 'account_names' and isinstance(value, list):
+            raise ValueError(
+                f"Project '{params['project']}' has several '{field}' values in projects.json "
+                f"({', '.join(map(str, value))}): keep one"
+            )
     
     # Get event (if specified)
     event_code = None
-    if args.event:
-        if args.event not in events:
-            print(f"Error: Event '{args.event}' not found in events.json")
-            sys.exit(1)
-        event_code = events[args.event]
+    if params.get('event'):
+        events = registry['events']
+        if params['event'] not in events:
+            raise ValueError(f"Event '{params['event']}' not found in events.json")
+        event_code = events[params['event']]
     
     # Get language (if specified)
     lang_code = "ALL"
     locales = []
-    if args.language:
-        if args.language not in languages:
-            print(f"Error: Language '{args.language}' not found in languages.json")
-            sys.exit(1)
-        lang_code = languages[args.language]
-        locales = get_locale_ids(lang_code, locales_data)
-        # Temporarily not using locales due to API issues
-        locales = []
-    
-    # Bid strategy mapping
-    bid_strategy_short_map = {
-        'Bid cap': 'bc',
-        'Cost per result goal': 'cc',
-        'Lower cost': 'lc',
-        'Ad impression': 'ai'
-    }
-    bid_strategy_short = bid_strategy_short_map.get(args.bid_strategy, 'bc')
+    if params.get('language'):
+        languages = registry['languages']
+        if params['language'] not in languages:
+            raise ValueError(f"Language '{params['language']}' not found in languages.json")
+        lang_code = languages[params['language']]
+        # Served from the adlocale cache (or the locales.json snapshot), no API call
+        locales = get_locale_resolver().lookup(params['language'])
+        if not locales:
+            raise ValueError(
+                f"No adlocale found for language '{params['language']}' (run with --refresh-locales)"
+            )
+    
+    bid_strategy_short = BID_STRATEGY_SHORT.get(params['bid_strategy'], 'bc')
     
     # Check bid for Bid cap and Cost per result goal
-    if args.bid_strategy in ['Bid cap', 'Cost per result goal'] and not args.bid:
-        print(f"Error: For strategy '{args.bid_strategy}' --bid must be specified")
-        sys.exit(1)
+    if params['bid_strategy'] in ['Bid cap', 'Cost per result goal'] and not params.get('bid'):
+        raise ValueError(f"For strategy '{params['bid_strategy']}' --bid must be specified")
     
     # Date
     today = datetime.now()
     date_str = today.strftime("%d%m%Y")
     
     # Age
-    age_parts = args.age.replace('+', '').split('-')
-    age_min = int(age_parts[0])
-    age_max = int(age_parts[1]) if len(age_parts) > 1 else 65
+    age_min, age_max = parse_age(params['age'])
     
     # Gender
     genders_map = {"M": [1], "F": [2], "MF": [1, 2]}
-    genders = genders_map[args.gender]
+    genders = genders_map[params['gender']]
     
     # API mappings
-    objective_api = objectives[project['campaign_objective']]
-    optimization_goal_api = optimization_goals[args.opt_model]
-    bid_strategy_api = bid_strategies[args.bid_strategy]
+    objective_api = registry['objectives'][project['campaign_objective']]
+    optimization_goal_api = registry['optimization_goals'][params['opt_model']]
+    bid_strategy_api = registry['bid_strategies'][params['bid_strategy']]
     
     # Application ID without "x:" prefix
     application_id = project['application_id'].replace('x:', '')
     
     # Custom event type (only for CPA with events)
     custom_event_type_api = None
-    if args.opt_model == "CPA" and event_code:
-        custom_event_type_api = event_types[event_code]
+    if params['opt_model'] == "CPA" and event_code:
+        custom_event_type_api = registry['event_types'][event_code]
     
-    # Parameters for all campaigns
-    base_params = {
-        'os': args.os,
-        'gender': args.gender,
-        'age': args.age,
-        'opt_model': args.opt_model,
-        'campaign_type': args.campaign_type,
-        'bid_strategy_short': bid_strategy_short,
-        'lang': lang_code,
-        'autor': args.autor,
-        'date': date_str,
-        'account_name': args.account,
-        'event_code': event_code
-    }
+    # Accounts campaigns may be spread over (--shard-accounts); a set 'account' pins them
+    if params.get('account_pool'):
+        for name in params['account_pool']:
+            if name not in registry['accounts']:
+                raise ValueError(f"Account '{name}' not found in accounts.json")
+        account_pool = list(params['account_pool'])
+    else:
+        account_pool = [name for name in project['account_names'] if name in registry['accounts']]
     
-    # Determine list of tiers to process
-    if args.all_tiers:
+    # Tiers to process
+    if params.get('countries'):
+        tiers_to_process = []
+    elif str(params['tier']).lower() == 'all':
         tiers_to_process = list(tiers_data.keys())
     else:
-        tiers_to_process = [args.tier]
+        tiers_to_process = [params['tier']]
+    
+    return {
+        'params': params,
+        'project': project,
+        'event_code': event_code,
+        'lang_code': lang_code,
+        'objective': objective_api,
+        'tiers': tiers_to_process,
+        'countries': params.get('countries'),
+        'account_pool': account_pool,
+        # Parameters for all campaigns
+        'naming_params': {
+            'os': params['os'],
+            'gender': params['gender'],
+            'age': params['age'],
+            'opt_model': params['opt_model'],
+            'campaign_type': params['campaign_type'],
+            'bid_strategy_short': bid_strategy_short,
+            'lang': lang_code,
+            'autor': params['autor'],
+            'date': date_str,
+            'account_name': params.get('account'),
+            'event_code': event_code
+        },
+        # Ad set parameters shared by all campaigns
+        'adset_defaults': {
+            'daily_budget': params['budget'],
+            'optimization_goal': optimization_goal_api,
+            'bid_strategy': bid_strategy_api,
+            'bid_amount': params.get('bid'),
+            'custom_event_type': custom_event_type_api,
+            'custom_event_str': event_code,
+            'object_store_url': project['object_store_url'],
+            'application_id': application_id,
+            'age_min': age_min,
+            'age_max': age_max,
+            'genders': genders,
+            'user_os': 'android' if params['os'] == 'AND' else 'ios',
+            'locales': locales
+        }
+    }
+
+
+def sharded_naming_params(launch, balancer=None):
+    """
+    Naming parameters of the next campaign of a launch. With a balancer, the account
+    (and so the naming 'extra' field) is picked from the launch's account pool;
+    a launch with an explicit account keeps it.
+    """
+    params = launch['naming_params']
+    if balancer is None or params.get('account_name') or not launch['account_pool']:
+        return params
+    return dict(params, account_name=balancer.choose(launch['account_pool']))
+
+
+def iter_campaign_data(launch, balancer=None):
+    """
+    Yield campaign data for every tier (or the country list) of a launch.
+    With a balancer, every campaign is placed on the account it picks at that moment.
+    """
+    accounts = registry['accounts']
+    tiers_data = registry['tiers']
+    
+    if launch['countries']:
+        with metrics.timer('phase_seconds', phase='campaign_data'):
+            camp_data = create_single_campaign_data(
+                launch['project'],
+                accounts,
+                None,
+                sharded_naming_params(launch, balancer),
+                tiers_data,
+                countries=launch['countries']
+            )
+        yield camp_data
+        return
+    
+    for tier_name in launch['tiers']:
+        with metrics.timer('phase_seconds', phase='campaign_data'):
+            camp_data = create_single_campaign_data(
+                launch['project'],
+                accounts,
+                tier_name,
+                sharded_naming_params(launch, balancer),
+                tiers_data
+            )
+        yield camp_data
+
+
+def iter_launch_combinations(raw):
+    """
+    Expand list-valued matrix fields of launch parameters into single launches.
+    Combinations are produced lazily, one at a time.
+    """
+    fields = [field for field in MATRIX_FIELDS if isinstance(raw.get(field), list)]
+    for values in product(*(raw[field] for field in fields)):
+        combination = dict(raw)
+        combination.update(zip(fields, values))
+        yield combination
+
+
+def count_launch_combinations(raw):
+    """Number of launches iter_launch_combinations(raw) produces"""
+    count = 1
+    for field in MATRIX_FIELDS:
+        if isinstance(raw.get(field), list):
+            count *= len(raw[field])
+    return count
+
+
+def validate_matrix(raw):
+    """
+    Check every value of the matrix fields up front, so a typo fails
+    before the sweep starts instead of skipping thousands of combinations.
+    Raises ValueError.
+    """
+    for field in MATRIX_FIELDS:
+        values = raw.get(field)
+        if not isinstance(values, list):
+            continue
+        for value in values:
+            if field in LAUNCH_CHOICES and value not in LAUNCH_CHOICES[field]:
+                raise ValueError(f"'{field}' must be one of {', '.join(LAUNCH_CHOICES[field])}, got '{value}'")
+            if field == 'account' and value not in registry['accounts']:
+                raise ValueError(f"Account '{value}' not found in accounts.json")
+            if field == 'age':
+                parse_age(value)
+    
+    # --shard-accounts pool is not a matrix field, but a typo there must fail up front too
+    for value in raw.get('account_pool') or []:
+        if value not in registry['accounts']:
+            raise ValueError(f"Account '{value}' not found in accounts.json")
+    
+    # The first combination checks everything else (project, event, language...)
+    resolve_launch(next(iter_launch_combinations(raw)))
+
+
+def iter_matrix_launches(raw):
+    """Yield (label, launch parameters) for every matrix combination"""
+    for number, combination in enumerate(iter_launch_combinations(raw), 1):
+        yield f"Combination {number}", combination
+
+
+def iter_preview_campaign_data(launches, sharded=False):
+    """
+    Campaign data of all valid (label, launch parameters) pairs (lazy, for previews).
+    With sharded=True, launches spread over an account pool show ACCOUNT_CHOSEN_AT_DISPATCH
+    instead of the account: the balancer picks it by the rate limit left at dispatch.
+    """
+    for _, raw in launches:
+        try:
+            launch = resolve_launch(raw)
+            if sharded and launch['account_pool'] and not launch['naming_params'].get('account_name'):
+                launch = dict(launch, naming_params=dict(launch['naming_params'], account_name=ACCOUNT_CHOSEN_AT_DISPATCH))
+            yield from iter_campaign_data(launch)
+        except (ValueError, KeyError):
+            continue
+
+
+def show_naming_preview(campaigns, total=None, ledger=None):
+    """
+    Print tier, countries and naming of the first MATRIX_PREVIEW_LIMIT campaigns
+    and how many more follow. Without a total the rest of the iterator is counted.
+    Returns the total number of campaigns.
+    """
+    preview = list(islice(campaigns, MATRIX_PREVIEW_LIMIT))
+    existing = ledger.existing_names(camp_data['name'] for camp_data in preview) if ledger else set()
+    for camp_data in preview:
+        print(f"Tier: {camp_data['tier']}")
+        print(f"  Countries: {len(camp_data['countries'])} countries")
+        print(f"  Naming: {camp_data['name']}")
+        if camp_data['name'] in existing:
+            print("  Already in the ledger: will be skipped")
+        print()
+    
+    if total is None:
+        total = len(preview) + sum(1 for _ in campaigns)
+    if total > len(preview):
+        print(f"... and {total - len(preview)} more")
+        print()
+    return total
+
+
+def iter_launch_jobs(launches, journal, balancer=None, ledger=None):
+    """
+    Turn (label, launch parameters) pairs into jobs, recording each job in the
+    journal just before it is dispatched. Invalid launches are reported and skipped.
+    With a balancer, accounts are picked as the pipeline pulls launches, so the split
+    follows the rate-limit usage reported by the responses so far.
+    With a ledger, campaigns whose name is already in it are skipped (one index lookup per launch).
+    """
+    for label, raw in launches:
+        try:
+            launch = resolve_launch(raw)
+            campaigns = list(iter_campaign_data(launch, balancer))
+        except (ValueError, KeyError) as e:
+            print(f"\n✗ {label} skipped: {e}")
+            continue
+        
+        if ledger is not None:
+            existing = ledger.existing_names(camp_data['name'] for camp_data in campaigns)
+            for camp_data in campaigns:
+                if camp_data['name'] in existing:
+                    print(f"\n✗ {camp_data['name']} skipped: already in the ledger")
+            campaigns = [camp_data for camp_data in campaigns if camp_data['name'] not in existing]
+        
+        for camp_data in campaigns:
+            job = build_job(camp_data, launch['objective'], launch['adset_defaults'])
+            job['key'] = journal.planned(journal_spec(job))
+            yield job
+
+
+def iter_plan_jobs(args, journal, balancer=None, ledger=None):
+    """
+    Stream jobs from a --plan file: each row is validated, expanded into campaigns
+    and recorded in the journal just before it is dispatched.
+    CLI arguments act as defaults for columns missing in the plan.
+    """
+    yield from iter_launch_jobs(iter_plan_launches(args), journal, balancer, ledger)
+
+
+def iter_plan_launches(args, report_skipped=True):
+    """
+    Yield (label, launch parameters) for every plan row. List-valued CLI
+    defaults (matrix mode) expand rows that do not set those columns.
+    Unreadable rows are reported (unless report_skipped=False, for previews) and skipped.
+    """
+    defaults = launch_params_from_args(args)
     
-    # Collect campaign information
-    campaign_data_list = []
+    for line_no, row, error in read_plan(args.plan):
+        try:
+            if error:
+                raise ValueError(error)
+            raw = dict(defaults)
+            raw.update({key: value for key, value in normalize_plan_row(row).items() if value is not None})
+        except ValueError as e:
+            if report_skipped:
+                print(f"\n✗ Plan line {line_no} skipped: {e}")
+            continue
+        if raw.get('countries'):
+            raw['tier'] = None
+        
+        if count_launch_combinations(raw) == 1:
+            yield f"Plan line {line_no}", next(iter_launch_combinations(raw))
+            continue
+        for number, combination in enumerate(iter_launch_combinations(raw), 1):
+            yield f"Plan line {line_no}, combination {number}", combination
+
+
+def create_balancer(args, client=None):
+    """
+    Account balancer for --shard-accounts (None without it).
+    Without a client accounts are simply taken in turn.
+    """
+    if not args.shard_accounts:
+        return None
+    return AccountBalancer(registry['accounts'], client.scheduler if client else None)
+
+
+def duplicate_guard(args):
+    """
+    Ledger used to skip campaigns that already exist (None when logging to CSV
+    or with --allow-duplicates)
+    """
+    if args.allow_duplicates or not is_ledger_path(args.logs_file):
+        return None
+    from utils.ledger import get_ledger
+    return get_ledger(args.logs_file)
+
+
+def report_account_split(balancer):
+    """Print how many campaigns went to each account"""
+    split = balancer.assigned() if balancer else {}
+    if split:
+        print("\nCampaigns per account: " + ", ".join(f"{name}: {count}" for name, count in sorted(split.items())))
+
+
+def start_locale_refresh(args, client, wait=False):
+    """
+    Refresh stale / missing adlocale cache entries seen during this run in one
+    background /batch call; with wait=True, give it a moment to finish.
+    Skipped in dry runs, so mock answers never reach the cache.
+    """
+    if args.dry_run:
+        return
+    resolver = get_locale_resolver()
+    resolver.start_refresh(client)
+    if wait:
+        resolver.wait(LOCALE_REFRESH_WAIT)
+
+
+def refresh_locales(args):
+    """Refresh the adlocale cache for all languages in languages.json"""
+    languages = list(registry['languages'])
+    resolver = get_locale_resolver()
+    languages += [language for language in resolver.cached_languages() if language not in languages]
     
+    print(f"Refreshing adlocales for {len(languages)} languages...")
+    try:
+        updated = resolver.refresh(create_client(args), languages)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"✓ Updated {updated} languages in {resolver.cache_path}")
+
+
+def run_plan(args):
+    """Create campaigns from a CSV / JSONL plan in a single process"""
+    print("=" * 80)
+    print("CREATING CAMPAIGNS FROM PLAN")
+    print("=" * 80)
+    print(f"Plan: {args.plan}")
+    if args.shard_accounts:
+        print(f"Accounts: chosen at dispatch by rate-limit headroom (shown as {ACCOUNT_CHOSEN_AT_DISPATCH})")
+    print("=" * 80)
+    
+    # Preview: the first campaigns of the plan; the rest are counted in one streaming pass
+    ledger = duplicate_guard(args)
+    total = show_naming_preview(
+        iter_preview_campaign_data(iter_plan_launches(args, report_skipped=False), args.shard_accounts),
+        ledger=ledger
+    )
+    
+    print("=" * 80)
+    print(f"Total campaigns to be created: {total}")
+    print("=" * 80)
+    
+    if not args.yes:
+        confirmation = input(f"\nCreate campaigns from plan {args.plan} with these namings? (yes/no): ").strip().lower()
+        if confirmation != 'yes':
+            print("Campaign creation cancelled.")
+            return
+    
+    # One pooled HTTP client (keep-alive, timeouts, retries) for the whole run
+    client = create_client(args)
+    
+    with RunJournal(args.journal or default_journal_path()) as journal, DeadLetterFile(args.dead_letter) as dead_letters:
+        print(f"\nJournal: {journal.path} (resume with --resume {journal.path})")
+        print("\nCreating campaigns via API...")
+        balancer = create_balancer(args, client)
+        dispatch_jobs(
+            iter_plan_jobs(args, journal, balancer, ledger),
+            args,
+            client,
+            journal,
+            total=total,
+            dead_letters=dead_letters
+        )
+    
+    report_account_split(balancer)
+    report_failures(client, dead_letters, journal)
+    start_locale_refresh(args, client, wait=True)
+    
+    print("\n" + "=" * 80)
+    print("DONE!")
     print("=" * 80)
-    if args.all_tiers:
+
+
+def write_metrics(paths):
+    """Write collected metrics to every --metrics-out file"""
+    for path in paths:
+        try:
+            metrics.write(path)
+        except OSError as e:
+            print(f"Warning: could not write metrics to {path}: {e}")
+            continue
+        print(f"Metrics: {path}")
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+    
+    if args.metrics_out:
+        metrics.enable()
+        # Written on every exit path, including errors and cancelled runs
+        atexit.register(write_metrics, args.metrics_out)
+    
+    if args.resume:
+        resume_run(args)
+        return
+    
+    if args.replay:
+        replay_run(args)
+        return
+    
+    if args.refresh_locales:
+        refresh_locales(args)
+        return
+    
+    if args.plan:
+        run_plan(args)
+        return
+    
+    raw = launch_params_from_args(args)
+    try:
+        validate_matrix(raw)
+        launch = resolve_launch(next(iter_launch_combinations(raw)))
+    except (ValueError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    
+    combinations = count_launch_combinations(raw)
+    total = combinations * max(len(launch['tiers']), 1)
+    
+    print("=" * 80)
+    if combinations > 1:
+        print("GENERATING CAMPAIGN MATRIX")
+    elif args.all_tiers:
         print("GENERATING CAMPAIGNS FOR ALL TIERS")
     else:
         print("GENERATING CAMPAIGN")
     print("=" * 80)
     print(f"Project: {args.project}")
-    print(f"OS: {args.os}")
-    print(f"Gender: {args.gender}")
+    print(f"OS: {', '.join(args.os or [LAUNCH_DEFAULTS['os']])}")
+    print(f"Gender: {', '.join(args.gender)}")
     if args.event:
-        print(f"Event: {args.event} ({event_code})")
+        print(f"Event: {args.event} ({launch['event_code']})")
     print(f"Budget: ${args.budget}")
     if args.bid:
-        print(f"Bid: ${args.bid}")
-    print(f"Age: {args.age}")
+        print(f"Bid: {', '.join(f'${bid}' for bid in args.bid)}")
+    print(f"Age: {', '.join(args.age)}")
+    if args.shard_accounts:
+        print(f"Accounts: sharded across {', '.join(launch['account_pool'])}, "
+              f"chosen at dispatch by rate-limit headroom (shown as {ACCOUNT_CHOSEN_AT_DISPATCH})")
+    elif args.account:
+        print(f"Account: {', '.join(args.account)}")
     if args.language:
-        print(f"Language: {args.language} ({lang_code})")
+        print(f"Language: {args.language} ({launch['lang_code']})")
+    if combinations > 1:
+        print(f"Combinations: {combinations} x {max(len(launch['tiers']), 1)} tier(s)")
     print()
     
-    for tier_name in tiers_to_process:
-        camp_data = create_single_campaign_data(
-            project,
-            accounts,
-            tier_name,
-            base_params,
-            tiers_data
-        )
-        campaign_data_list.append(camp_data)
-        
-        print(f"Tier: {camp_data['tier']}")
-        print(f"  Countries: {len(camp_data['countries'])} countries")
-        print(f"  Naming: {camp_data['name']}")
-        print()
+    # Preview: the first campaigns of the (lazy) matrix
+    ledger = duplicate_guard(args)
+    show_naming_preview(
+        iter_preview_campaign_data(iter_matrix_launches(raw), args.shard_accounts),
+        total,
+        ledger
+    )
     
     print("=" * 80)
-    print(f"Total campaigns to be created: {len(campaign_data_list)}")
+    print(f"Total campaigns to be created: {total}")
     print("=" * 80)
     
     # Request confirmation
-    confirmation = input("\nCreate campaigns with these namings? (yes/no): ").strip().lower()
+    if not args.yes:
+        confirmation = input("\nCreate campaigns with these namings? (yes/no): ").strip().lower()
+        
+        if confirmation != 'yes':
+            print("Campaign creation cancelled.")
+            return
     
-    if confirmation != 'yes':
-        print("Campaign creation cancelled.")
-        return
+    # One pooled HTTP client (keep-alive, timeouts, retries) for the whole run
+    client = create_client(args)
     
-    # Create campaigns via API
-    print("\nCreating campaigns via API...")
+    # Stale adlocale entries used in the preview are refreshed while campaigns are created
+    start_locale_refresh(args, client)
     
-    for i, camp_data in enumerate(campaign_data_list, 1):
-        print(f"\n[{i}/{len(campaign_data_list)}] Creating campaign for tier {camp_data['tier']}...")
+    # Write-ahead journal: every spec is recorded right before dispatch
+    with RunJournal(args.journal or default_journal_path()) as journal, DeadLetterFile(args.dead_letter) as dead_letters:
+        print(f"\nJournal: {journal.path} (resume with --resume {journal.path})")
         
-        try:
-            # API parameters
-            api_params = {
-                'daily_budget': args.budget,
-                'optimization_goal': optimization_goal_api,
-                'bid_strategy': bid_strategy_api,
-                'bid_amount': args.bid,
-                'custom_event_type': custom_event_type_api,
-                'custom_event_str': event_code,
-                'object_store_url': project['object_store_url'],
-                'application_id': application_id,
-                'targeting_countries': camp_data['countries'],
-                # Targeting by tier via country_groups / is_worldwide, by countries via countries
-                'country_group_keys': camp_data.get('country_group_keys'),
-                'is_worldwide': camp_data.get('is_worldwide', False),
-                'excluded_countries': get_restricted_countries(),
-                'age_min': age_min,
-                'age_max': age_max,
-                'genders': genders,
-                'user_os': 'android' if args.os == 'AND' else 'ios',
-                'locales': locales
-            }
-            
-            # Regional regulated categories for WW or if TW/SG in countries
-            if camp_data['tier'] == "WW" or "TW" in camp_data['countries'] or "SG" in camp_data['countries']:
-                api_params['regional_regulated_categories'] = ["TAIWAN_UNIVERSAL", "SINGAPORE_UNIVERSAL"]
-            
-            # Create campaign
-            campaign_id = create_campaign_via_api(
-                camp_data['account_id'],
-                camp_data['name'],
-                objective_api,
-                api_config
-            )
-            print(f"  ✓ Campaign created: {campaign_id}")
-            
-            # Create ad set
-            adset_id = create_adset_via_api(
-                camp_data['account_id'],
-                campaign_id,
-                camp_data['name'],
-                api_params,
-                api_config,
-                use_targeting_spec=True
-            )
-            print(f"  ✓ Ad set created: {adset_id}")
-            
-            # Log
-            log_campaign_creation(
-                campaign_name=camp_data['name'],
-                campaign_id=campaign_id,
-                adset_id=adset_id
-            )
-            print(f"  ✓ Entry added to logs.csv")
-            
-        except Exception as e:
-            print(f"  ✗ Error creating campaign or ad set: {e}")
+        # Create campaigns via API; combinations are generated as the pipeline pulls them
+        print("\nCreating campaigns via API...")
+        balancer = create_balancer(args, client)
+        dispatch_jobs(
+            iter_launch_jobs(iter_matrix_launches(raw), journal, balancer, ledger),
+            args,
+            client,
+            journal,
+            total=total,
+            dead_letters=dead_letters
+        )
+    
+    report_account_split(balancer)
+    report_failures(client, dead_letters, journal)
+    start_locale_refresh(args, client, wait=True)
     
     print("\n" + "=" * 80)
     print("DONE!")
@@ -0,0 +1,136 @@
+"""
+Shared fixtures: a scratch directory per test with a copy of the dictionaries,
+a local mock Graph API server and a helper that runs the CLIs in-process
+"""
+import csv
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import locale_resolver  # noqa: E402
+from utils.config_loader import DICTIONARIES_DIR, registry  # noqa: E402
+from utils.http_client import GraphClient  # noqa: E402
+from utils.mock_graph_server import MockGraphServer, MockGraphState  # noqa: E402
+
+
+# Project added to the copy of the dictionaries (single-valued copy of the first project)
+PROJECT = 'Test'
+
+# Spec fields that differ between matrix campaigns: 8 tiers x 9 = 72 campaigns
+MATRIX_ARGS = ['--all-tiers', '--gender', 'M,F,MF', '--age', '18-65+,25-45,21-65']
+
+
+@pytest.fixture(scope='session')
+def dictionaries(tmp_path_factory):
+    """Copy of dictionares/ with a test api_config.json and the PROJECT project"""
+    directory = str(tmp_path_factory.mktemp('dictionaries'))
+    shutil.copytree(DICTIONARIES_DIR, directory, dirs_exist_ok=True)
+    with open(os.path.join(directory, 'api_config.json'), 'w', encoding='utf-8') as f:
+        json.dump({'base_url': 'https://graph.test', 'api_version': 'v23.0', 'access_token': 'token'}, f)
+
+    projects_path = os.path.join(directory, 'projects.json')
+    with open(projects_path, 'r', encoding='utf-8') as f:
+        projects = json.load(f)
+    source = next(iter(projects.values()))
+    projects[PROJECT] = {
+        key: value if key == 'account_names' or not isinstance(value, list) else value[0]
+        for key, value in source.items()
+    }
+    with open(projects_path, 'w', encoding='utf-8') as f:
+        json.dump(projects, f, ensure_ascii=False, indent=2)
+    return directory
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch, dictionaries):
+    """
+    Every test runs in its own directory against the copy of the dictionaries,
+    without retry pauses and without touching cache/ of the repo
+    """
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(registry, 'directory', dictionaries)
+    registry.invalidate()
+    monkeypatch.setattr(
+        locale_resolver,
+        '_resolver',
+        locale_resolver.LocaleResolver(str(tmp_path / 'cache' / 'adlocales.json'), seed=registry.get('locales'))
+    )
+    monkeypatch.setattr(GraphClient, '_backoff', lambda self, attempt, response=None: 0.0)
+    yield tmp_path
+    registry.invalidate()
+
+
+@pytest.fixture
+def mock_state():
+    return MockGraphState(seed=20251116)
+
+
+@pytest.fixture
+def mock_server(mock_state):
+    with MockGraphServer(mock_state) as server:
+        yield server
+
+
+@pytest.fixture
+def client(mock_server):
+    return GraphClient(mock_server.api_config())
+
+
+def run_main(module, args):
+    """Run module.main() with the given command line; returns the exit code"""
+    argv = sys.argv
+    sys.argv = [module.__name__ + '.py'] + [str(arg) for arg in args]
+    try:
+        module.main()
+    except SystemExit as e:
+        return e.code or 0
+    finally:
+        sys.argv = argv
+    return 0
+
+
+def run_create(server, *args):
+    """create_campaign_universal.py against the mock server (no confirmation)"""
+    import create_campaign_universal
+    return run_main(create_campaign_universal, [
+        '--project', PROJECT, '--budget', '10', '--bid', '0.3', '--yes',
+        '--api-base', server.base_url, *args
+    ])
+
+
+def fail_batch_requests(monkeypatch, calls):
+    """
+    Make the given /batch POSTs (1-based call numbers) fail with a connection
+    error before they reach the server; other requests go through.
+    The calls set is read on every request: clear it to stop the failures.
+    """
+    import requests
+
+    post = GraphClient.post
+    counter = {'batch': 0}
+
+    def flaky_post(self, path, **kwargs):
+        if path == '' and 'batch' in (kwargs.get('data') or {}):
+            counter['batch'] += 1
+            if counter['batch'] in calls:
+                raise requests.ConnectionError('connection reset')
+        return post(self, path, **kwargs)
+
+    monkeypatch.setattr(GraphClient, 'post', flaky_post)
+    return counter
+
+
+def read_log(path):
+    """Rows of a logs.csv file"""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        return list(csv.DictReader(f))
+
+
+def created_objects(state, kind):
+    """Objects of one kind (campaign / adset) created on the mock server"""
+    return [obj for obj in state.objects.values() if obj['object_type'] == kind]
@@ -0,0 +1,208 @@
+"""
+/batch creation: pairs are packed into requests, every answer is mapped back to
+its spec and a failed /batch request fails only its own pairs
+"""
+import json
+from urllib.parse import parse_qs
+
+import pytest
+
+from conftest import MATRIX_ARGS, created_objects, fail_batch_requests, read_log, run_create
+from utils.campaign_builder import GraphAPIError, create_campaigns_batch, update_objects_batch
+from utils.dead_letter import load_dead_letters
+
+
+API_CONFIG = {'base_url': 'https://graph.test', 'api_version': 'v23.0', 'access_token': 'token'}
+
+ADSET_PARAMS = {
+    'daily_budget': 10,
+    'optimization_goal': 'APP_INSTALLS',
+    'bid_strategy': 'LOWEST_COST_WITHOUT_CAP',
+    'object_store_url': 'https://play.google.com/store/apps/details?id=com.example',
+    'application_id': '1',
+    'targeting_countries': ['US'],
+    'age_min': 18,
+    'age_max': 65,
+    'genders': [1],
+    'user_os': 'Android'
+}
+
+
+def make_specs(count, account_id='1'):
+    return [
+        {
+            'account_id': account_id,
+            'name': f"campaign_{i}",
+            'objective': 'OUTCOME_APP_PROMOTION',
+            'adset_params': ADSET_PARAMS,
+            'use_targeting_spec': True
+        }
+        for i in range(count)
+    ]
+
+
+class FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+
+class FakeBatchClient:
+    """
+    GraphClient stand-in that answers /batch requests the way Graph does:
+    campaigns get IDs, ad sets whose campaign failed are not executed (null).
+    mangle maps a request number (1-based) to a function that turns the
+    operation results into the response body.
+    """
+    api_config = API_CONFIG
+
+    def __init__(self, failing_names=(), status_code=200):
+        self.failing_names = set(failing_names)
+        self.status_code = status_code
+        self.mangle = {}
+        self.requests = []
+
+    def post(self, path, data=None, **kwargs):
+        assert path == ''
+        operations = json.loads(data['batch'])
+        self.requests.append(operations)
+        if self.status_code != 200:
+            return FakeResponse(self.status_code, json.dumps({'error': {'message': 'unavailable'}}))
+
+        items = []
+        created = {}
+        for operation in operations:
+            body = {key: values[0] for key, values in parse_qs(operation['body']).items()}
+            if 'name' not in body:
+                items.append({'code': 200, 'body': json.dumps({'success': True})})
+                continue
+            if body['name'] in self.failing_names:
+                items.append({'code': 400, 'body': json.dumps({'error': {'message': 'invalid'}})})
+                continue
+            if operation['relative_url'].endswith('/campaigns'):
+                created[operation['name']] = f"c{len(created)}"
+                items.append({'code': 200, 'body': json.dumps({'id': created[operation['name']]})})
+                continue
+            ref = body['campaign_id'][len('{result='):-len(':$.id}')]
+            if ref not in created:
+                items.append(None)
+                continue
+            items.append({'code': 200, 'body': json.dumps({'id': f"a{created[ref]}"})})
+        return FakeResponse(200, self.mangle.get(len(self.requests), json.dumps)(items))
+
+
+@pytest.fixture
+def fake_client():
+    return FakeBatchClient()
+
+
+def test_pairs_are_packed_into_requests_of_50_operations(fake_client):
+    results = create_campaigns_batch(make_specs(60), client=fake_client)
+
+    assert [len(operations) for operations in fake_client.requests] == [50, 50, 20]
+    assert [result['error'] for result in results] == [None] * 60
+    assert [result['spec']['name'] for result in results] == [f"campaign_{i}" for i in range(60)]
+    # Every ad set references the campaign of its own pair
+    campaign_op, adset_op = fake_client.requests[1][:2]
+    assert campaign_op['name'] == 'campaign_25'
+    assert parse_qs(adset_op['body'])['campaign_id'] == ['{result=campaign_25:$.id}']
+    assert (results[25]['campaign_id'], results[25]['adset_id']) == ('c0', 'ac0')
+
+
+def test_failed_operations_are_reported_per_pair(fake_client):
+    fake_client.failing_names = {'campaign_1'}
+
+    results = create_campaigns_batch(make_specs(3), client=fake_client)
+
+    assert [bool(result['error']) for result in results] == [False, True, False]
+    assert results[1]['error'].startswith('Error creating campaign: 400')
+    assert (results[1]['campaign_id'], results[1]['adset_id']) == (None, None)
+    assert results[2]['adset_id'] == 'ac1'
+
+
+@pytest.mark.parametrize('mangle, message', [
+    (lambda items: json.dumps(items[:-1]), 'expected 50 results, got 49'),
+    (lambda items: json.dumps({'data': items}), 'invalid response body'),
+    (lambda items: json.dumps(items)[:-10], 'invalid response body'),
+    (lambda items: json.dumps(['ok'] * len(items)), 'invalid response body')
+])
+def test_malformed_batch_response_fails_only_its_pairs(fake_client, mangle, message):
+    fake_client.mangle = {2: mangle}
+
+    results = create_campaigns_batch(make_specs(60), client=fake_client)
+
+    assert [i for i, result in enumerate(results) if result['error']] == list(range(25, 50))
+    assert message in results[25]['error']
+    assert isinstance(results[25]['batch_error'], GraphAPIError)
+    assert results[50]['campaign_id'] and results[50]['adset_id']
+
+
+def test_short_update_response_fails_the_updates_of_its_request(fake_client):
+    fake_client.mangle = {1: lambda items: json.dumps(items[:1])}
+    updates = [{'account_id': '1', 'object_id': str(i), 'fields': {'bid_amount': 50}} for i in range(3)]
+
+    results = update_objects_batch(updates, client=fake_client)
+
+    assert [result['error'] for result in results] == [
+        f"Error updating {i}: Error executing batch: expected 3 results, got 1" for i in range(3)
+    ]
+
+def test_batch_creates_all_pairs(client, mock_state):
+    results = create_campaigns_batch(make_specs(30), client=client)
+
+    assert [result['error'] for result in results] == [None] * 30
+    assert len(created_objects(mock_state, 'campaign')) == 30
+    adsets = created_objects(mock_state, 'adset')
+    assert {adset['campaign_id'] for adset in adsets} == {result['campaign_id'] for result in results}
+
+
+def test_failed_batch_request_keeps_other_chunks(client, mock_state, monkeypatch):
+    # 60 pairs = 3 /batch requests of 25, 25 and 10 pairs; the second one is lost
+    fail_batch_requests(monkeypatch, {2})
+
+    results = create_campaigns_batch(make_specs(60), client=client)
+
+    failed = [i for i, result in enumerate(results) if result['error']]
+    assert failed == list(range(25, 50))
+    for i in failed:
+        assert results[i]['campaign_id'] is None
+        assert isinstance(results[i]['batch_error'], OSError)
+    created = [result for result in results if not result['error']]
+    assert all(result['campaign_id'] and result['adset_id'] and result['batch_error'] is None for result in created)
+    assert len(created_objects(mock_state, 'campaign')) == 35
+
+
+def test_invalid_spec_fails_only_its_chunk(client, mock_state):
+    specs = make_specs(2, account_id='1') + make_specs(2, account_id='2')
+    specs[0] = dict(specs[0], adset_params={key: value for key, value in ADSET_PARAMS.items() if key != 'genders'})
+
+    results = create_campaigns_batch(specs, client=client)
+
+    assert [bool(result['error']) for result in results] == [True, True, False, False]
+    assert isinstance(results[0]['batch_error'], KeyError)
+    assert len(created_objects(mock_state, 'campaign')) == 2
+
+
+def test_cli_batch_logs_created_pairs_and_dead_letters_the_rest(mock_server, mock_state, monkeypatch, workdir):
+    fail_batch_requests(monkeypatch, {2})
+
+    run_create(mock_server, *MATRIX_ARGS, '--batch', '--logs-file', 'logs.csv',
+               '--journal', 'run.jsonl', '--dead-letter', 'dead.jsonl')
+
+    logged = read_log(workdir / 'logs.csv')
+    letters = load_dead_letters(str(workdir / 'dead.jsonl'))
+    assert len(logged) == 72 - 25
+    assert len(letters) == 25
+    assert {row['campaign_name'] for row in logged}.isdisjoint(entry['name'] for entry in letters.values())
+    assert {entry['error_type'] for entry in letters.values()} == {'network'}
+    # Every logged pair exists on the server; nothing was created for the lost request
+    assert {row['campaign_id'] for row in logged} == {obj['id'] for obj in created_objects(mock_state, 'campaign')}
+
+    # The journal has the created pairs as completed, the lost ones as failed
+    with open(workdir / 'run.jsonl', encoding='utf-8') as f:
+        events = [json.loads(line)['event'] for line in f]
+    assert events.count('completed') == 47
+    assert events.count('failed') == 25
@@ -0,0 +1,102 @@
+"""
+Campaign service: specs are validated on submit and created by the shared work queue
+"""
+import time
+
+import pytest
+
+from campaign_service import CampaignService, expand_spec, normalize_spec
+from conftest import PROJECT, created_objects, read_log, run_create
+from utils.config_loader import DICTIONARIES_DIR, registry
+from utils.journal import RunJournal, load_journal
+
+
+DEFAULTS = {'project': PROJECT, 'age': '18-65+', 'budget': 10, 'bid': 0.3}
+
+
+@pytest.fixture
+def service(client, workdir):
+    journal = RunJournal(str(workdir / 'service.jsonl'))
+    service = CampaignService(client, journal, concurrency=2, logs_file='logs.csv').start()
+    yield service
+    service.stop()
+    journal.close()
+
+
+def wait_for(service, finished, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        jobs = service.status()['jobs']
+        if jobs['completed'] + jobs['failed'] >= finished:
+            return jobs
+        time.sleep(0.05)
+    raise AssertionError(f"jobs did not finish: {service.status()['jobs']}")
+
+
+def test_matrix_values_stay_lists():
+    raw = normalize_spec({'tier': 'LatAm', 'gender': ['M', 'F'], 'bid': ['0.3', 0.5], 'budget': '10'})
+
+    assert (raw['gender'], raw['bid'], raw['budget']) == (['M', 'F'], [0.3, 0.5], 10.0)
+    with pytest.raises(ValueError, match="'gender' must not be an empty list"):
+        normalize_spec({'gender': []})
+    with pytest.raises(ValueError, match='spec must be a JSON object'):
+        normalize_spec(['LatAm'])
+
+
+def test_one_bad_combination_rejects_the_whole_spec():
+    assert len(expand_spec({'tier': 'LatAm', 'gender': ['M', 'F']}, DEFAULTS)) == 2
+    with pytest.raises(ValueError, match="'gender' must be one of"):
+        expand_spec({'tier': 'LatAm', 'gender': ['M', 'X']}, DEFAULTS)
+
+
+def test_list_valued_project_fields_are_rejected(mock_server, monkeypatch, capsys):
+    # The real projects.json: Mirai lists two objectives and two store URLs
+    monkeypatch.setattr(registry, 'directory', DICTIONARIES_DIR)
+    registry.invalidate()
+
+    with pytest.raises(ValueError, match="Project 'Mirai' has several 'campaign_objective' values"):
+        expand_spec({'tier': 'LatAm', 'gender': 'M'}, dict(DEFAULTS, project='Mirai'))
+
+    assert run_create(mock_server, '--project', 'Mirai', '--tier', 'LatAm', '--gender', 'M', '--age', '18-65+') == 1
+    assert "Project 'Mirai' has several 'campaign_objective' values" in capsys.readouterr().out
+
+
+def test_submitted_specs_are_created_by_the_queue(service, mock_state, workdir):
+    answer = service.submit({
+        'defaults': DEFAULTS,
+        'specs': [
+            {'tier': 'LatAm', 'gender': ['M', 'F', 'MF']},
+            {'tier': 'LatAm', 'gender': 'M', 'project': 'Unknown'}
+        ]
+    })
+
+    assert [job['spec'] for job in answer['accepted']] == [1, 1, 1]
+    assert [rejected['spec'] for rejected in answer['rejected']] == [2]
+    assert wait_for(service, 3) == {'queued': 0, 'running': 0, 'completed': 3, 'failed': 0}
+
+    keys = [job['key'] for job in answer['accepted']]
+    jobs = [service.job(key) for key in keys]
+    assert all(job['campaign_id'] and job['adset_id'] for job in jobs)
+    assert {job['campaign_id'] for job in jobs} == {obj['id'] for obj in created_objects(mock_state, 'campaign')}
+    assert sorted(row['campaign_name'] for row in read_log(workdir / 'logs.csv')) == sorted(job['name'] for job in jobs)
+    # Every accepted job is journaled, so a stopped service can be resumed
+    assert [key for key, entry in load_journal(str(workdir / 'service.jsonl')).items() if entry['completed']] == keys
+
+
+def test_failed_jobs_are_reported(service, mock_state):
+    mock_state.error_rate = 1.0
+    service.client.max_retries = 0
+
+    answer = service.submit(dict(DEFAULTS, tier='LatAm', gender='M'))
+
+    assert wait_for(service, 1)['failed'] == 1
+    job = service.job(answer['accepted'][0]['key'])
+    assert job['state'] == 'failed' and job['error'].startswith('Error creating campaign or ad set')
+
+
+def test_stopping_service_takes_no_more_specs(service):
+    service.stop()
+    with pytest.raises(RuntimeError, match='shutting down'):
+        service.submit(dict(DEFAULTS, tier='LatAm', gender='M'))
+    with pytest.raises(ValueError, match="'specs' must be a list"):
+        service.submit({'specs': {}})
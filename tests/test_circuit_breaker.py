@@ -0,0 +1,118 @@
+"""
+Circuit breaker state transitions and how GraphClient feeds it
+"""
+import pytest
+
+from utils.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from utils.http_client import GraphClient
+from utils.mock_graph_server import MockGraphServer, MockGraphState
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(failure_threshold=3, reset_timeout=10.0, clock=clock)
+
+
+def fail(breaker, times, account_id='1', endpoint='campaigns'):
+    for _ in range(times):
+        breaker.before_request(account_id, endpoint)
+        breaker.record_failure(account_id, endpoint)
+
+
+def test_opens_after_consecutive_failures(breaker):
+    fail(breaker, 2)
+    breaker.record_success('1', 'campaigns')
+    fail(breaker, 2)
+    assert breaker.state('1', 'campaigns') == CLOSED
+
+    fail(breaker, 1)
+    assert breaker.state('1', 'campaigns') == OPEN
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.before_request('1', 'campaigns')
+    assert error.value.retry_in == 10.0
+    assert breaker.open_circuits() == {('1', 'campaigns'): 3}
+
+
+def test_circuits_are_per_account_and_endpoint(breaker):
+    fail(breaker, 3)
+    breaker.before_request('1', 'adsets')
+    breaker.before_request('2', 'campaigns')
+    assert breaker.state('2', 'campaigns') == CLOSED
+
+
+def test_half_open_lets_one_probe_through(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 10.0
+
+    breaker.before_request('1', 'campaigns')
+    assert breaker.state('1', 'campaigns') == HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('1', 'campaigns')
+
+    breaker.record_success('1', 'campaigns')
+    assert breaker.state('1', 'campaigns') == CLOSED
+    assert breaker.open_circuits() == {}
+
+
+def test_failed_probe_reopens(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 10.0
+    fail(breaker, 1)
+
+    assert breaker.state('1', 'campaigns') == OPEN
+    clock.now += 9.0
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request('1', 'campaigns')
+
+
+def test_lost_probe_expires(breaker, clock):
+    fail(breaker, 3)
+    clock.now += 10.0
+    breaker.before_request('1', 'campaigns')
+
+    # No answer to the probe for a whole reset_timeout: another probe is let through
+    clock.now += 10.0
+    breaker.before_request('1', 'campaigns')
+    assert breaker.state('1', 'campaigns') == HALF_OPEN
+
+
+def test_zero_threshold_disables_the_breaker(clock):
+    breaker = CircuitBreaker(failure_threshold=0, clock=clock)
+    fail(breaker, 50)
+    assert breaker.state('1', 'campaigns') == CLOSED
+
+
+def test_client_counts_only_api_failures(client):
+    # Validation errors (4xx) mean the API works: they never open the circuit
+    client.breaker = CircuitBreaker(failure_threshold=2)
+    for _ in range(3):
+        response = client.post('act_1/campaigns', data={'objective': 'OUTCOME_APP_PROMOTION'})
+        assert response.status_code == 400
+    assert client.breaker.state('1', 'campaigns') == CLOSED
+
+
+def test_client_fails_fast_once_the_circuit_opens():
+    with MockGraphServer(MockGraphState(error_rate=1.0)) as server:
+        client = GraphClient(server.api_config(), max_retries=1, breaker=CircuitBreaker(failure_threshold=2))
+        for _ in range(2):
+            assert client.post('act_1/campaigns', data={'name': 'a'}).status_code == 500
+        requests_sent = server.state.request_count
+
+        with pytest.raises(CircuitOpenError):
+            client.post('act_1/campaigns', data={'name': 'a'})
+        assert server.state.request_count == requests_sent
+        # Other accounts are not affected
+        assert client.post('act_2/campaigns', data={'name': 'a'}).status_code == 500
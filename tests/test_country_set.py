@@ -0,0 +1,49 @@
+"""
+Country bitsets: the universe is rebuilt only when the tier / group dictionaries change
+"""
+import json
+import shutil
+
+from utils import country_set
+from utils.config_loader import registry
+from utils.country_set import get_country_universe
+
+
+def count_loads(monkeypatch):
+    calls = []
+    load_file = registry.load_file
+
+    def counting(path):
+        calls.append(path)
+        return load_file(path)
+
+    monkeypatch.setattr(registry, 'load_file', counting)
+    return calls
+
+
+def test_universe_is_reused_between_rechecks(monkeypatch):
+    universe = get_country_universe()
+    calls = count_loads(monkeypatch)
+
+    assert get_country_universe() is universe
+    assert calls == []
+
+    # After the interval the dictionaries are checked, unchanged ones are not rebuilt
+    monkeypatch.setattr(country_set, 'COUNTRY_UNIVERSE_RECHECK_SECONDS', 0.0)
+    assert get_country_universe() is universe
+    assert len(calls) == 2
+
+
+def test_changed_tiers_are_picked_up_after_invalidate(dictionaries, tmp_path, monkeypatch):
+    directory = shutil.copytree(dictionaries, tmp_path / 'dictionaries')
+    monkeypatch.setattr(registry, 'directory', str(directory))
+    registry.invalidate()
+    universe = get_country_universe()
+
+    tiers = json.loads((directory / 'tiers.json').read_text(encoding='utf-8'))
+    tiers['Test tier'] = ['US']
+    (directory / 'tiers.json').write_text(json.dumps(tiers), encoding='utf-8')
+    assert get_country_universe() is universe
+
+    registry.invalidate()
+    assert get_country_universe() is not universe
@@ -0,0 +1,91 @@
+"""
+Dead-letter file and --replay
+"""
+import pytest
+import requests
+
+from conftest import created_objects, read_log, run_create
+from utils.campaign_builder import GraphAPIError
+from utils.circuit_breaker import CircuitOpenError
+from utils.dead_letter import DeadLetterFile, error_type, load_dead_letters, pending_dead_letters
+
+
+LAUNCH = ['--tier', 'LatAm', '--gender', 'M,F,MF', '--age', '18-65+']
+FILES = ['--logs-file', 'logs.csv', '--dead-letter', 'dead.jsonl']
+
+
+@pytest.mark.parametrize('error, kind', [
+    (CircuitOpenError('1', 'campaigns', 5, 30.0), 'circuit_open'),
+    (GraphAPIError('Error creating campaign: 500', 500), 'api'),
+    (requests.ConnectionError('reset'), 'network'),
+    (ValueError('Geo targeting is not defined'), 'invalid_spec'),
+    (RuntimeError('bug'), 'error')
+])
+def test_error_type(error, kind):
+    assert error_type(error) == kind
+
+
+def test_dead_letter_file_is_created_on_first_failure(workdir):
+    path = str(workdir / 'dead.jsonl')
+    spec = {'camp_data': {'name': 'a', 'account_id': '1'}}
+    with DeadLetterFile(path) as dead_letters:
+        dead_letters.resumable('123')
+        assert dead_letters.unfinished == 1 and not (workdir / 'dead.jsonl').exists()
+
+        first = dead_letters.failed(spec, 'boom', error_type='api')
+        dead_letters.failed(spec, 'boom again', error_type='network', attempts=2, letter_id=first)
+        second = dead_letters.failed(dict(spec, camp_data={'name': 'b', 'account_id': '1'}), 'boom')
+        dead_letters.replayed(second, '1', '2')
+
+    entries = load_dead_letters(path)
+    assert list(entries) == ['1', '2']
+    assert (entries['1']['attempts'], entries['1']['error_type']) == (2, 'network')
+    assert list(pending_dead_letters(entries)) == ['1']
+
+
+def test_replay_creates_failed_campaigns_once(mock_server, mock_state, workdir, capsys):
+    mock_state.error_rate = 1.0
+    run_create(mock_server, *LAUNCH, *FILES, '--breaker-threshold', '1')
+
+    letters = load_dead_letters(str(workdir / 'dead.jsonl'))
+    assert len(letters) == 3
+    # The first failure opens the circuit: the other campaigns are not even sent
+    assert [entry['error_type'] for entry in letters.values()] == ['api', 'circuit_open', 'circuit_open']
+    assert "Circuit open: account" in capsys.readouterr().out
+
+    mock_state.error_rate = 0.0
+    run_create(mock_server, '--replay', 'dead.jsonl', *FILES)
+
+    assert len(read_log(workdir / 'logs.csv')) == 3
+    assert len(created_objects(mock_state, 'campaign')) == 3
+    assert not pending_dead_letters(load_dead_letters(str(workdir / 'dead.jsonl')))
+
+    run_create(mock_server, '--replay', 'dead.jsonl', *FILES)
+    assert "Nothing to replay." in capsys.readouterr().out
+    assert len(created_objects(mock_state, 'campaign')) == 3
+
+
+def test_replay_skips_campaigns_already_in_the_log(mock_server, mock_state, workdir, capsys):
+    mock_state.error_rate = 1.0
+    run_create(mock_server, *LAUNCH, *FILES, '--breaker-threshold', '0', '--concurrency', '3')
+    mock_state.error_rate = 0.0
+    # The campaigns were created after all (e.g. by a manual rerun)
+    run_create(mock_server, *LAUNCH, *FILES)
+    capsys.readouterr()
+
+    run_create(mock_server, '--replay', 'dead.jsonl', *FILES)
+
+    assert capsys.readouterr().out.count("already in logs.csv: will be skipped") == 3
+    assert len(created_objects(mock_state, 'campaign')) == 3
+    assert not pending_dead_letters(load_dead_letters(str(workdir / 'dead.jsonl')))
+
+
+def test_failed_replay_keeps_the_record(mock_server, mock_state, workdir):
+    mock_state.error_rate = 1.0
+    run_create(mock_server, *LAUNCH, *FILES, '--breaker-threshold', '1')
+    run_create(mock_server, '--replay', 'dead.jsonl', *FILES, '--breaker-threshold', '1')
+
+    letters = load_dead_letters(str(workdir / 'dead.jsonl'))
+    assert len(letters) == 3
+    assert {entry['attempts'] for entry in letters.values()} == {2}
+    assert not (workdir / 'logs.csv').exists()
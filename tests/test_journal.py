@@ -0,0 +1,120 @@
+"""
+Run journal: --resume finishes half-created pairs without creating campaigns twice
+"""
+import pytest
+
+import create_campaign_universal
+from conftest import MATRIX_ARGS, created_objects, read_log, run_create, run_main
+from utils.campaign_builder import GraphAPIError
+from utils.journal import RunJournal, load_journal, pending_entries
+
+
+def test_journal_folds_events_and_skips_truncated_line(workdir):
+    path = str(workdir / 'run.jsonl')
+    with RunJournal(path) as journal:
+        first = journal.planned({'name': 'a'})
+        journal.campaign_created(first, '1')
+        journal.adset_created(first, '2')
+        journal.completed(first)
+        second = journal.planned({'name': 'b'})
+        journal.campaign_created(second, '3')
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "adset", "key": "2", "ads')
+
+    # Appending after a crash does not glue the new record to the broken line
+    with RunJournal(path) as journal:
+        third = journal.planned({'name': 'c'})
+
+    entries = load_journal(path)
+    assert third == '3'
+    assert list(pending_entries(entries)) == ['2', '3']
+    assert entries['2']['campaign_id'] == '3' and entries['2']['adset_id'] is None
+
+
+class FakeAPI:
+    """create_campaign_via_api / create_adset_via_api stand-ins that record the calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def create_campaign(self, account_id, name, objective, client=None):
+        self.calls.append(('campaign', name))
+        return f"c_{name}"
+
+    def create_adset(self, account_id, campaign_id, name, params, use_targeting_spec=False, client=None):
+        self.calls.append(('adset', campaign_id))
+        return f"a_{campaign_id}"
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeAPI()
+    monkeypatch.setattr(create_campaign_universal, 'create_campaign_via_api', fake.create_campaign)
+    monkeypatch.setattr(create_campaign_universal, 'create_adset_via_api', fake.create_adset)
+    monkeypatch.setattr('builtins.input', lambda prompt='': 'yes')
+    return fake
+
+
+def write_interrupted_run(path):
+    """Journal of a run that stopped after the first pair and the second campaign"""
+    with RunJournal(path) as journal:
+        keys = []
+        for name in ('done', 'half', 'new'):
+            spec = {
+                'camp_data': {'name': name, 'account_id': '1', 'tier': 'LatAm'},
+                'objective': 'OUTCOME_APP_PROMOTION',
+                'adset_params': {}
+            }
+            keys.append(journal.planned(spec))
+        journal.campaign_created(keys[0], 'c_done')
+        journal.adset_created(keys[0], 'a_c_done')
+        journal.completed(keys[0])
+        journal.campaign_created(keys[1], 'c_half')
+
+
+def test_resume_creates_only_missing_objects(api, workdir, capsys):
+    path = str(workdir / 'run.jsonl')
+    write_interrupted_run(path)
+
+    assert run_main(create_campaign_universal, ['--resume', path]) == 0
+
+    # The half-created pair gets only its ad set, the campaign is not created twice
+    assert api.calls == [('adset', 'c_half'), ('campaign', 'new'), ('adset', 'c_new')]
+    assert [row['campaign_name'] for row in read_log(workdir / 'logs.csv')] == ['half', 'new']
+    assert not pending_entries(load_journal(path))
+
+    api.calls.clear()
+    assert run_main(create_campaign_universal, ['--resume', path]) == 0
+    assert api.calls == []
+    assert "Nothing to resume." in capsys.readouterr().out
+
+
+def test_campaigns_without_ad_set_are_left_to_resume(mock_server, mock_state, monkeypatch, workdir, capsys):
+    create_adset = create_campaign_universal.create_adset_via_api
+
+    def failing_for_women(account_id, campaign_id, name, *args, **kwargs):
+        if '_F_' in name:
+            raise GraphAPIError("Error creating adset: 500 - unavailable", 500)
+        return create_adset(account_id, campaign_id, name, *args, **kwargs)
+
+    monkeypatch.setattr(create_campaign_universal, 'create_adset_via_api', failing_for_women)
+    run_create(mock_server, *MATRIX_ARGS, '--concurrency', '4', '--logs-file', 'logs.csv',
+               '--journal', 'run.jsonl', '--dead-letter', 'dead.jsonl')
+
+    # 24 campaigns have no ad set: they stay in the journal, not in the dead-letter file
+    assert len(read_log(workdir / 'logs.csv')) == 48
+    assert len(created_objects(mock_state, 'campaign')) == 72
+    assert not (workdir / 'dead.jsonl').exists()
+    assert "Unfinished: 24 campaign(s) created without an ad set (finish with --resume run.jsonl)" in capsys.readouterr().out
+    pending = pending_entries(load_journal(str(workdir / 'run.jsonl')))
+    assert len(pending) == 24 and all(entry['campaign_id'] for entry in pending.values())
+
+    monkeypatch.setattr(create_campaign_universal, 'create_adset_via_api', create_adset)
+    run_create(mock_server, '--resume', 'run.jsonl', '--logs-file', 'logs.csv', '--dead-letter', 'dead.jsonl')
+
+    names = [row['campaign_name'] for row in read_log(workdir / 'logs.csv')]
+    assert len(names) == 72 and len(set(names)) == 72
+    assert len(created_objects(mock_state, 'campaign')) == 72
+    adsets = created_objects(mock_state, 'adset')
+    assert {adset['campaign_id'] for adset in adsets} == {obj['id'] for obj in created_objects(mock_state, 'campaign')}
+    assert not pending_entries(load_journal(str(workdir / 'run.jsonl')))
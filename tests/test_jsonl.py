@@ -0,0 +1,38 @@
+"""
+Append-only JSONL files shared by the run journal and the dead-letter file
+"""
+from utils.dead_letter import DeadLetterFile, load_dead_letters
+from utils.jsonl import iter_jsonl, open_jsonl_for_append
+
+
+def test_reader_skips_blank_and_truncated_lines(workdir):
+    path = workdir / 'records.jsonl'
+    path.write_text('{"a": 1}\n\n{"a": 2}\n{"a": ', encoding='utf-8')
+
+    assert list(iter_jsonl(str(path))) == [{'a': 1}, {'a': 2}]
+
+
+def test_append_closes_a_truncated_line(workdir):
+    path = workdir / 'logs' / 'records.jsonl'
+    with open_jsonl_for_append(str(path)) as f:
+        f.write('{"a": 1}\n{"a": ')
+    with open_jsonl_for_append(str(path)) as f:
+        f.write('{"a": 3}\n')
+
+    assert path.read_text(encoding='utf-8') == '{"a": 1}\n{"a": \n{"a": 3}\n'
+    assert list(iter_jsonl(str(path))) == [{'a': 1}, {'a': 3}]
+
+
+def test_dead_letter_file_survives_a_crash_mid_record(workdir):
+    path = str(workdir / 'dead.jsonl')
+    spec = {'camp_data': {'name': 'a', 'account_id': '1'}}
+    with DeadLetterFile(path) as dead_letters:
+        dead_letters.failed(spec, 'boom')
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write('{"event": "failed", "id": "2", "sp')
+
+    with DeadLetterFile(path) as dead_letters:
+        second = dead_letters.failed(dict(spec, camp_data={'name': 'b', 'account_id': '1'}), 'boom')
+
+    assert second == '2'
+    assert [entry['name'] for entry in load_dead_letters(path).values()] == ['a', 'b']
@@ -0,0 +1,89 @@
+"""
+SQLite ledger: logs.csv migration, queries, duplicate guard and reconciliation
+against the accounts on the mock server
+"""
+import os
+import shutil
+
+import campaign_ledger
+from conftest import MATRIX_ARGS, created_objects, read_log, run_create, run_main
+from utils.campaign_builder import create_campaign_via_api
+from utils.config_loader import registry
+from utils.ledger import get_ledger
+from utils.reconcile import Reconciler
+
+
+def test_migrate_csv_is_idempotent(mock_server, workdir, capsys):
+    run_create(mock_server, *MATRIX_ARGS, '--batch', '--logs-file', 'logs.csv')
+    rows = read_log(workdir / 'logs.csv')
+
+    assert run_main(campaign_ledger, ['--ledger', 'ledger.db', 'migrate', '--logs-file', 'logs.csv']) == 0
+    assert run_main(campaign_ledger, ['--ledger', 'ledger.db', 'migrate', '--logs-file', 'logs.csv']) == 0
+
+    ledger = get_ledger(str(workdir / 'ledger.db'))
+    assert ledger.count() == len(rows) == 72
+    entries = list(ledger.query(where={'gender': ['f'], 'age': ['25-45']}))
+    assert len(entries) == 8
+    assert {entry['source'] for entry in entries} == {'csv'}
+    assert {entry['campaign_id'] for entry in entries} <= {row['campaign_id'] for row in rows}
+
+
+def test_ledger_run_skips_campaigns_already_created(mock_server, mock_state, workdir, capsys):
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M,F', '--age', '18-65+', '--ledger', 'ledger.db')
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M,F,MF', '--age', '18-65+', '--ledger', 'ledger.db')
+
+    ledger = get_ledger(str(workdir / 'ledger.db'))
+    assert ledger.count() == 3
+    assert len(created_objects(mock_state, 'campaign')) == 3
+    entry = next(ledger.query(where={'gender': ['MF']}))
+    assert entry['account_id'] and entry['spec']['camp_data']['name'] == entry['campaign_name']
+
+
+def reconcile(workdir, client):
+    reconciler = Reconciler(get_ledger(str(workdir / 'ledger.db')), client)
+    return {(finding['type'], finding['id']) for finding in reconciler.run(registry['accounts'])}
+
+
+def test_reconcile_reports_drift(mock_server, mock_state, client, workdir):
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M,F,MF', '--age', '18-65+,25-45', '--ledger', 'ledger.db')
+    assert reconcile(workdir, client) == set()
+
+    campaigns = created_objects(mock_state, 'campaign')
+    adsets = created_objects(mock_state, 'adset')
+    deleted, renamed = campaigns[0], campaigns[1]
+    rebudgeted = next(adset for adset in adsets if adset['campaign_id'] == campaigns[2]['id'])
+    mock_state.update_object(deleted['id'], {'status': 'DELETED'})
+    mock_state.update_object(renamed['id'], {'name': 'renamed by hand'})
+    mock_state.update_object(rebudgeted['id'], {'daily_budget': '99900'})
+    orphan = create_campaign_via_api(campaigns[0]['account_id'], 'created by hand', 'OUTCOME_APP_PROMOTION', client=client)
+
+    assert reconcile(workdir, client) == {
+        ('removed_campaign', deleted['id']),
+        ('name_drift', renamed['id']),
+        ('budget_drift', rebudgeted['id']),
+        ('orphan_campaign', orphan)
+    }
+
+
+def test_reconcile_cli_lists_findings(mock_server, mock_state, workdir, capsys):
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M', '--age', '18-65+', '--ledger', 'ledger.db')
+    args = ['--ledger', 'ledger.db', 'reconcile', '--api-base', mock_server.base_url]
+
+    assert run_main(campaign_ledger, args) == 0
+    assert "Ledger matches the accounts" in capsys.readouterr().out
+
+    mock_state.update_object(created_objects(mock_state, 'adset')[0]['id'], {'status': 'DELETED'})
+    assert run_main(campaign_ledger, args) == 0
+    assert "removed_adset: 1" in capsys.readouterr().out
+
+
+def test_reconcile_cli_needs_no_api_config_with_api_base(mock_server, dictionaries, tmp_path, monkeypatch, capsys):
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M', '--age', '18-65+', '--ledger', 'ledger.db')
+    without_config = shutil.copytree(dictionaries, tmp_path / 'no_api_config')
+    os.remove(without_config / 'api_config.json')
+    monkeypatch.setattr(registry, 'directory', str(without_config))
+    registry.invalidate()
+
+    args = ['--ledger', 'ledger.db', 'reconcile', '--api-base', mock_server.base_url]
+    assert run_main(campaign_ledger, args) == 0
+    assert "Ledger matches the accounts" in capsys.readouterr().out
@@ -0,0 +1,23 @@
+"""
+Adlocale cache: one file in cache/ of the project, whatever the working directory
+"""
+import os
+
+import create_campaign_universal
+from conftest import run_main
+from utils.config_loader import BASE_DIR
+from utils.locale_resolver import DEFAULT_CACHE_PATH, get_locale_resolver
+
+
+def test_default_cache_is_in_the_project_directory():
+    assert DEFAULT_CACHE_PATH == os.path.join(BASE_DIR, 'cache', 'adlocales.json')
+
+
+def test_refresh_fills_the_cache(mock_server, workdir, capsys):
+    args = ['--refresh-locales', '--api-base', mock_server.base_url]
+    assert run_main(create_campaign_universal, args) == 0
+
+    cache_path = str(workdir / 'cache' / 'adlocales.json')
+    assert f"in {cache_path}" in capsys.readouterr().out
+    assert os.path.exists(cache_path)
+    assert get_locale_resolver().lookup('English')
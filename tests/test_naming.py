@@ -0,0 +1,73 @@
+"""
+Campaign names: parse_campaign_name inverts generate_campaign_name; CampaignNameIndex queries
+"""
+import pytest
+
+from utils.naming import CampaignNameIndex, NAMING_FIELDS, generate_campaign_name, parse_campaign_name
+
+
+BASE = {
+    'os': 'AND',
+    'tier': 'Latam',
+    'naming_countries': [],
+    'gender': 'MF',
+    'age': '18-65+',
+    'opt_model': 'CPI',
+    'event': None,
+    'date': '16112025',
+    'autor': 'KH',
+    'campaign_type': 'noCBO',
+    'bid_strategy_short': 'bc',
+    'lang': 'ALL',
+    'extra': None
+}
+
+
+@pytest.mark.parametrize('overrides', [
+    {},
+    {'naming_countries': ['US', 'CA']},
+    {'opt_model': 'CPA', 'event': '40ads'},
+    {'tier': 'Tier-1', 'gender': 'F', 'age': '25-45', 'lang': 'ENG'},
+    # The account name may contain "_": EXTRA takes the rest of the name
+    {'extra': 'account_2'}
+])
+def test_parse_inverts_generate(overrides):
+    params = dict(BASE, **overrides)
+
+    fields = parse_campaign_name(generate_campaign_name(params))
+
+    assert list(fields) == NAMING_FIELDS
+    assert fields == params
+
+
+def test_event_is_named_only_for_cpa():
+    name = generate_campaign_name(dict(BASE, opt_model='CPI', event='40ads'))
+    assert '[' not in name
+    assert parse_campaign_name(name)['event'] is None
+
+
+def test_legacy_name_with_project_segment():
+    fields = parse_campaign_name('AND_LK_Latam_M_18-65+_CPA[4sessions]_01032025_KH_noCBO_bc_ENG')
+    assert (fields['project'], fields['tier'], fields['event']) == ('LK', 'Latam', '4sessions')
+
+
+def test_unrelated_names_are_not_parsed():
+    assert parse_campaign_name('Campaign created by hand') is None
+
+
+def test_index_queries_intersect_fields():
+    names = [
+        generate_campaign_name(dict(BASE, gender='M', date='01032025', extra='account_2')),
+        generate_campaign_name(dict(BASE, gender='F', date='01032025', naming_countries=['US'])),
+        generate_campaign_name(dict(BASE, gender='M', date='01042025')),
+        'not a campaign name'
+    ]
+    index = CampaignNameIndex(names)
+
+    assert len(index) == 3 and index.unparsed == 1
+    assert [entry.name for entry in index.query(gender='m', month='2025-03')] == [names[0]]
+    assert [entry.name for entry in index.query(gender=['M', 'F'], year='2025')] == names[:3]
+    assert [entry.name for entry in index.query(naming_countries='US')] == [names[1]]
+    assert index.query(extra='account_2', month='2025-04') == []
+    with pytest.raises(KeyError):
+        index.query(budget='50')
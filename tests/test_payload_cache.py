@@ -0,0 +1,55 @@
+"""
+Cached targeting / promoted_object fragments of the ad set payload
+"""
+import json
+
+import pytest
+
+from test_batch import ADSET_PARAMS
+from utils.campaign_builder import _targeting_json, build_adset_payload, clear_payload_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    clear_payload_cache()
+    yield
+    clear_payload_cache()
+
+
+def test_payload_fragments_are_built_once():
+    first = build_adset_payload('1', 'a', ADSET_PARAMS, use_targeting_spec=True)
+    second = build_adset_payload('2', 'b', dict(ADSET_PARAMS, daily_budget=20), use_targeting_spec=True)
+
+    assert second['targeting_spec'] is first['targeting_spec']
+    assert second['promoted_object'] is first['promoted_object']
+    assert _targeting_json.cache_info().hits == 1
+    assert (first['daily_budget'], second['daily_budget']) == (1000, 2000)
+
+
+def test_payload_matches_the_parameters():
+    payload = build_adset_payload('1', 'a', ADSET_PARAMS)
+
+    targeting = json.loads(payload['targeting'])
+    assert targeting['geo_locations'] == {'countries': ['US']}
+    assert (targeting['age_min'], targeting['age_max'], targeting['genders']) == (18, 65, [1])
+    assert targeting['user_os'] == ['Android']
+    assert json.loads(payload['promoted_object']) == {
+        'object_store_url': ADSET_PARAMS['object_store_url'],
+        'application_id': ADSET_PARAMS['application_id']
+    }
+
+
+def test_mutated_lists_do_not_reuse_a_stale_fragment():
+    params = dict(ADSET_PARAMS, targeting_countries=['US'])
+    build_adset_payload('1', 'a', params)
+    params['targeting_countries'].append('CA')
+
+    payload = build_adset_payload('1', 'a', params)
+
+    assert json.loads(payload['targeting'])['geo_locations'] == {'countries': ['US', 'CA']}
+
+
+def test_missing_geo_targeting_is_rejected():
+    params = {key: value for key, value in ADSET_PARAMS.items() if key != 'targeting_countries'}
+    with pytest.raises(ValueError, match='Geo targeting is not defined'):
+        build_adset_payload('1', 'a', params)
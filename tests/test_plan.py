@@ -0,0 +1,74 @@
+"""
+--plan input: row normalization and CSV / JSONL detection
+"""
+import io
+
+import pytest
+
+from utils.plan import PLAN_FIELDS, detect_plan_format, normalize_plan_row, read_plan
+
+
+def test_row_is_normalized_to_plan_fields():
+    params = normalize_plan_row({
+        'Project': ' Mirai ',
+        'Opt model': 'CPA',
+        'bid-strategy': 'Bid cap',
+        'budget': '50',
+        'bid': 0.3,
+        'countries': 'us, ca;mx  br',
+        'event': '',
+        None: ['extra cell']
+    })
+
+    assert list(params) == PLAN_FIELDS
+    assert (params['project'], params['opt_model'], params['bid_strategy']) == ('Mirai', 'CPA', 'Bid cap')
+    assert (params['budget'], params['bid']) == (50.0, 0.3)
+    assert params['countries'] == ['US', 'CA', 'MX', 'BR']
+    assert params['event'] is None and params['tier'] is None
+
+
+def test_country_list_from_jsonl_is_kept():
+    assert normalize_plan_row({'countries': ['US', 'CA']})['countries'] == ['US', 'CA']
+    assert normalize_plan_row({'countries': []})['countries'] is None
+
+
+def test_non_numeric_budget_is_rejected():
+    with pytest.raises(ValueError, match="Field 'budget' must be a number"):
+        normalize_plan_row({'budget': 'fifty'})
+
+
+@pytest.mark.parametrize('path, first_line, plan_format', [
+    ('plan.jsonl', None, 'jsonl'),
+    ('plan.NDJSON', None, 'jsonl'),
+    ('plan.csv', '{"project": "Mirai"}', 'csv'),
+    ('-', '{"project": "Mirai"}\n', 'jsonl'),
+    ('-', 'project,tier\n', 'csv'),
+    ('plan.txt', None, 'csv')
+])
+def test_detect_plan_format(path, first_line, plan_format):
+    assert detect_plan_format(path, first_line) == plan_format
+
+
+def test_csv_plan_skips_blank_rows(workdir):
+    (workdir / 'plan.csv').write_text('project,tier,budget\nMirai,LatAm,50\n,,\n\nMirai,Tier-1,25\n', encoding='utf-8')
+
+    rows = list(read_plan(str(workdir / 'plan.csv')))
+
+    assert [(line_no, row['tier'], error) for line_no, row, error in rows] == [(2, 'LatAm', None), (5, 'Tier-1', None)]
+
+
+def test_jsonl_plan_reports_bad_lines(workdir):
+    (workdir / 'plan.jsonl').write_text('{"tier": "LatAm"}\n\n{"tier": \n["Tier-1"]\n', encoding='utf-8')
+
+    rows = list(read_plan(str(workdir / 'plan.jsonl')))
+
+    assert [(line_no, row) for line_no, row, _ in rows] == [(1, {'tier': 'LatAm'}), (3, None), (4, None)]
+    assert rows[1][2].startswith('invalid JSON') and rows[2][2] == 'expected a JSON object'
+
+
+def test_stdin_format_is_detected_from_the_first_line(monkeypatch):
+    monkeypatch.setattr('sys.stdin', io.StringIO('{"tier": "LatAm"}\n{"tier": "Tier-1"}\n'))
+    assert [row['tier'] for _, row, _ in read_plan('-')] == ['LatAm', 'Tier-1']
+
+    monkeypatch.setattr('sys.stdin', io.StringIO('tier,gender\nLatAm,M\n'))
+    assert [row for _, row, _ in read_plan('-')] == [{'tier': 'LatAm', 'gender': 'M'}]
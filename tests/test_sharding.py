@@ -0,0 +1,75 @@
+"""
+Account sharding: campaigns go to the accounts with the most rate-limit headroom
+"""
+import pytest
+
+from conftest import created_objects, run_create
+from create_campaign_universal import ACCOUNT_CHOSEN_AT_DISPATCH
+from utils.sharding import AccountBalancer
+
+
+ACCOUNTS = {'a': '1', 'b': '2', 'c': '3'}
+
+
+class FakeScheduler:
+    """UsageScheduler stand-in: headroom (%) per account ID"""
+
+    def __init__(self, headroom):
+        self._headroom = headroom
+
+    def headroom(self, account_id):
+        return self._headroom[account_id]
+
+
+def choose(balancer, times, names=('a', 'b', 'c')):
+    return [balancer.choose(list(names)) for _ in range(times)]
+
+
+def test_equal_headroom_rotates():
+    assert choose(AccountBalancer(ACCOUNTS), 6) == ['a', 'b', 'c', 'a', 'b', 'c']
+    balancer = AccountBalancer(ACCOUNTS, FakeScheduler({'1': 40.0, '2': 40.0, '3': 40.0}))
+    assert choose(balancer, 3) == ['a', 'b', 'c']
+
+
+def test_picks_are_proportional_to_headroom_without_runs():
+    balancer = AccountBalancer(ACCOUNTS, FakeScheduler({'1': 60.0, '2': 30.0, '3': 10.0}))
+
+    picks = choose(balancer, 10)
+
+    assert balancer.assigned() == {'a': 6, 'b': 3, 'c': 1}
+    assert [picks.count(name) for name in 'abc'] == [6, 3, 1]
+    assert 'aaa' not in ''.join(picks)
+
+
+def test_exhausted_account_is_skipped():
+    balancer = AccountBalancer(ACCOUNTS, FakeScheduler({'1': 0.0, '2': 50.0, '3': -5.0}))
+    assert choose(balancer, 4) == ['b'] * 4
+
+
+def test_all_exhausted_falls_back_to_rotation():
+    balancer = AccountBalancer(ACCOUNTS, FakeScheduler({'1': 0.0, '2': 0.0, '3': 0.0}))
+    assert balancer.weights(['a', 'b', 'c']) == {'a': 1.0, 'b': 1.0, 'c': 1.0}
+    assert choose(balancer, 3) == ['a', 'b', 'c']
+
+
+def test_single_and_empty_pools():
+    balancer = AccountBalancer(ACCOUNTS, FakeScheduler({'1': 0.0}))
+    assert choose(balancer, 2, names=['a']) == ['a', 'a']
+    with pytest.raises(ValueError, match='No accounts'):
+        balancer.choose([])
+
+
+def test_preview_leaves_the_account_to_dispatch(mock_server, mock_state, capsys):
+    run_create(mock_server, '--tier', 'LatAm', '--gender', 'M,F,MF', '--age', '18-65+', '--shard-accounts')
+
+    output = capsys.readouterr().out
+    previewed = [line.split('Naming: ')[1] for line in output.splitlines() if 'Naming: ' in line]
+    assert len(previewed) == 3
+    assert all(name.endswith('_' + ACCOUNT_CHOSEN_AT_DISPATCH) for name in previewed)
+    assert "Campaigns per account: account_1: 1, account_2: 1, account_3: 1" in output
+
+    created = [campaign['name'] for campaign in created_objects(mock_state, 'campaign')]
+    pool = ('account_1', 'account_2', 'account_3')
+    assert all(name.endswith(pool) for name in created)
+    assert sorted(name.rsplit('_account_', 1)[0] for name in created) == \
+        sorted(name[:-len('_' + ACCOUNT_CHOSEN_AT_DISPATCH)] for name in previewed)
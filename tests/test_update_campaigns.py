@@ -0,0 +1,77 @@
+"""
+Bulk updates: only changed fields are sent, results are written back per /batch request
+"""
+import update_campaigns
+from conftest import created_objects, fail_batch_requests, run_create, run_main
+from utils.ledger import get_ledger
+
+
+def run_update(server, *args):
+    return run_main(update_campaigns, ['--ledger', 'ledger.db', '--api-base', server.base_url, '--yes', *args])
+
+
+def create_matrix(server):
+    run_create(server, '--tier', 'LatAm', '--gender', 'M,F', '--age', '18-65+,25-45,21-65', '--ledger', 'ledger.db')
+
+
+def test_rebid_sends_only_bid_and_rerun_sends_nothing(mock_server, mock_state, workdir, capsys, monkeypatch):
+    create_matrix(mock_server)
+    sent = []
+    post = update_campaigns.update_objects_batch
+
+    def recording(updates, **kwargs):
+        sent.extend(updates)
+        return post(updates, **kwargs)
+
+    monkeypatch.setattr(update_campaigns, 'update_objects_batch', recording)
+
+    assert run_update(mock_server, '--where', 'gender=M', '--bid', '0.5') == 0
+
+    assert len(sent) == 3
+    assert all(update['fields'] == {'bid_amount': 50} for update in sent)
+    bids = {adset['name']: adset['bid_amount'] for adset in created_objects(mock_state, 'adset')}
+    assert sorted(bids.values()) == ['30', '30', '30', '50', '50', '50']
+    ledger = get_ledger(str(workdir / 'ledger.db'))
+    assert {entry['spec']['adset_params']['bid_amount'] for entry in ledger.query(where={'gender': ['M']})} == {0.5}
+
+    sent.clear()
+    assert run_update(mock_server, '--where', 'gender=M', '--bid', '0.5') == 0
+    assert sent == []
+    assert "Nothing to update" in capsys.readouterr().out
+
+
+def test_naming_change_renames_campaign_and_ad_set(mock_server, mock_state, workdir):
+    create_matrix(mock_server)
+
+    assert run_update(mock_server, '--where', 'gender=F', '--where', 'age=25-45', '--gender', 'MF') == 0
+
+    ledger = get_ledger(str(workdir / 'ledger.db'))
+    entry = next(ledger.query(where={'gender': ['MF']}))
+    campaign = mock_state.objects[entry['campaign_id']]
+    adset = mock_state.objects[entry['adset_id']]
+    assert '_MF_25-45_' in entry['campaign_name']
+    assert campaign['name'] == adset['name'] == entry['campaign_name']
+    assert '"genders": [1, 2]' in adset['targeting_spec']
+
+
+def test_failed_batch_request_writes_back_the_rest(mock_server, mock_state, workdir, monkeypatch, capsys):
+    create_matrix(mock_server)
+    # One plan per chunk: each plan is one /batch request (campaign name + ad set)
+    monkeypatch.setattr(update_campaigns, 'UPDATE_CHUNK_SIZE', 1)
+    lost = {2}
+    fail_batch_requests(monkeypatch, lost)
+
+    assert run_update(mock_server, '--where', 'gender=M', '--gender', 'MF') == 1
+    output = capsys.readouterr().out
+    assert "Updated: 2" in output and "Failed: 1" in output
+
+    ledger = get_ledger(str(workdir / 'ledger.db'))
+    assert len(list(ledger.query(where={'gender': ['MF']}))) == 2
+    lost.clear()
+
+    # The rerun sends only the campaign whose request was lost
+    assert run_update(mock_server, '--where', 'gender=M', '--gender', 'MF') == 0
+    assert "Updates: 1 campaign(s), 1 ad set(s)" in capsys.readouterr().out
+    names = {entry['campaign_name'] for entry in ledger.query(where={'gender': ['MF']})}
+    assert names == {obj['name'] for obj in created_objects(mock_state, 'campaign') if '_MF_' in obj['name']}
+    assert len(names) == 3
@@ -0,0 +1,402 @@
+#!/usr/bin/env python3
+"""
+Bulk update of existing campaigns: select them in the SQLite ledger by parsed
+naming fields or IDs, apply a change set, send only the fields that actually
+change (names are regenerated when a naming field changes) through Graph API
+/batch requests and write the new names and specs back to the ledger
+"""
+import argparse
+import os
+import sys
+
+from campaign_ledger import create_api_client, parse_where
+from create_campaign_universal import (
+    LAUNCH_CHOICES,
+    build_api_params,
+    parse_age,
+    parse_list,
+    resolve_geo
+)
+from utils.campaign_builder import BATCH_LIMIT, build_adset_payload, update_objects_batch
+from utils.config_loader import registry
+from utils.ledger import FILTER_COLUMNS, get_ledger
+from utils.locale_resolver import get_locale_resolver
+from utils.logging import DEFAULT_LEDGER_PATH
+from utils.naming import NAMING_FIELDS, generate_campaign_name, parse_campaign_name
+
+
+# Changes that go into the name as well as into the ad set (see instructions/modification_rules.md)
+NAMING_CHANGES = ['gender', 'age', 'tier', 'countries', 'language']
+
+# Campaigns listed in the preview before the rest is summarized
+UPDATE_PREVIEW_LIMIT = 20
+
+# Campaigns dispatched (and written back to the ledger) per step
+UPDATE_CHUNK_SIZE = 1000
+
+# Ad set fields the preview lists without values (JSON blocks and the name shown above them)
+NAME_ONLY_FIELDS = {'name', 'targeting_spec', 'promoted_object', 'regional_regulated_categories'}
+
+GENDERS = {"M": [1], "F": [2], "MF": [1, 2]}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='Bulk update campaigns and ad sets recorded in the SQLite ledger',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Filter fields: {', '.join(FILTER_COLUMNS)}
+
+Usage examples:
+  # Re-bid every Latam CPA ad set (only bid_amount is sent, names stay the same)
+  python update_campaigns.py --where tier=Latam --where opt_model=CPA --bid 3.5
+
+  # New budget for campaigns created on one day, without confirmation
+  python update_campaigns.py --since 2025-03-10 --until 2025-03-10 --budget 80 --yes
+
+  # Switch campaigns to women 25-45 (targeting and names are updated)
+  python update_campaigns.py --campaign-id 120210000000001 --campaign-id 120210000000002 --gender F --age 25-45
+
+  # Move an ad account's campaigns to other countries
+  python update_campaigns.py --where extra=account_1 --countries US,CA
+        """
+    )
+    parser.add_argument('--ledger', metavar='PATH', default=DEFAULT_LEDGER_PATH,
+                       help=f'Ledger file (default {DEFAULT_LEDGER_PATH})')
+
+    selector = parser.add_argument_group('selector')
+    selector.add_argument('--name', action='append', help='Exact campaign name (repeatable)')
+    selector.add_argument('--campaign-id', action='append', help='Campaign ID (repeatable)')
+    selector.add_argument('--adset-id', action='append', help='Ad set ID (repeatable)')
+    selector.add_argument('--account', action='append', help='Ad account ID (repeatable)')
+    selector.add_argument('--where', action='append', metavar='FIELD=VALUE',
+                         help='Naming field filter, comma-separated values mean "any of" (repeatable)')
+    selector.add_argument('--since', help='Created at or after (YYYY-MM-DD or YYYY-MM-DD HH:MM:SS)')
+    selector.add_argument('--until', help='Created before (a date alone includes the whole day)')
+    selector.add_argument('--limit', type=int, help='Max campaigns')
+
+    changes = parser.add_argument_group('changes')
+    changes.add_argument('--budget', type=float, help='Daily budget')
+    changes.add_argument('--bid', type=float, help='Bid (only for the Bid cap strategy)')
+    changes.add_argument('--gender', choices=LAUNCH_CHOICES['gender'], help='Gender')
+    changes.add_argument('--age', help='Age (e.g.: 18-65+, 21-65)')
+    geo = changes.add_mutually_exclusive_group()
+    geo.add_argument('--tier', help='Tier (Tier-1, Latam, WW, etc.)')
+    geo.add_argument('--countries', type=parse_list, help='Countries, comma-separated (e.g.: US,CA)')
+    changes.add_argument('--language', help='Language (e.g.: "English", "Spanish")')
+
+    parser.add_argument('--allow-duplicates', action='store_true',
+                       help='Rename even if the new name is already in the ledger')
+    parser.add_argument('--yes', '-y', action='store_true', help='Do not ask for confirmation')
+    parser.add_argument('--api-base', metavar='URL',
+                       help='Override the Graph API base URL (e.g. a standalone mock server)')
+
+    args = parser.parse_args()
+
+    args.where = parse_where(args.where, parser)
+    for field, values in [
+        ('campaign_name', args.name),
+        ('campaign_id', args.campaign_id),
+        ('adset_id', args.adset_id),
+        ('account_id', args.account)
+    ]:
+        if values:
+            args.where.setdefault(field, []).extend(values)
+    if not args.where and not args.since and not args.until:
+        parser.error("a selector is required (--where, --name, --campaign-id, --adset-id, --account, --since or --until)")
+
+    args.changes = {
+        key: value for key, value in [
+            ('budget', args.budget),
+            ('bid', args.bid),
+            ('gender', args.gender),
+            ('age', args.age),
+            ('tier', args.tier),
+            ('countries', args.countries),
+            ('language', args.language)
+        ] if value is not None
+    }
+    if not args.changes:
+        parser.error("nothing to change (--budget, --bid, --gender, --age, --tier, --countries or --language)")
+
+    return args
+
+
+def resolve_changes(changes):
+    """
+    Validate a change set once for all campaigns (dictionary lookups, age range).
+    Raises ValueError if a value is unknown.
+    """
+    resolved = dict(changes)
+    if 'age' in changes:
+        resolved['age_range'] = parse_age(changes['age'])
+    if 'tier' in changes and changes['tier'] not in registry['tiers']:
+        raise ValueError(f"Tier '{changes['tier']}' not found in tiers.json")
+    if 'language' in changes:
+        languages = registry['languages']
+        if changes['language'] not in languages:
+            raise ValueError(f"Language '{changes['language']}' not found in languages.json")
+        resolved['lang_code'] = languages[changes['language']]
+        # Served from the adlocale cache (or the locales.json snapshot), no API call
+        resolved['locales'] = get_locale_resolver().lookup(changes['language'])
+        if not resolved['locales']:
+            raise ValueError(
+                f"No adlocale found for language '{changes['language']}' "
+                f"(run create_campaign_universal.py --refresh-locales)"
+            )
+    return resolved
+
+
+def plan_update(entry, changes):
+    """
+    Minimal update of one ledger entry: the new name, the changed campaign
+    and ad set fields and the new spec. Raises ValueError if the entry cannot
+    be updated (no spec, unparsed name, change not applicable).
+    """
+    spec = entry['spec']
+    if not spec:
+        raise ValueError("no spec in the ledger (entry migrated from logs.csv)")
+    if not entry['account_id']:
+        raise ValueError("no account in the ledger")
+    naming = parse_campaign_name(entry['campaign_name'])
+    if naming is None:
+        raise ValueError("name does not match the naming format")
+    naming = {field: naming.get(field) for field in NAMING_FIELDS}
+
+    camp_data = dict(spec['camp_data'])
+    params = dict(spec['adset_params'])
+
+    if 'budget' in changes:
+        params['daily_budget'] = changes['budget']
+
+    if 'bid' in changes:
+        if params['bid_strategy'] != 'LOWEST_COST_WITH_BID_CAP':
+            raise ValueError(f"bid is not used by bid strategy {params['bid_strategy']}")
+        params['bid_amount'] = changes['bid']
+
+    if 'gender' in changes:
+        params['genders'] = GENDERS[changes['gender']]
+        naming['gender'] = changes['gender']
+
+    if 'age' in changes:
+        params['age_min'], params['age_max'] = changes['age_range']
+        naming['age'] = changes['age']
+
+    if 'tier' in changes or 'countries' in changes:
+        geo = resolve_geo(changes.get('tier'), registry['tiers'], changes.get('countries'))
+        camp_data.update({
+            key: geo[key] for key in (
+                'tier', 'tier_raw', 'countries', 'is_worldwide',
+                'country_group_keys', 'extra_countries', 'excluded_countries'
+            )
+        })
+        params.pop('regional_regulated_categories', None)
+        params = build_api_params(camp_data, params)
+        naming['tier'] = geo['tier']
+        naming['naming_countries'] = geo['naming_countries']
+
+    if 'language' in changes:
+        params['locales'] = changes['locales']
+        naming['lang'] = changes['lang_code']
+
+    name = entry['campaign_name']
+    if any(field in changes for field in NAMING_CHANGES):
+        name = generate_campaign_name(naming)
+    camp_data['name'] = name
+
+    campaign_id = entry['campaign_id']
+    old_payload = build_adset_payload(campaign_id, entry['campaign_name'], spec['adset_params'], use_targeting_spec=True)
+    new_payload = build_adset_payload(campaign_id, name, params, use_targeting_spec=True)
+    adset_fields = {key: value for key, value in new_payload.items() if old_payload.get(key) != value}
+    # Fields are never dropped by omission: regional_regulated_categories is cleared explicitly
+    for key in old_payload.keys() - new_payload.keys():
+        adset_fields[key] = '[]'
+
+    return {
+        'entry': entry,
+        'name': name,
+        'campaign_fields': {'name': name} if name != entry['campaign_name'] else {},
+        'adset_fields': adset_fields,
+        'spec': dict(spec, camp_data=camp_data, adset_params=params)
+    }
+
+
+def plan_updates(ledger, args, changes):
+    """Plans for the selected entries → (plans with changes, unchanged count, skipped [(entry, reason)])"""
+    plans, skipped = [], []
+    unchanged = 0
+    for entry in ledger.query(where=args.where, since=args.since, until=args.until, limit=args.limit):
+        try:
+            plan = plan_update(entry, changes)
+        except ValueError as e:
+            skipped.append((entry, str(e)))
+            continue
+        if plan['campaign_fields'] or plan['adset_fields']:
+            plans.append(plan)
+        else:
+            unchanged += 1
+
+    if args.allow_duplicates:
+        return plans, unchanged, skipped
+
+    # Renames must not produce names that are already taken or merge different names
+    # (campaigns that differ only in budget or bid share a name and keep sharing it)
+    renamed = [plan for plan in plans if plan['campaign_fields']]
+    taken = ledger.existing_names(plan['name'] for plan in renamed)
+    sources = {}
+    for plan in renamed:
+        sources.setdefault(plan['name'], set()).add(plan['entry']['campaign_name'])
+    duplicates = {id(plan) for plan in renamed if plan['name'] in taken or len(sources[plan['name']]) > 1}
+    for plan in renamed:
+        if id(plan) in duplicates:
+            skipped.append((plan['entry'], f"new name {plan['name']} is already taken"))
+    return [plan for plan in plans if id(plan) not in duplicates], unchanged, skipped
+
+
+def describe_fields(fields, old_payload=None):
+    """Changed fields for the preview"""
+    return ", ".join(
+        key if key in NAME_ONLY_FIELDS or old_payload is None else f"{key} {old_payload.get(key, '-')} → {value}"
+        for key, value in fields.items()
+    )
+
+
+def show_preview(plans, unchanged, skipped):
+    """Print the update plan"""
+    print("\n" + "="*60)
+    print("UPDATE PREVIEW")
+    print("="*60)
+
+    for plan in plans[:UPDATE_PREVIEW_LIMIT]:
+        entry = plan['entry']
+        print(f"\n{entry['campaign_name']} ({entry['campaign_id']})")
+        if plan['campaign_fields']:
+            print(f"  Name → {plan['name']}")
+        if plan['adset_fields']:
+            old_payload = build_adset_payload(
+                entry['campaign_id'], entry['campaign_name'], entry['spec']['adset_params'], use_targeting_spec=True
+            )
+            print(f"  Ad set: {describe_fields(plan['adset_fields'], old_payload)}")
+    if len(plans) > UPDATE_PREVIEW_LIMIT:
+        print(f"\n... and {len(plans) - UPDATE_PREVIEW_LIMIT} more")
+
+    if skipped:
+        print(f"\nSkipped: {len(skipped)}")
+        for entry, reason in skipped[:UPDATE_PREVIEW_LIMIT]:
+            print(f"  ✗ {entry['campaign_name']}: {reason}")
+        if len(skipped) > UPDATE_PREVIEW_LIMIT:
+            print(f"  ... and {len(skipped) - UPDATE_PREVIEW_LIMIT} more")
+    if unchanged:
+        print(f"\nAlready up to date: {unchanged}")
+
+    campaigns = sum(1 for plan in plans if plan['campaign_fields'])
+    adsets = sum(1 for plan in plans if plan['adset_fields'])
+    batches = 0
+    per_account = {}
+    for plan in plans:
+        account_id = plan['entry']['account_id']
+        per_account[account_id] = per_account.get(account_id, 0) + bool(plan['campaign_fields']) + bool(plan['adset_fields'])
+    for operations in per_account.values():
+        batches += -(-operations // BATCH_LIMIT)
+    print(f"\nUpdates: {campaigns} campaign(s), {adsets} ad set(s) in ~{batches} batch request(s)")
+
+
+def dispatch_updates(plans, client, ledger):
+    """
+    Send the updates of a chunk of plans and write the results back to the ledger.
+    Each part that went through is written back even if the other one failed
+    (the campaign name or the ad set spec), so a rerun sends only what is still different.
+    Returns (updated, failed).
+    """
+    updates = []
+    for index, plan in enumerate(plans):
+        entry = plan['entry']
+        if plan['campaign_fields']:
+            updates.append({
+                'account_id': entry['account_id'],
+                'object_id': entry['campaign_id'],
+                'fields': plan['campaign_fields'],
+                'plan': index,
+                'part': 'campaign'
+            })
+        if plan['adset_fields']:
+            updates.append({
+                'account_id': entry['account_id'],
+                'object_id': entry['adset_id'],
+                'fields': plan['adset_fields'],
+                'plan': index,
+                'part': 'adset'
+            })
+
+    errors = {}
+    for result in update_objects_batch(updates, client=client):
+        if result['error']:
+            update = result['update']
+            errors.setdefault(update['plan'], {})[update['part']] = result['error']
+
+    updated = failed = 0
+    for index, plan in enumerate(plans):
+        entry = plan['entry']
+        plan_errors = errors.get(index, {})
+        renamed = bool(plan['campaign_fields']) and 'campaign' not in plan_errors
+        if renamed or 'adset' not in plan_errors:
+            ledger.update(
+                entry['campaign_id'],
+                campaign_name=plan['name'] if renamed else None,
+                spec=plan['spec'] if 'adset' not in plan_errors else None
+            )
+        if plan_errors:
+            failed += 1
+            print(f"  ✗ {entry['campaign_name']}: {'; '.join(plan_errors.values())}")
+            continue
+        updated += 1
+    return updated, failed
+
+
+def main():
+    """Main function"""
+    args = parse_arguments()
+
+    if not os.path.exists(args.ledger):
+        print(f"Error: ledger {args.ledger} not found (create it with: python campaign_ledger.py migrate)")
+        sys.exit(1)
+
+    try:
+        changes = resolve_changes(args.changes)
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    ledger = get_ledger(args.ledger)
+    try:
+        plans, unchanged, skipped = plan_updates(ledger, args, changes)
+        show_preview(plans, unchanged, skipped)
+        if not plans:
+            print("\nNothing to update")
+            return
+
+        if not args.yes:
+            confirm = input("\nApply updates? (y/n): ")
+            if confirm.lower() != 'y':
+                print("Cancelled")
+                return
+
+        client = create_api_client(args)
+        updated = failed = 0
+        # A failed /batch request fails only its own updates; the rest are written back as they complete
+        for offset in range(0, len(plans), UPDATE_CHUNK_SIZE):
+            chunk_updated, chunk_failed = dispatch_updates(plans[offset:offset + UPDATE_CHUNK_SIZE], client, ledger)
+            updated += chunk_updated
+            failed += chunk_failed
+
+        print(f"\n✓ Updated: {updated}")
+        if failed:
+            print(f"✗ Failed: {failed}")
+            sys.exit(1)
+    finally:
+        ledger.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -2,8 +2,39 @@
 Utility functions for creating campaigns and adsets via Facebook Marketing API
 """
 import json
-from typing import Dict, List, Optional
-import requests
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+from utils.circuit_breaker import CircuitOpenError
+from utils.metrics import metrics
+
+if TYPE_CHECKING:
+    from utils.http_client import GraphClient
+
+
+class GraphAPIError(Exception):
+    """
+    Ошибка ответа Graph API (HTTP статус не 200)
+    
+    Attributes:
+        status_code: HTTP статус ответа
+    """
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def get_default_client(api_config: Optional[Dict] = None) -> 'GraphClient':
+    """
+    Общий HTTP клиент для api_config
+
+    utils.http_client (и requests) импортируется при первом обращении к API,
+    а не при загрузке модуля: предпросмотр и отмена запуска обходятся без него.
+    """
+    from utils.http_client import get_default_client as get_client
+    return get_client(api_config)
 
 
 def format_event_for_api(event_code: str) -> str:
@@ -29,7 +60,32 @@ def format_event_for_api(event_code: str) -> str:
     return event_mapping.get(event_code, event_code)
 
 
-def create_campaign_via_api(account_id: str, campaign_name: str, objective: str, api_config: Dict) -> str:
+def build_campaign_payload(campaign_name: str, objective: str) -> Dict:
+    """
+    Формирует поля запроса на создание кампании (без access_token)
+    
+    Args:
+        campaign_name: название кампании
+        objective: цель кампании (API формат)
+    
+    Returns:
+        Словарь полей запроса
+    """
+    return {
+        "name": campaign_name,
+        "objective": objective,
+        "status": "PAUSED",
+        "special_ad_categories": json.dumps(["NONE"])
+    }
+
+
+def create_campaign_via_api(
+    account_id: str,
+    campaign_name: str,
+    objective: str,
+    api_config: Optional[Dict] = None,
+    client: Optional['GraphClient'] = None
+) -> str:
     """
     Создает кампанию через Facebook Marketing API
     
@@ -37,31 +93,223 @@ def create_campaign_via_api(account_id: str, campaign_name: str, objective: str,
         account_id: ID рекламного аккаунта (без префикса "act_")
         campaign_name: название кампании
         objective: цель кампании (API формат, например "APP_PROMOTION")
-        api_config: конфигурация API (base_url, api_version, access_token)
+        api_config: конфигурация API (base_url, api_version, access_token);
+            если не передана, берется из реестра словарей
+        client: HTTP клиент (если не передан, используется общий клиент для api_config)
     
     Returns:
         ID созданной кампании
     
     Raises:
-        Exception: при ошибке создания кампании
+        GraphAPIError: при ошибке создания кампании
     """
-    url = f"{api_config['base_url']}/{api_config['api_version']}/act_{account_id}/campaigns"
+    if client is None:
+        client = get_default_client(api_config)
     
-    params = {
-        "access_token": api_config['access_token'],
-        "name": campaign_name,
-        "objective": objective,
-        "status": "PAUSED",
-        "special_ad_categories": json.dumps(["NONE"])
-    }
-    
-    response = requests.post(url, params=params)
+    with metrics.timer('phase_seconds', phase='payload'):
+        payload = build_campaign_payload(campaign_name, objective)
+    response = client.post(f"act_{account_id}/campaigns", params=payload)
     
     if response.status_code == 200:
         data = response.json()
         return data.get('id')
     else:
-        raise Exception(f"Error creating campaign: {response.status_code} - {response.text}")
+        raise GraphAPIError(f"Error creating campaign: {response.status_code} - {response.text}", response.status_code)
+
+
+# Максимум уникальных шаблонов (targeting / promoted_object) в кэше
+PAYLOAD_TEMPLATE_CACHE_SIZE = 4096
+
+
+def _freeze(value):
+    """Приводит значение параметра к хешируемому виду (списки → кортежи)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """Обратное преобразование для сериализации (кортежи → списки)"""
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+@lru_cache(maxsize=PAYLOAD_TEMPLATE_CACHE_SIZE)
+def _promoted_object_json(
+    optimization_goal,
+    custom_event_type,
+    custom_event_str,
+    object_store_url,
+    application_id
+) -> str:
+    """Сериализованный promoted_object (один json.dumps на уникальный набор параметров)"""
+    promoted_object = {}
+    
+    # Для tROAS используем AD_IMPRESSION
+    if optimization_goal == "VALUE":
+        promoted_object["custom_event_type"] = "AD_IMPRESSION"
+    elif custom_event_type and custom_event_str:
+        # Для CPA с событиями
+        promoted_object["custom_event_type"] = custom_event_type
+        # Форматируем событие для API (ad_displayed_40 -> 40_ads_view)
+        promoted_object["custom_event_str"] = format_event_for_api(custom_event_str)
+    
+    # Обязательные поля для promoted_object
+    promoted_object["object_store_url"] = _thaw(object_store_url)
+    promoted_object["application_id"] = _thaw(application_id)
+    
+    return json.dumps(promoted_object)
+
+
+@lru_cache(maxsize=PAYLOAD_TEMPLATE_CACHE_SIZE)
+def _targeting_json(
+    is_worldwide,
+    country_group_keys,
+    extra_countries,
+    targeting_countries,
+    excluded_countries,
+    age_min,
+    age_max,
+    genders,
+    user_os,
+    locales
+) -> str:
+    """
+    Сериализованный targeting (один json.dumps на уникальный набор параметров)
+    
+    Raises:
+        ValueError: если не задан гео-таргетинг
+    """
+    geo_locations = {}
+
+    # 1) World Wide
+    if is_worldwide:
+        geo_locations["country_groups"] = ["worldwide"]
+        geo_locations["is_worldwide"] = True
+    # 2) Таргетинг по country_group (тир)
+    elif country_group_keys:
+        geo_locations["country_groups"] = _thaw(country_group_keys)
+        # Страны, не покрытые группами
+        if extra_countries:
+            geo_locations["countries"] = _thaw(extra_countries)
+    # 3) Таргетинг по конкретным странам
+    elif targeting_countries:
+        geo_locations["countries"] = _thaw(targeting_countries)
+    else:
+        raise ValueError("Geo targeting is not defined: expected is_worldwide, country_group_keys or targeting_countries")
+
+    # Исключённые страны (если есть)
+    if excluded_countries:
+        geo_locations["excluded_countries"] = _thaw(excluded_countries)
+
+    targeting = {
+        "geo_locations": geo_locations,
+        "age_min": age_min,
+        "age_max": age_max,
+        "genders": _thaw(genders),
+        "user_os": [user_os],
+        "targeting_automation": {
+            "advantage_audience": 1
+        }
+    }
+    
+    # Locales только если указан язык и не пустой список
+    if locales:
+        targeting["locales"] = _thaw(locales)
+    
+    return json.dumps(targeting)
+
+
+@lru_cache(maxsize=PAYLOAD_TEMPLATE_CACHE_SIZE)
+def _json_fragment(value) -> str:
+    return json.dumps(_thaw(value))
+
+
+def clear_payload_cache():
+    """Очищает кэш шаблонов targeting / promoted_object"""
+    _promoted_object_json.cache_clear()
+    _targeting_json.cache_clear()
+    _json_fragment.cache_clear()
+
+
+def get_payload_cache_info() -> Dict:
+    """Статистика кэша шаблонов (hits / misses / currsize по каждому фрагменту)"""
+    return {
+        'promoted_object': _promoted_object_json.cache_info()._asdict(),
+        'targeting': _targeting_json.cache_info()._asdict(),
+        'fragments': _json_fragment.cache_info()._asdict()
+    }
+
+
+def build_adset_payload(
+    campaign_id: str,
+    adset_name: str,
+    params: Dict,
+    use_targeting_spec: bool = False
+) -> Dict:
+    """
+    Формирует поля запроса на создание адсета (без access_token)
+    
+    Args:
+        campaign_id: ID кампании (или batch-ссылка вида "{result=...:$.id}")
+        adset_name: название адсета
+        params: параметры адсета (см. create_adset_via_api)
+        use_targeting_spec: использовать "targeting_spec" вместо "targeting"
+    
+    Returns:
+        Словарь полей запроса
+    
+    Raises:
+        ValueError: если не задан гео-таргетинг
+    """
+    # Подготовка данных для запроса
+    data = {
+        "name": adset_name,
+        "campaign_id": campaign_id,
+        "daily_budget": int(params['daily_budget'] * 100),  # В центах
+        "billing_event": "IMPRESSIONS",
+        "optimization_goal": params['optimization_goal'],
+        "bid_strategy": params['bid_strategy'],
+        "status": "PAUSED"
+    }
+    
+    # Bid amount только для Bid cap
+    if params['bid_strategy'] == "LOWEST_COST_WITH_BID_CAP" and params.get('bid_amount'):
+        data["bid_amount"] = int(params['bid_amount'] * 100)  # В центах
+    
+    # Regional regulated categories (если указаны)
+    if params.get('regional_regulated_categories'):
+        data["regional_regulated_categories"] = _json_fragment(_freeze(params['regional_regulated_categories']))
+    
+    # Promoted object и targeting берутся из кэша шаблонов: в матрице запусков
+    # большинство адсетов отличаются только названием, бюджетом и ставкой
+    data["promoted_object"] = _promoted_object_json(
+        params.get('optimization_goal'),
+        params.get('custom_event_type'),
+        params.get('custom_event_str'),
+        _freeze(params['object_store_url']),
+        _freeze(params['application_id'])
+    )
+    
+    targeting = _targeting_json(
+        bool(params.get('is_worldwide')),
+        _freeze(params.get('country_group_keys')),
+        _freeze(params.get('extra_countries')),
+        _freeze(params.get('targeting_countries')),
+        _freeze(params.get('excluded_countries')),
+        params['age_min'],
+        params['age_max'],
+        _freeze(params['genders']),
+        params['user_os'],
+        _freeze(params.get('locales'))
+    )
+    
+    # Используем правильное поле в зависимости от версии API
+    targeting_field = "targeting_spec" if use_targeting_spec else "targeting"
+    data[targeting_field] = targeting
+    
+    return data
 
 
 def create_adset_via_api(
@@ -69,8 +317,9 @@ def create_adset_via_api(
     campaign_id: str,
     adset_name: str,
     params: Dict,
-    api_config: Dict,
-    use_targeting_spec: bool = False
+    api_config: Optional[Dict] = None,
+    use_targeting_spec: bool = False,
+    client: Optional['GraphClient'] = None
 ) -> str:
     """
     Создает адсет через Facebook Marketing API
@@ -90,6 +339,7 @@ def create_adset_via_api(
             - application_id: ID приложения (без префикса "x:")
             - targeting_countries: список стран (используется, если не задан country_group)
             - country_group_keys: список ключей country_group (например, ["africa"], опционально)
+            - extra_countries: страны, добавляемые к country_group (опционально)
             - is_worldwide: флаг таргетинга на весь мир (bool, опционально)
             - excluded_countries: список исключённых стран (опционально)
             - age_min: минимальный возраст
@@ -98,98 +348,299 @@ def create_adset_via_api(
             - user_os: "android" или "ios"
             - locales: список locale IDs (опционально)
             - regional_regulated_categories: список категорий (опционально)
-        api_config: конфигурация API
+        api_config: конфигурация API (если не передана, берется из реестра словарей)
         use_targeting_spec: использовать "targeting_spec" вместо "targeting" (для совместимости)
+        client: HTTP клиент (если не передан, используется общий клиент для api_config)
     
     Returns:
         ID созданного адсета
     
     Raises:
-        Exception: при ошибке создания адсета
+        GraphAPIError: при ошибке создания адсета
     """
-    url = f"{api_config['base_url']}/{api_config['api_version']}/act_{account_id}/adsets"
+    if client is None:
+        client = get_default_client(api_config)
     
-    # Подготовка данных для запроса
-    data = {
-        "access_token": api_config['access_token'],
-        "name": adset_name,
-        "campaign_id": campaign_id,
-        "daily_budget": int(params['daily_budget'] * 100),  # В центах
-        "billing_event": "IMPRESSIONS",
-        "optimization_goal": params['optimization_goal'],
-        "bid_strategy": params['bid_strategy'],
-        "status": "PAUSED"
+    with metrics.timer('phase_seconds', phase='payload'):
+        payload = build_adset_payload(campaign_id, adset_name, params, use_targeting_spec)
+    response = client.post(f"act_{account_id}/adsets", data=payload)
+    
+    if response.status_code == 200:
+        data = response.json()
+        return data.get('id')
+    else:
+        raise GraphAPIError(f"Error creating adset: {response.status_code} - {response.text}", response.status_code)
+
+
+# Максимум операций в одном запросе Graph API /batch
+BATCH_LIMIT = 50
+
+
+def _batch_operation(api_config: Dict, relative_path: str, payload: Dict, name: Optional[str] = None) -> Dict:
+    """Формирует одну POST-операцию для Graph API /batch"""
+    operation = {
+        "method": "POST",
+        "relative_url": f"{api_config['api_version']}/{relative_path}",
+        "body": urlencode(payload)
     }
+    if name:
+        operation["name"] = name
+        # Без этого флага Graph не возвращает ответ операции, на которую ссылаются
+        operation["omit_response_on_success"] = False
+    return operation
+
+
+def _batch_error_text(error: Exception) -> str:
+    """Текст ошибки batch-запроса целиком"""
+    return str(error) if isinstance(error, GraphAPIError) else f"Error executing batch: {error}"
+
+
+def _parse_batch_item(item: Optional[Dict]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Разбирает ответ одной операции из /batch
     
-    # Bid amount только для Bid cap
-    if params['bid_strategy'] == "LOWEST_COST_WITH_BID_CAP" and params.get('bid_amount'):
-        data["bid_amount"] = int(params['bid_amount'] * 100)  # В центах
+    Returns:
+        (id объекта, текст ошибки) — одно из значений всегда None
+    """
+    if item is None:
+        # Graph возвращает null для операций, которые не выполнились из-за зависимости
+        return None, "Operation was not executed (dependency failed)"
     
-    # Regional regulated categories (если указаны)
-    if params.get('regional_regulated_categories'):
-        data["regional_regulated_categories"] = json.dumps(params['regional_regulated_categories'])
+    body = item.get('body') or ''
+    if item.get('code') == 200:
+        try:
+            return json.loads(body).get('id'), None
+        except ValueError:
+            return None, f"Invalid response body: {body}"
+    return None, f"{item.get('code')} - {body}"
+
+
+def _send_batch(client: 'GraphClient', account_id: str, operations: List[Dict]) -> Tuple[Optional[List], Optional[Exception]]:
+    """
+    Отправляет один batch-запрос
     
-    # Promoted object
-    promoted_object = {}
+    Ошибка запроса целиком не прерывает остальные пачки: объекты из уже
+    выполненных пачек созданы, и их ID нельзя терять.
     
-    # Для tROAS используем AD_IMPRESSION
-    if params.get('optimization_goal') == "VALUE":
-        promoted_object["custom_event_type"] = "AD_IMPRESSION"
-    elif params.get('custom_event_type') and params.get('custom_event_str'):
-        # Для CPA с событиями
-        promoted_object["custom_event_type"] = params['custom_event_type']
-        # Форматируем событие для API (ad_displayed_40 -> 40_ads_view)
-        promoted_object["custom_event_str"] = format_event_for_api(params['custom_event_str'])
+    Returns:
+        (ответы операций, None) или (None, ошибка запроса); ответов всегда
+        столько же, сколько операций, каждый — объект или null
+    """
+    try:
+        response = client.post('', data={"batch": json.dumps(operations)}, account_id=account_id)
+    except (OSError, CircuitOpenError) as e:
+        # requests.RequestException — наследник OSError
+        return None, e
     
-    # Обязательные поля для promoted_object
-    promoted_object["object_store_url"] = params['object_store_url']
-    promoted_object["application_id"] = params['application_id']
+    if response.status_code != 200:
+        return None, GraphAPIError(f"Error executing batch: {response.status_code} - {response.text}", response.status_code)
     
-    data["promoted_object"] = json.dumps(promoted_object)
+    invalid = GraphAPIError(f"Error executing batch: invalid response body - {response.text}", response.status_code)
+    try:
+        items = response.json()
+    except ValueError:
+        return None, invalid
     
-    # Targeting
-    geo_locations = {}
+    # Ответы сопоставляются с операциями по позиции: обрезанный ответ не разбираем
+    if not isinstance(items, list):
+        return None, invalid
+    if len(items) != len(operations):
+        return None, GraphAPIError(
+            f"Error executing batch: expected {len(operations)} results, got {len(items)}",
+            response.status_code
+        )
+    if any(item is not None and not isinstance(item, dict) for item in items):
+        return None, invalid
+    return items, None
 
-    # 1) World Wide
-    if params.get('is_worldwide'):
-        geo_locations["country_groups"] = ["worldwide"]
-        geo_locations["is_worldwide"] = True
-    # 2) Таргетинг по country_group (тир)
-    elif params.get('country_group_keys'):
-        geo_locations["country_groups"] = params['country_group_keys']
-    # 3) Таргетинг по конкретным странам
-    elif params.get('targeting_countries'):
-        geo_locations["countries"] = params['targeting_countries']
-    else:
-        raise ValueError("Geo targeting is not defined: expected is_worldwide, country_group_keys or targeting_countries")
 
-    # Исключённые страны (если есть)
-    if params.get('excluded_countries'):
-        geo_locations["excluded_countries"] = params['excluded_countries']
+def create_campaigns_batch(
+    specs: List[Dict],
+    api_config: Optional[Dict] = None,
+    batch_size: int = BATCH_LIMIT,
+    client: Optional['GraphClient'] = None
+) -> List[Dict]:
+    """
+    Создает кампании и их адсеты пачками через Graph API /batch
+    
+    Каждая пара (кампания, адсет) попадает в один batch-запрос; адсет ссылается
+    на ID кампании через batch-зависимость "{result=campaign_N:$.id}".
+    
+    Args:
+        specs: список спецификаций:
+            - account_id: ID рекламного аккаунта (без префикса "act_")
+            - name: название кампании и адсета
+            - objective: цель кампании (API формат)
+            - adset_params: параметры адсета (см. create_adset_via_api)
+            - use_targeting_spec: использовать "targeting_spec" (опционально)
+        api_config: конфигурация API (если не передана, берется из реестра словарей)
+        batch_size: максимум операций в одном запросе (не больше BATCH_LIMIT)
+        client: HTTP клиент (если не передан, используется общий клиент для api_config)
+    
+    Returns:
+        Список результатов в порядке specs, у каждого:
+            - spec: исходная спецификация
+            - campaign_id: ID созданной кампании или None
+            - adset_id: ID созданного адсета или None
+            - error: текст ошибки или None
+            - batch_error: исключение, если batch-запрос пары завершился
+              ошибкой целиком (результаты других пачек сохраняются), иначе None
+    """
+    if client is None:
+        client = get_default_client(api_config)
+    api_config = client.api_config
+    
+    # Две операции на спецификацию, пара не должна разрываться между запросами
+    pairs_per_batch = max(1, min(batch_size, BATCH_LIMIT) // 2)
+    
+    # Пачки собираются по аккаунтам, чтобы планировщик лимитов видел,
+    # какой аккаунт нагружает каждый запрос
+    indexes_by_account: Dict[str, List[int]] = {}
+    for index, spec in enumerate(specs):
+        indexes_by_account.setdefault(str(spec['account_id']), []).append(index)
+    
+    results: List[Optional[Dict]] = [None] * len(specs)
+    for account_id, indexes in indexes_by_account.items():
+        for offset in range(0, len(indexes), pairs_per_batch):
+            chunk = indexes[offset:offset + pairs_per_batch]
+            
+            operations = []
+            try:
+                # Одно измерение на пачку (отдельная фаза: payload до 50 операций)
+                with metrics.timer('phase_seconds', phase='batch_payload'):
+                    for index in chunk:
+                        spec = specs[index]
+                        ref = f"campaign_{index}"
+                        operations.append(_batch_operation(
+                            api_config,
+                            f"act_{account_id}/campaigns",
+                            build_campaign_payload(spec['name'], spec['objective']),
+                            name=ref
+                        ))
+                        operations.append(_batch_operation(
+                            api_config,
+                            f"act_{account_id}/adsets",
+                            build_adset_payload(
+                                f"{{result={ref}:$.id}}",
+                                spec['name'],
+                                spec['adset_params'],
+                                spec.get('use_targeting_spec', False)
+                            )
+                        ))
+            except (ValueError, KeyError, TypeError) as e:
+                # Спецификация не превращается в запрос: пачка не отправляется
+                items, batch_error = None, e
+            else:
+                items, batch_error = _send_batch(client, account_id, operations)
+            
+            if batch_error is not None:
+                for index in chunk:
+                    results[index] = {
+                        'spec': specs[index],
+                        'campaign_id': None,
+                        'adset_id': None,
+                        'error': _batch_error_text(batch_error),
+                        'batch_error': batch_error
+                    }
+                continue
+            
+            for i, index in enumerate(chunk):
+                campaign_item, adset_item = items[2 * i], items[2 * i + 1]
+                
+                # Заголовки лимитов приходят и в ответах отдельных операций
+                for item in (campaign_item, adset_item):
+                    if item and item.get('headers'):
+                        client.scheduler.observe(account_id, {
+                            header['name']: header['value'] for header in item['headers']
+                        })
+                
+                campaign_id, campaign_error = _parse_batch_item(campaign_item)
+                adset_id, adset_error = _parse_batch_item(adset_item)
+                
+                error = None
+                if campaign_error:
+                    error = f"Error creating campaign: {campaign_error}"
+                elif adset_error:
+                    error = f"Error creating adset: {adset_error}"
+                
+                results[index] = {
+                    'spec': specs[index],
+                    'campaign_id': campaign_id,
+                    'adset_id': adset_id,
+                    'error': error,
+                    'batch_error': None
+                }
+    
+    return results
 
-    targeting = {
-        "geo_locations": geo_locations,
-        "age_min": params['age_min'],
-        "age_max": params['age_max'],
-        "genders": params['genders'],
-        "user_os": [params['user_os']],
-        "targeting_automation": {
-            "advantage_audience": 1
-        }
-    }
+
+def update_objects_batch(
+    updates: List[Dict],
+    api_config: Optional[Dict] = None,
+    batch_size: int = BATCH_LIMIT,
+    client: Optional['GraphClient'] = None
+) -> List[Dict]:
+    """
+    Обновляет кампании и адсеты пачками через Graph API /batch
     
-    # Locales только если указан язык и не пустой список
-    if params.get('locales') and len(params['locales']) > 0:
-        targeting["locales"] = params['locales']
+    Каждое обновление — POST /{object_id} только с измененными полями;
+    операции независимы, ошибка одной не отменяет остальные.
     
-    # Используем правильное поле в зависимости от версии API
-    targeting_field = "targeting_spec" if use_targeting_spec else "targeting"
-    data[targeting_field] = json.dumps(targeting)
+    Args:
+        updates: список обновлений:
+            - account_id: ID рекламного аккаунта (без префикса "act_")
+            - object_id: ID кампании или адсета
+            - fields: поля запроса (без access_token)
+        api_config: конфигурация API (если не передана, берется из реестра словарей)
+        batch_size: максимум операций в одном запросе (не больше BATCH_LIMIT)
+        client: HTTP клиент (если не передан, используется общий клиент для api_config)
     
-    response = requests.post(url, data=data)
+    Returns:
+        Список результатов в порядке updates, у каждого:
+            - update: исходное обновление
+            - error: текст ошибки или None
+            - batch_error: исключение, если batch-запрос обновления завершился
+              ошибкой целиком (результаты других пачек сохраняются), иначе None
+    """
+    if client is None:
+        client = get_default_client(api_config)
+    api_config = client.api_config
+    per_batch = max(1, min(batch_size, BATCH_LIMIT))
     
-    if response.status_code == 200:
-        data = response.json()
-        return data.get('id')
-    else:
-        raise Exception(f"Error creating adset: {response.status_code} - {response.text}")
+    # Пачки по аккаунтам — для планировщика лимитов
+    indexes_by_account: Dict[str, List[int]] = {}
+    for index, update in enumerate(updates):
+        indexes_by_account.setdefault(str(update['account_id']), []).append(index)
+    
+    results: List[Optional[Dict]] = [None] * len(updates)
+    for account_id, indexes in indexes_by_account.items():
+        for offset in range(0, len(indexes), per_batch):
+            chunk = indexes[offset:offset + per_batch]
+            operations = [
+                _batch_operation(api_config, str(updates[index]['object_id']), updates[index]['fields'])
+                for index in chunk
+            ]
+            
+            items, batch_error = _send_batch(client, account_id, operations)
+            if batch_error is not None:
+                for index in chunk:
+                    results[index] = {
+                        'update': updates[index],
+                        'error': f"Error updating {updates[index]['object_id']}: {_batch_error_text(batch_error)}",
+                        'batch_error': batch_error
+                    }
+                continue
+            
+            for index, item in zip(chunk, items):
+                if item and item.get('headers'):
+                    client.scheduler.observe(account_id, {
+                        header['name']: header['value'] for header in item['headers']
+                    })
+                _, error = _parse_batch_item(item)
+                results[index] = {
+                    'update': updates[index],
+                    'error': f"Error updating {updates[index]['object_id']}: {error}" if error else None,
+                    'batch_error': None
+                }
+    
+    return results
@@ -0,0 +1,149 @@
+"""
+Circuit breaker for Graph API requests (per ad account and endpoint)
+"""
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from utils.metrics import metrics
+
+
+# Состояния цепи
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Ключ для запросов без аккаунта
+NO_ACCOUNT = '-'
+
+
+class CircuitOpenError(Exception):
+    """
+    Запрос не отправлен: цепь разомкнута после серии ошибок
+
+    Attributes:
+        account_id: ID аккаунта (или None)
+        endpoint: эндпоинт Graph API ("campaigns", "adsets", "batch", ...)
+        retry_in: через сколько секунд будет пробный запрос
+    """
+
+    def __init__(self, account_id: Optional[str], endpoint: str, failures: int, retry_in: float):
+        self.account_id = account_id
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+        target = f"account {account_id}" if account_id else "app"
+        super().__init__(
+            f"Circuit open for {target} /{endpoint} after {failures} consecutive failures, "
+            f"next probe in {retry_in:.0f}s"
+        )
+
+
+class _Circuit:
+    __slots__ = ('state', 'failures', 'opened_at', 'probing')
+
+    def __init__(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        # Время отправки пробного запроса (0 — пробного запроса нет)
+        self.probing = 0.0
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи по паре (аккаунт, эндпоинт)
+
+    - closed: запросы идут; ошибки подряд считаются
+    - open: после failure_threshold ошибок подряд запросы сразу отклоняются
+      (CircuitOpenError) в течение reset_timeout секунд
+    - half_open: по истечении паузы пропускается один пробный запрос;
+      успех замыкает цепь, ошибка снова размыкает ее
+
+    Ошибкой считается только сбой API (сеть, 5xx, троттлинг после всех
+    повторов); ошибки валидации 4xx означают, что API работает.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        """
+        Args:
+            failure_threshold: ошибок подряд до размыкания (0 — размыкатель выключен)
+            reset_timeout: пауза до пробного запроса, сек
+            clock: источник времени (для тестов)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._circuits: Dict[Tuple[str, str], _Circuit] = {}
+        self._lock = threading.Lock()
+
+    def _circuit(self, account_id: Optional[str], endpoint: str) -> _Circuit:
+        key = (account_id or NO_ACCOUNT, endpoint)
+        circuit = self._circuits.get(key)
+        if circuit is None:
+            circuit = self._circuits[key] = _Circuit()
+        return circuit
+
+    def before_request(self, account_id: Optional[str], endpoint: str):
+        """
+        Проверяет, можно ли отправить запрос
+
+        Raises:
+            CircuitOpenError: цепь разомкнута (или пробный запрос уже отправлен)
+        """
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(account_id, endpoint)
+            if circuit.state == CLOSED:
+                return
+            now = self._clock()
+            elapsed = now - circuit.opened_at
+            if circuit.state == OPEN and elapsed >= self.reset_timeout:
+                circuit.state = HALF_OPEN
+            # Пробный запрос без ответа дольше паузы считается потерянным
+            if circuit.state == HALF_OPEN and (not circuit.probing or now - circuit.probing >= self.reset_timeout):
+                circuit.probing = now
+                return
+            retry_in = max(0.0, self.reset_timeout - elapsed)
+            failures = circuit.failures
+        metrics.inc('circuit_rejected_total', endpoint=endpoint)
+        raise CircuitOpenError(account_id, endpoint, failures, retry_in)
+
+    def record_success(self, account_id: Optional[str], endpoint: str):
+        """Запрос прошел: цепь замыкается, счетчик ошибок сбрасывается"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(account_id, endpoint)
+            circuit.state = CLOSED
+            circuit.failures = 0
+            circuit.probing = 0.0
+
+    def record_failure(self, account_id: Optional[str], endpoint: str):
+        """Сбой API: после failure_threshold сбоев подряд (или сбоя пробного запроса) цепь размыкается"""
+        if not self.failure_threshold:
+            return
+        with self._lock:
+            circuit = self._circuit(account_id, endpoint)
+            circuit.failures += 1
+            circuit.probing = 0.0
+            if circuit.state == CLOSED and circuit.failures < self.failure_threshold:
+                return
+            opened = circuit.state == CLOSED
+            circuit.state = OPEN
+            circuit.opened_at = self._clock()
+        if opened:
+            metrics.inc('circuit_opened_total', endpoint=endpoint)
+
+    def state(self, account_id: Optional[str], endpoint: str) -> str:
+        """Текущее состояние цепи (closed / open / half_open)"""
+        with self._lock:
+            circuit = self._circuits.get((account_id or NO_ACCOUNT, endpoint))
+            return circuit.state if circuit else CLOSED
+
+    def open_circuits(self) -> Dict[Tuple[str, str], int]:
+        """Разомкнутые цепи: (аккаунт, эндпоинт) → ошибок подряд"""
+        with self._lock:
+            return {
+                key: circuit.failures for key, circuit in self._circuits.items() if circuit.state != CLOSED
+            }
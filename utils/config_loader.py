@@ -1,55 +1,146 @@
 """
 Utility functions for loading configuration files with caching
 """
+import glob
 import json
 import os
-from functools import lru_cache
-from typing import Dict, Any
+import threading
+from typing import Dict, Any, List, Optional, Tuple
 
 
-# Кэш для загруженных JSON файлов
-_config_cache: Dict[str, Any] = {}
+# Корень проекта (относительные пути считаются от него)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Папка со словарями
+DICTIONARIES_DIR = os.path.join(BASE_DIR, 'dictionares')
+
+
+def resolve_path(file_path: str) -> str:
+    """Делает путь абсолютным относительно корня проекта"""
+    if not os.path.isabs(file_path):
+        file_path = os.path.join(BASE_DIR, file_path)
+    return os.path.normpath(file_path)
+
+
+def _file_stamp(file_path: str) -> Tuple[int, int]:
+    """Возвращает (mtime_ns, size) файла"""
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class DictionaryRegistry:
+    """
+    Единый реестр словарей с ленивой загрузкой
+
+    Файл читается при первом обращении и хранится в кэше вместе с
+    (mtime, size). При следующих обращениях файл не перечитывается,
+    пока его mtime или размер не изменились, поэтому долгоживущий
+    процесс подхватывает правки accounts.json / projects.json без рестарта.
+
+    Словари из папки dictionares/ доступны по имени без расширения:
+        registry['projects'], registry.get('locales', {})
+    """
+
+    def __init__(self, directory: str = DICTIONARIES_DIR):
+        self.directory = resolve_path(directory)
+        # Абсолютный путь → ((mtime_ns, size), данные)
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self._lock = threading.RLock()
+        # Растет при каждом сбросе кэша: производные индексы (tier_utils)
+        # сверяются с ним, не обращаясь к файлам
+        self.generation = 0
+
+    def path(self, name: str) -> str:
+        """Путь к словарю по имени ("tiers" или "tiers.json")"""
+        if not name.endswith('.json'):
+            name = f"{name}.json"
+        return os.path.join(self.directory, name)
+
+    def names(self) -> List[str]:
+        """Имена всех словарей в папке (без расширения)"""
+        return sorted(
+            os.path.splitext(os.path.basename(path))[0]
+            for path in glob.glob(os.path.join(self.directory, '*.json'))
+        )
+
+    def load_file(self, file_path: str) -> Any:
+        """
+        Загружает JSON файл через кэш реестра
+
+        Args:
+            file_path: путь к JSON файлу (относительный или абсолютный)
+
+        Returns:
+            Данные из JSON файла
+        """
+        file_path = resolve_path(file_path)
+        stamp = _file_stamp(file_path)
+
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries[file_path] = (stamp, data)
+            return data
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """Словарь по имени или default, если файла нет"""
+        try:
+            return self.load_file(self.path(name))
+        except FileNotFoundError:
+            return default
+
+    def __getitem__(self, name: str) -> Any:
+        return self.load_file(self.path(name))
+
+    def __contains__(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def invalidate(self, name: Optional[str] = None):
+        """Сбрасывает кэш одного словаря или всего реестра"""
+        with self._lock:
+            self.generation += 1
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(resolve_path(self.path(name)), None)
+
+    def cached(self) -> Dict[str, Any]:
+        """Закэшированные данные по абсолютному пути"""
+        with self._lock:
+            return {path: data for path, (_, data) in self._entries.items()}
+
+
+# Общий реестр для tier_utils, campaign_builder и CLI
+registry = DictionaryRegistry()
 
 
 def load_json(file_path: str, use_cache: bool = True) -> Dict:
     """
     Загружает JSON файл с опциональным кэшированием
-    
+
     Args:
         file_path: путь к JSON файлу (относительный или абсолютный)
         use_cache: использовать кэш (по умолчанию True)
-    
+
     Returns:
         Словарь с данными из JSON файла
     """
-    # Нормализуем путь
-    if not os.path.isabs(file_path):
-        # Относительный путь - делаем относительно корня проекта
-        base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        file_path = os.path.join(base_dir, file_path)
-    
-    # Проверяем кэш
-    if use_cache and file_path in _config_cache:
-        return _config_cache[file_path]
-    
-    # Загружаем файл
-    with open(file_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    # Сохраняем в кэш
     if use_cache:
-        _config_cache[file_path] = data
-    
-    return data
+        return registry.load_file(file_path)
+
+    with open(resolve_path(file_path), 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 
 def clear_cache():
     """Очищает кэш конфигураций"""
-    global _config_cache
-    _config_cache.clear()
+    registry.invalidate()
 
 
 def get_cached_configs() -> Dict[str, Any]:
     """Возвращает все закэшированные конфигурации"""
-    return _config_cache.copy()
-
+    return registry.cached()
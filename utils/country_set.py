@@ -0,0 +1,354 @@
+"""
+Utility functions for country sets: interned country table, bitsets and country_groups cover solver
+"""
+import time
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Tuple
+
+from utils.config_loader import registry
+
+
+class CountryTable:
+    """
+    Неизменяемая таблица стран: ISO код ↔ номер бита
+
+    Множество стран представляется целым числом (битсетом), поэтому
+    объединение, разность и проверка вхождения — одна операция над int.
+    """
+
+    def __init__(self, codes: Iterable[str]):
+        """
+        Args:
+            codes: ISO коды стран (дубликаты игнорируются, порядок — по алфавиту)
+        """
+        self.codes: Tuple[str, ...] = tuple(sorted(set(codes)))
+        self.index: Dict[str, int] = {code: bit for bit, code in enumerate(self.codes)}
+        self.all_mask = (1 << len(self.codes)) - 1
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, code: str) -> bool:
+        return code in self.index
+
+    def mask(self, codes: Iterable[str]) -> int:
+        """Битсет для списка кодов (неизвестные коды пропускаются)"""
+        index = self.index
+        result = 0
+        for code in codes:
+            bit = index.get(code)
+            if bit is not None:
+                result |= 1 << bit
+        return result
+
+    def unknown(self, codes: Iterable[str]) -> List[str]:
+        """Коды, которых нет в таблице (в исходном порядке, без повторов)"""
+        seen = set()
+        result = []
+        for code in codes:
+            if code not in self.index and code not in seen:
+                seen.add(code)
+                result.append(code)
+        return result
+
+    def filter(self, codes: Iterable[str], excluded: int, excluded_unknown: Iterable[str] = ()) -> List[str]:
+        """
+        Убирает из списка страны битсета excluded (порядок сохраняется)
+
+        Args:
+            codes: ISO коды стран
+            excluded: битсет исключаемых стран
+            excluded_unknown: исключаемые коды, которых нет в таблице
+        """
+        index = self.index
+        unknown = set(excluded_unknown)
+        result = []
+        for code in codes:
+            bit = index.get(code)
+            if bit is None:
+                if code not in unknown:
+                    result.append(code)
+            elif not (excluded >> bit) & 1:
+                result.append(code)
+        return result
+
+    def codes_of(self, mask: int) -> List[str]:
+        """Список кодов битсета (по алфавиту)"""
+        codes = self.codes
+        result = []
+        while mask:
+            low = mask & -mask
+            result.append(codes[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+
+class CountryGroup(NamedTuple):
+    """
+    Country group Facebook (из country_groups.json) в виде битсета
+
+    Attributes:
+        key: ключ группы для geo_locations.country_groups (например, "africa")
+        mask: битсет стран группы
+    """
+    key: str
+    mask: int
+
+
+class GeoCover(NamedTuple):
+    """
+    Покрытие набора стран для geo_locations:
+    country_groups ∪ countries − excluded_countries = целевой набор
+
+    Attributes:
+        country_groups: ключи country_groups
+        countries: страны, добавляемые к группам поштучно
+        excluded_countries: страны групп, которые не входят в целевой набор
+    """
+    country_groups: List[str]
+    countries: List[str]
+    excluded_countries: List[str]
+
+    @property
+    def size(self) -> int:
+        """Количество элементов в geo_locations (мера размера payload)"""
+        return len(self.country_groups) + len(self.countries) + len(self.excluded_countries)
+
+
+def build_country_groups(groups_data: Dict, table: CountryTable) -> Tuple[CountryGroup, ...]:
+    """
+    Строит битсеты country_groups
+
+    Args:
+        groups_data: содержимое country_groups.json ({"data": [...]})
+        table: таблица стран
+
+    Returns:
+        Кортеж CountryGroup (группа "worldwide" не включается: WW таргетируется отдельно)
+    """
+    groups = []
+    for group in groups_data.get('data', []):
+        if group.get('type', 'country_group') != 'country_group' or group.get('is_worldwide'):
+            continue
+        mask = table.mask(group.get('country_codes', []))
+        if mask:
+            groups.append(CountryGroup(group['key'], mask))
+    return tuple(groups)
+
+
+def _cover_cost(target: int, union: int, free: int, group_count: int) -> int:
+    """Размер geo_locations: группы + недостающие страны + платные исключения"""
+    return group_count + (target & ~union).bit_count() + (union & ~target & ~free).bit_count()
+
+
+def solve_country_groups(
+    target: int,
+    groups: Iterable[CountryGroup],
+    free_exclusions: int = 0,
+    max_groups: Optional[int] = None
+) -> Tuple[List[CountryGroup], int]:
+    """
+    Подбирает небольшой набор country_groups, точно покрывающий набор стран
+
+    Жадный алгоритм: на каждом шаге добавляется группа с максимальным выигрышем
+    (сколько стран из целевого набора больше не нужно перечислять минус сколько
+    новых стран придется исключить минус сама группа). Затем удаляются группы,
+    ставшие лишними.
+
+    Args:
+        target: битсет целевых стран
+        groups: доступные группы
+        free_exclusions: битсет стран, которые исключаются в любом случае
+            (запрещенные страны) — их исключение ничего не стоит
+        max_groups: максимум групп в результате (None — без ограничения)
+
+    Returns:
+        (выбранные группы, объединение их битсетов)
+    """
+    # Группы, не пересекающиеся с целью, никогда не выгодны
+    candidates = [group for group in groups if group.mask & target]
+    chosen: List[CountryGroup] = []
+    union = 0
+
+    while candidates and (max_groups is None or len(chosen) < max_groups):
+        best = None
+        best_gain = 0
+        for group in candidates:
+            new = group.mask & ~union
+            gain = (new & target).bit_count() - (new & ~target & ~free_exclusions).bit_count() - 1
+            if gain > best_gain:
+                best, best_gain = group, gain
+        if best is None:
+            break
+        chosen.append(best)
+        union |= best.mask
+        candidates.remove(best)
+
+    # Группы, которые после добавления следующих больше не уменьшают размер
+    improved = True
+    while improved and chosen:
+        improved = False
+        cost = _cover_cost(target, union, free_exclusions, len(chosen))
+        for group in list(chosen):
+            rest = 0
+            for other in chosen:
+                if other is not group:
+                    rest |= other.mask
+            if _cover_cost(target, rest, free_exclusions, len(chosen) - 1) <= cost:
+                chosen.remove(group)
+                union = rest
+                improved = True
+                break
+
+    return chosen, union
+
+
+def cover_countries(
+    codes: Iterable[str],
+    table: CountryTable,
+    groups: Iterable[CountryGroup],
+    free_exclusions: Iterable[str] = (),
+    max_groups: Optional[int] = None
+) -> GeoCover:
+    """
+    Точное покрытие списка стран через country_groups + countries − excluded_countries
+
+    Args:
+        codes: ISO коды целевых стран
+        table: таблица стран
+        groups: доступные группы
+        free_exclusions: страны, которые исключаются в любом случае (не учитываются в размере)
+        max_groups: максимум групп в результате
+
+    Returns:
+        GeoCover; если группы не выгодны — только список стран
+    """
+    codes = list(codes)
+    cover = cover_mask(table.mask(codes), table, groups, table.mask(free_exclusions), max_groups)
+    # Страны вне таблицы группами покрыть нельзя — перечисляем их поштучно
+    cover.countries.extend(table.unknown(codes))
+    return cover
+
+
+def cover_mask(
+    target: int,
+    table: CountryTable,
+    groups: Iterable[CountryGroup],
+    free_exclusions: int = 0,
+    max_groups: Optional[int] = None
+) -> GeoCover:
+    """То же, что cover_countries, для набора стран в виде битсета"""
+    chosen, union = solve_country_groups(target, groups, free_exclusions & ~target, max_groups)
+    return GeoCover(
+        country_groups=[group.key for group in chosen],
+        countries=table.codes_of(target & ~union),
+        excluded_countries=table.codes_of(union & ~target)
+    )
+
+
+class CountryUniverse(NamedTuple):
+    """
+    Все страны словарей в виде битсетов (коды извлекаются один раз при загрузке)
+
+    Attributes:
+        table: таблица стран (коды из tiers.json и country_groups.json)
+        groups: битсеты country_groups
+        tier_masks: название тира → битсет стран тира
+        worldwide: битсет всех стран из всех тиров
+    """
+    table: CountryTable
+    groups: Tuple[CountryGroup, ...]
+    tier_masks: Mapping[str, int]
+    worldwide: int
+
+
+def _extract_code(entry) -> str:
+    return entry['Country'] if isinstance(entry, dict) else entry
+
+
+def build_country_universe(tiers_data: Dict, groups_data: Dict) -> CountryUniverse:
+    """
+    Строит таблицу стран и битсеты тиров и country_groups
+
+    Args:
+        tiers_data: содержимое tiers.json
+        groups_data: содержимое country_groups.json
+    """
+    tier_codes = {
+        tier: [_extract_code(entry) for entry in entries]
+        for tier, entries in tiers_data.items()
+    }
+    codes = [code for entries in tier_codes.values() for code in entries]
+    for group in groups_data.get('data', []):
+        codes.extend(group.get('country_codes', []))
+
+    table = CountryTable(codes)
+    tier_masks = {tier: table.mask(entries) for tier, entries in tier_codes.items()}
+    worldwide = 0
+    for mask in tier_masks.values():
+        worldwide |= mask
+
+    return CountryUniverse(
+        table=table,
+        groups=build_country_groups(groups_data, table),
+        tier_masks=MappingProxyType(tier_masks),
+        worldwide=worldwide
+    )
+
+
+# Как часто битсеты сверяются с tiers.json / country_groups.json на диске
+# (stat через реестр), сек: как TIER_INDEX_RECHECK_SECONDS в tier_utils
+COUNTRY_UNIVERSE_RECHECK_SECONDS = 1.0
+
+# Битсеты строятся один раз на процесс и перестраиваются,
+# только если реестр перечитал tiers.json или country_groups.json
+_universe: Optional[CountryUniverse] = None
+_NO_GROUPS: Dict = {}
+_universe_source = None
+# Когда битсеты последний раз сверялись с файлами, и поколение реестра на тот момент
+_universe_checked = 0.0
+_universe_generation = -1
+
+
+def get_country_universe() -> CountryUniverse:
+    """
+    Битсеты стран по словарям из реестра
+
+    Словари сверяются с диском не чаще раза в COUNTRY_UNIVERSE_RECHECK_SECONDS
+    и сразу после сброса кэша реестра (registry.invalidate / clear_cache)
+    """
+    global _universe, _universe_source, _universe_checked, _universe_generation
+    now = time.monotonic()
+    if (
+        _universe is not None
+        and _universe_generation == registry.generation
+        and now - _universe_checked < COUNTRY_UNIVERSE_RECHECK_SECONDS
+    ):
+        return _universe
+
+    generation = registry.generation
+    tiers_data = registry['tiers']
+    groups_data = registry.get('country_groups', _NO_GROUPS)
+    source = (tiers_data, groups_data)
+
+    if _universe is None or any(a is not b for a, b in zip(source, _universe_source)):
+        _universe = build_country_universe(tiers_data, groups_data)
+        _universe_source = source
+    _universe_checked = now
+    _universe_generation = generation
+    return _universe
+
+
+def get_geo_cover(codes: Iterable[str], free_exclusions: Iterable[str] = ()) -> GeoCover:
+    """
+    Покрытие списка стран по данным из реестра словарей
+
+    Args:
+        codes: ISO коды целевых стран
+        free_exclusions: страны, которые исключаются в любом случае (запрещенные)
+
+    Returns:
+        GeoCover
+    """
+    universe = get_country_universe()
+    return cover_countries(codes, universe.table, universe.groups, free_exclusions)
@@ -0,0 +1,180 @@
+"""
+Dead-letter file for campaigns that could not be created
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from utils.campaign_builder import GraphAPIError
+from utils.circuit_breaker import CircuitOpenError
+from utils.jsonl import iter_jsonl, open_jsonl_for_append
+
+
+# Типы ошибок в записях (поле error_type)
+ERROR_TYPES = {
+    'circuit_open': 'not sent: too many consecutive Graph API failures for the account',
+    'api': 'Graph API returned an error',
+    'network': 'connection failed or timed out',
+    'invalid_spec': 'spec could not be turned into a request',
+    'error': 'unexpected error'
+}
+
+
+def error_type(error: BaseException) -> str:
+    """Тип ошибки для записи (см. ERROR_TYPES)"""
+    if isinstance(error, CircuitOpenError):
+        return 'circuit_open'
+    if isinstance(error, GraphAPIError):
+        return 'api'
+    # requests.RequestException — наследник OSError
+    if isinstance(error, OSError):
+        return 'network'
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        return 'invalid_spec'
+    return 'error'
+
+
+class DeadLetterFile:
+    """
+    Файл неудачных созданий в формате JSONL (одна запись на строку)
+
+    Записи:
+        - failed: спецификация, текст и тип ошибки, номер попытки
+        - replayed: спецификация создана при повторе (--replay)
+        - resumable: при повторе создана только кампания; пара
+          дозавершается по журналу запуска (--resume)
+
+    Сюда попадают только спецификации без созданных объектов: кампания без
+    адсета есть в журнале запуска, и повтор по спецификации создал бы дубль
+    (см. unfinished).
+
+    Повторная ошибка той же спецификации дописывается с тем же id и
+    увеличенным attempts. Файл создается при первой ошибке; каждая запись
+    сбрасывается на диск (fsync).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        # Кампании без адсета (не записываются, дозавершаются через --resume)
+        self.unfinished = 0
+        self._file = None
+        self._next_id = None
+        self._lock = threading.Lock()
+
+    def _open(self):
+        """Открывает файл на дозапись (вызывается под _lock)"""
+        existing = load_dead_letters(self.path) if os.path.exists(self.path) else {}
+        self._next_id = max((int(key) for key in existing if key.isdigit()), default=0) + 1
+        self._file = open_jsonl_for_append(self.path)
+
+    def _write(self, record: Dict) -> str:
+        with self._lock:
+            if self._file is None:
+                self._open()
+            if record.get('id') is None:
+                record['id'] = str(self._next_id)
+                self._next_id += 1
+            record['ts'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            return record['id']
+
+    def failed(
+        self,
+        spec: Dict,
+        error: str,
+        error_type: str = 'error',
+        attempts: int = 1,
+        letter_id: Optional[str] = None
+    ) -> str:
+        """
+        Записывает неудачное создание
+
+        Args:
+            spec: спецификация (camp_data, objective, adset_params)
+            error: текст ошибки
+            error_type: тип ошибки (см. ERROR_TYPES)
+            attempts: номер попытки (1 — первый запуск)
+            letter_id: id записи при повторе (None — новая запись)
+
+        Returns:
+            id записи
+        """
+        with self._lock:
+            self.count += 1
+        return self._write({
+            'event': 'failed',
+            'id': letter_id,
+            'name': spec['camp_data']['name'],
+            'account_id': spec['camp_data']['account_id'],
+            'error_type': error_type,
+            'error': error,
+            'attempts': attempts,
+            'spec': spec
+        })
+
+    def resumable(self, campaign_id: str, letter_id: Optional[str] = None):
+        """
+        Учитывает кампанию, созданную без адсета
+
+        Спецификация не записывается: пару дозавершает --resume по журналу.
+        Запись повтора (letter_id) снимается с повтора событием resumable.
+        """
+        with self._lock:
+            self.unfinished += 1
+        if letter_id:
+            self._write({'event': 'resumable', 'id': letter_id, 'campaign_id': campaign_id})
+
+    def replayed(self, letter_id: str, campaign_id: Optional[str] = None, adset_id: Optional[str] = None):
+        """Отмечает, что спецификация создана при повторе"""
+        self._write({'event': 'replayed', 'id': letter_id, 'campaign_id': campaign_id, 'adset_id': adset_id})
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_dead_letters(path: str) -> "OrderedDict[str, Dict]":
+    """
+    Состояние записей файла неудачных созданий
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        OrderedDict id → последняя запись failed с полем replayed
+        (True, если спецификация создана при повторе или кампания создана
+        и пара дозавершается через --resume)
+    """
+    entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    for record in iter_jsonl(path):
+        letter_id = record.get('id')
+        event = record.get('event')
+        if event == 'failed':
+            record['replayed'] = False
+            entries[letter_id] = record
+        elif event in ('replayed', 'resumable') and letter_id in entries:
+            entries[letter_id]['replayed'] = True
+
+    return entries
+
+
+def pending_dead_letters(entries: Dict[str, Dict]) -> "OrderedDict[str, Dict]":
+    """Записи, которые еще не созданы повтором"""
+    return OrderedDict(
+        (letter_id, entry) for letter_id, entry in entries.items() if not entry['replayed']
+    )
@@ -0,0 +1,271 @@
+"""
+Shared HTTP client for Facebook Marketing API (connection pool, timeouts, retries)
+"""
+import random
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from utils.circuit_breaker import CircuitBreaker
+from utils.config_loader import registry
+from utils.metrics import endpoint_label, metrics
+from utils.rate_limit import UsageScheduler
+
+
+# HTTP статусы, при которых запрос имеет смысл повторить
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Коды ошибок Graph API, означающие троттлинг
+THROTTLING_ERROR_CODES = {4, 17, 32, 613, 80000, 80001, 80002, 80003, 80004, 80005,
+                          80006, 80008, 80009, 80014}
+
+# Троттлинг на уровне приложения (остальные коды относятся к аккаунту)
+APP_THROTTLING_ERROR_CODES = {4}
+
+# ID аккаунта в пути запроса ("act_123/campaigns")
+_ACCOUNT_PATH_RE = re.compile(r'^act_(\d+)')
+
+
+def account_id_from_path(path: str) -> Optional[str]:
+    """Извлекает ID аккаунта из пути запроса"""
+    match = _ACCOUNT_PATH_RE.match(path)
+    return match.group(1) if match else None
+
+
+def _error_code(response: requests.Response) -> Optional[int]:
+    try:
+        return (response.json().get('error') or {}).get('code')
+    except (ValueError, AttributeError):
+        return None
+
+
+def is_throttling_response(response: requests.Response) -> bool:
+    """Проверяет, что ответ Graph API — ошибка троттлинга"""
+    if response.status_code == 429:
+        return True
+    return _error_code(response) in THROTTLING_ERROR_CODES
+
+
+def is_transient_response(response: requests.Response) -> bool:
+    """Проверяет, что ошибку в ответе можно повторить (5xx, троттлинг, is_transient)"""
+    if response.status_code in RETRYABLE_STATUS_CODES:
+        return True
+    if response.status_code < 400:
+        return False
+    if is_throttling_response(response):
+        return True
+    try:
+        error = response.json().get('error') or {}
+    except (ValueError, AttributeError):
+        return False
+    return bool(error.get('is_transient'))
+
+
+def is_request_not_sent(error: requests.RequestException) -> bool:
+    """Проверяет, что запрос не дошел до сервера (не удалось установить соединение)"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    # requests оборачивает MaxRetryError, причина лежит в .reason
+    reason = getattr(reason, 'reason', reason)
+    return isinstance(reason, NewConnectionError)
+
+
+class GraphClient:
+    """
+    Клиент Graph API поверх requests.Session
+
+    - один пул keep-alive соединений на все запросы (и на все потоки)
+    - таймауты на подключение и чтение у каждого запроса
+    - ограниченное число повторов для 5xx / троттлинга с jitter-паузой
+    - планировщик лимитов: перед запросом ждет по оценке оставшегося лимита
+      аккаунта, после ответа обновляет оценку по заголовкам X-*-Usage
+    - размыкатель цепи: после серии сбоев аккаунта / эндпоинта запросы к ним
+      сразу завершаются CircuitOpenError, а не ждут таймаутов и повторов
+
+    POST повторяется после ответа с ошибкой или если соединение не удалось
+    установить, но не после таймаута чтения или обрыва уже отправленного
+    запроса: он мог дойти до API, и повтор создал бы дубликат.
+    """
+
+    def __init__(
+        self,
+        api_config: Optional[Dict] = None,
+        pool_size: int = 32,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        scheduler: Optional[UsageScheduler] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        """
+        Args:
+            api_config: конфигурация API (base_url, api_version, access_token);
+                если не передана, берется из реестра словарей при каждом запросе
+            pool_size: размер пула соединений на один хост
+            connect_timeout: таймаут подключения, сек
+            read_timeout: таймаут чтения ответа, сек
+            max_retries: максимум повторов одного запроса
+            backoff_base: базовая пауза перед повтором, сек (растет как base * 2^attempt)
+            backoff_max: максимальная пауза перед повтором, сек
+            scheduler: планировщик лимитов (по умолчанию — собственный для клиента)
+            breaker: размыкатель цепи (по умолчанию — собственный для клиента)
+        """
+        self._api_config = api_config
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.scheduler = scheduler if scheduler is not None else UsageScheduler()
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    @property
+    def api_config(self) -> Dict:
+        if self._api_config is not None:
+            return self._api_config
+        return registry['api_config']
+
+    def url(self, path: str = '') -> str:
+        """Полный URL для пути относительно версии API"""
+        config = self.api_config
+        return f"{config['base_url']}/{config['api_version']}/{path}"
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        """Пауза перед повтором: full jitter, но не меньше Retry-After"""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        if response is not None and response.headers.get('Retry-After'):
+            try:
+                delay = max(delay, float(response.headers['Retry-After']))
+            except ValueError:
+                pass
+        return delay
+
+    def observe_response(self, account_id: Optional[str], response: requests.Response):
+        """Передает планировщику заголовки лимитов и ошибки троттлинга"""
+        self.scheduler.observe(account_id, response.headers)
+        if is_throttling_response(response):
+            retry_after = None
+            if response.headers.get('Retry-After'):
+                try:
+                    retry_after = float(response.headers['Retry-After'])
+                except ValueError:
+                    pass
+            app_level = _error_code(response) in APP_THROTTLING_ERROR_CODES
+            self.scheduler.observe_throttled(None if app_level else account_id, retry_after)
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        account_id: Optional[str] = None,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Выполняет запрос с таймаутами и повторами
+
+        Args:
+            method: HTTP метод
+            path: путь относительно версии API (например, "act_123/campaigns")
+            account_id: ID аккаунта для планировщика лимитов
+                (по умолчанию извлекается из пути "act_{id}/...")
+            **kwargs: параметры requests (params, data)
+
+        Returns:
+            Ответ последней попытки (в том числе с ошибкой, если повторы закончились)
+
+        Raises:
+            requests.RequestException: сетевая ошибка после исчерпания повторов
+            CircuitOpenError: цепь аккаунта / эндпоинта разомкнута, запрос не отправлялся
+        """
+        url = self.url(path)
+        kwargs.setdefault('timeout', self.timeout)
+
+        # access_token добавляется к параметрам запроса
+        params = dict(kwargs.pop('params', None) or {})
+        params.setdefault('access_token', self.api_config['access_token'])
+
+        if account_id is None:
+            account_id = account_id_from_path(path)
+
+        idempotent = method.upper() in ('GET', 'HEAD')
+        endpoint = endpoint_label(path)
+        self.breaker.before_request(account_id, endpoint)
+        attempt = 0
+        while True:
+            with metrics.timer('rate_limit_wait_seconds', endpoint=endpoint):
+                self.scheduler.acquire(account_id)
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, params=params, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                metrics.observe('graph_request_seconds', time.perf_counter() - started, method=method, endpoint=endpoint)
+                metrics.inc('graph_requests_total', method=method, endpoint=endpoint, status='network_error')
+                retryable = idempotent or is_request_not_sent(e)
+                if not retryable or attempt >= self.max_retries:
+                    self.breaker.record_failure(account_id, endpoint)
+                    raise
+                response = None
+                metrics.inc('graph_retries_total', endpoint=endpoint, reason='network_error')
+            else:
+                metrics.observe('graph_request_seconds', time.perf_counter() - started, method=method, endpoint=endpoint)
+                metrics.inc('graph_requests_total', method=method, endpoint=endpoint, status=response.status_code)
+                self.observe_response(account_id, response)
+                if metrics.enabled and is_throttling_response(response):
+                    metrics.inc('graph_throttled_total', endpoint=endpoint, code=_error_code(response))
+                transient = is_transient_response(response)
+                if not transient or attempt >= self.max_retries:
+                    # Ошибки 4xx (валидация и т.п.) означают, что API отвечает
+                    if transient:
+                        self.breaker.record_failure(account_id, endpoint)
+                    else:
+                        self.breaker.record_success(account_id, endpoint)
+                    return response
+                metrics.inc('graph_retries_total', endpoint=endpoint, reason=response.status_code)
+
+            time.sleep(self._backoff(attempt, response))
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request('POST', path, **kwargs)
+
+
+# Общие клиенты по (base_url, api_version, access_token)
+_default_clients: Dict[Tuple[str, str, str], GraphClient] = {}
+_default_clients_lock = threading.Lock()
+
+
+def get_default_client(api_config: Optional[Dict] = None) -> GraphClient:
+    """
+    Возвращает общий клиент для конфигурации API
+
+    Args:
+        api_config: конфигурация API (если не передана, берется из реестра словарей)
+
+    Returns:
+        GraphClient, переиспользуемый между вызовами
+    """
+    if api_config is None:
+        api_config = registry['api_config']
+    key = (api_config['base_url'], api_config['api_version'], api_config['access_token'])
+
+    with _default_clients_lock:
+        client = _default_clients.get(key)
+        if client is None:
+            client = GraphClient(dict(api_config))
+            _default_clients[key] = client
+        return client
@@ -0,0 +1,141 @@
+"""
+Write-ahead journal for resumable multi-campaign runs
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from utils.jsonl import iter_jsonl, open_jsonl_for_append
+
+
+class RunJournal:
+    """
+    Журнал запуска в формате JSONL (одна запись на строку)
+
+    Записи:
+        - planned: спецификация перед отправкой в API
+        - campaign: ID созданной кампании
+        - adset: ID созданного адсета
+        - completed: кампания и адсет созданы и записаны в logs.csv
+        - failed: ошибка при создании
+
+    Каждая запись сбрасывается на диск (fsync) до перехода к следующему шагу,
+    поэтому после падения процесса по журналу видно, какие пары
+    (кампания, адсет) уже созданы, а какие нет.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+        # Следующий ключ продолжает нумерацию существующего журнала
+        existing = load_journal(path) if os.path.exists(path) else {}
+        self._next_key = max((int(key) for key in existing if key.isdigit()), default=0) + 1
+        self._lock = threading.Lock()
+        self._file = open_jsonl_for_append(path)
+
+    def _write(self, record: Dict):
+        record['ts'] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def planned(self, spec: Dict) -> str:
+        """
+        Записывает запланированную спецификацию
+
+        Args:
+            spec: спецификация (должна сериализоваться в JSON)
+
+        Returns:
+            Ключ записи в журнале
+        """
+        with self._lock:
+            key = str(self._next_key)
+            self._next_key += 1
+        self._write({'event': 'planned', 'key': key, 'spec': spec})
+        return key
+
+    def campaign_created(self, key: str, campaign_id: str):
+        self._write({'event': 'campaign', 'key': key, 'campaign_id': campaign_id})
+
+    def adset_created(self, key: str, adset_id: str):
+        self._write({'event': 'adset', 'key': key, 'adset_id': adset_id})
+
+    def completed(self, key: str):
+        self._write({'event': 'completed', 'key': key})
+
+    def failed(self, key: str, error: str):
+        self._write({'event': 'failed', 'key': key, 'error': error})
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def load_journal(path: str) -> "OrderedDict[str, Dict]":
+    """
+    Восстанавливает состояние запуска по журналу
+
+    Args:
+        path: путь к журналу
+
+    Returns:
+        OrderedDict ключ → состояние:
+            - spec: спецификация
+            - campaign_id: ID кампании или None
+            - adset_id: ID адсета или None
+            - completed: True, если пара создана и записана в лог
+            - error: последняя ошибка или None
+    """
+    entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    for record in iter_jsonl(path):
+        key = record.get('key')
+        event = record.get('event')
+        if event == 'planned':
+            entries[key] = {
+                'spec': record['spec'],
+                'campaign_id': None,
+                'adset_id': None,
+                'completed': False,
+                'error': None
+            }
+            continue
+
+        entry = entries.get(key)
+        if entry is None:
+            continue
+        if event == 'campaign':
+            entry['campaign_id'] = record['campaign_id']
+        elif event == 'adset':
+            entry['adset_id'] = record['adset_id']
+        elif event == 'completed':
+            entry['completed'] = True
+        elif event == 'failed':
+            entry['error'] = record.get('error')
+
+    return entries
+
+
+def pending_entries(entries: Dict[str, Dict]) -> "OrderedDict[str, Dict]":
+    """Записи журнала, которые еще не завершены"""
+    return OrderedDict(
+        (key, entry) for key, entry in entries.items() if not entry['completed']
+    )
+
+
+def default_journal_path(directory: str = 'journals', now: Optional[datetime] = None) -> str:
+    """Путь к журналу нового запуска (journals/run_YYYYMMDD_HHMMSS.jsonl)"""
+    now = now or datetime.now()
+    return os.path.join(directory, f"run_{now.strftime('%Y%m%d_%H%M%S')}.jsonl")
@@ -0,0 +1,57 @@
+"""
+Append-only JSONL files (run journal, dead-letter file)
+"""
+import json
+import os
+from typing import Dict, IO, Iterator
+
+
+def iter_jsonl(path: str) -> Iterator[Dict]:
+    """
+    Записи JSONL файла по порядку
+
+    Пустые строки и недописанная строка (процесс упал во время записи)
+    пропускаются.
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        Итератор записей
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def open_jsonl_for_append(path: str) -> IO[str]:
+    """
+    Открывает JSONL файл на дозапись (папка создается при необходимости)
+
+    Недописанная последняя строка закрывается переводом строки, чтобы не
+    склеиться с новой записью.
+
+    Args:
+        path: путь к файлу
+
+    Returns:
+        Файл, открытый на дозапись
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    f = open(path, 'a', encoding='utf-8')
+    if os.path.getsize(path) > 0:
+        with open(path, 'rb') as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b'\n':
+                f.write('\n')
+                f.flush()
+    return f
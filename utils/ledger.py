@@ -0,0 +1,522 @@
+"""
+Utility functions for the indexed SQLite campaign ledger (replacement for logs.csv)
+"""
+import csv
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from utils.logging import DEFAULT_LEDGER_PATH, LOG_HEADER
+from utils.naming import NAMING_FIELDS, parse_campaign_name
+
+
+# Версия схемы (PRAGMA user_version)
+SCHEMA_VERSION = 2
+
+# Поля нейминга, которые хранятся отдельными колонками (project — старый формат)
+NAME_COLUMNS = NAMING_FIELDS + ['project']
+
+# Колонки таблицы campaigns (кроме id) в порядке вставки
+LEDGER_COLUMNS = LOG_HEADER + ['account_id', 'spec', 'source'] + NAME_COLUMNS
+
+# Колонки, по которым можно фильтровать (--where в campaign_ledger.py)
+FILTER_COLUMNS = ['campaign_name', 'campaign_id', 'adset_id', 'account_id', 'source'] + NAME_COLUMNS
+
+_SCHEMA = [
+    f"""
+    CREATE TABLE IF NOT EXISTS campaigns (
+        id INTEGER PRIMARY KEY,
+        campaign_name TEXT NOT NULL,
+        campaign_id TEXT,
+        adset_id TEXT,
+        created_at TEXT NOT NULL,
+        account_id TEXT,
+        spec TEXT,
+        source TEXT NOT NULL,
+        {', '.join(f'{column} TEXT' for column in NAME_COLUMNS)}
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS campaigns_name ON campaigns (campaign_name)",
+    # Уникальный: повторная миграция и повторная запись той же кампании ничего не дублируют
+    "CREATE UNIQUE INDEX IF NOT EXISTS campaigns_campaign_id ON campaigns (campaign_id) WHERE campaign_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS campaigns_adset_id ON campaigns (adset_id)",
+    "CREATE INDEX IF NOT EXISTS campaigns_created_at ON campaigns (created_at)",
+    "CREATE INDEX IF NOT EXISTS campaigns_account_id ON campaigns (account_id)",
+    # Версия 2: отметки updated_time для инкрементальной сверки (campaign_ledger.py reconcile)
+    """
+    CREATE TABLE IF NOT EXISTS reconcile_state (
+        account_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        watermark TEXT NOT NULL,
+        reconciled_at TEXT NOT NULL,
+        PRIMARY KEY (account_id, kind)
+    )
+    """
+]
+
+# Колонки, по которым ищутся объекты из Graph API при сверке
+LOOKUP_COLUMNS = ('campaign_id', 'adset_id', 'campaign_name')
+
+_INSERT = (
+    f"INSERT OR IGNORE INTO campaigns ({', '.join(LEDGER_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in LEDGER_COLUMNS)})"
+)
+
+# Сколько значений передавать в одном IN (...) (лимит параметров SQLite)
+_IN_CHUNK = 500
+
+
+def make_ledger_row(
+    campaign_name: str,
+    campaign_id: Optional[str] = None,
+    adset_id: Optional[str] = None,
+    created_at: Optional[str] = None,
+    account_id: Optional[str] = None,
+    spec: Optional[Dict] = None,
+    source: str = 'run'
+) -> Tuple:
+    """
+    Строка таблицы campaigns (значения в порядке LEDGER_COLUMNS)
+
+    Args:
+        campaign_name: название кампании
+        campaign_id: ID кампании
+        adset_id: ID адсета
+        created_at: время создания (по умолчанию — текущее)
+        account_id: ID рекламного аккаунта
+        spec: спецификация кампании (сохраняется как JSON)
+        source: откуда запись: run (создание) или csv (миграция)
+
+    Returns:
+        Кортеж значений
+    """
+    fields = parse_campaign_name(campaign_name) or {}
+    countries = fields.get('naming_countries')
+    fields['naming_countries'] = ','.join(countries) if countries else None
+    return (
+        campaign_name,
+        str(campaign_id) if campaign_id else None,
+        str(adset_id) if adset_id else None,
+        created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        str(account_id) if account_id else None,
+        json.dumps(spec, ensure_ascii=False, sort_keys=True) if spec is not None else None,
+        source,
+        *(fields.get(column) for column in NAME_COLUMNS)
+    )
+
+
+class Ledger:
+    """
+    Журнал созданных кампаний в SQLite
+
+    Хранит то же, что logs.csv, плюс ID аккаунта, полную спецификацию (JSON)
+    и разобранные поля нейминга. Индексы по campaign_name, campaign_id,
+    adset_id, created_at и account_id: поиск по названию или ID не читает
+    весь журнал. База работает в режиме WAL, поэтому запись из параллельных
+    потоков и процессов не блокирует чтение (запросы, проверка дублей).
+    У каждого потока свое соединение.
+
+    Пример:
+        ledger = Ledger('ledger.db')
+        ledger.record('AND_Latam_M_18-65+_CPI_01032025_KH_CBO_bc_ENG', '120...', '120...')
+        ledger.exists('AND_Latam_M_18-65+_CPI_01032025_KH_CBO_bc_ENG')
+    """
+
+    def __init__(self, path: str = DEFAULT_LEDGER_PATH, timeout: float = 30.0):
+        """
+        Args:
+            path: путь к файлу базы
+            timeout: сколько ждать блокировки записи другим соединением, секунд
+        """
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        """Соединение текущего потока (создается при первом обращении)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            return conn
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # В режиме WAL достаточно для сохранности после сбоя процесса
+        conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            if not self._schema_ready:
+                self._create_schema(conn)
+                self._schema_ready = True
+            self._connections.append(conn)
+        self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _create_schema(conn: sqlite3.Connection):
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Ledger schema version {version} is newer than supported ({SCHEMA_VERSION})")
+        with conn:
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def record(
+        self,
+        campaign_name: str,
+        campaign_id: Optional[str] = None,
+        adset_id: Optional[str] = None,
+        account_id: Optional[str] = None,
+        spec: Optional[Dict] = None
+    ) -> bool:
+        """
+        Записывает созданную кампанию
+
+        Returns:
+            True, если запись добавлена (False — кампания с таким ID уже есть)
+        """
+        row = make_ledger_row(campaign_name, campaign_id, adset_id, account_id=account_id, spec=spec)
+        conn = self._connect()
+        with conn:
+            return conn.execute(_INSERT, row).rowcount > 0
+
+    def record_many(self, rows: Iterable[Tuple]) -> int:
+        """
+        Записывает пачку строк (make_ledger_row) одной транзакцией
+
+        Returns:
+            Количество добавленных записей
+        """
+        conn = self._connect()
+        before = conn.total_changes
+        with conn:
+            conn.executemany(_INSERT, rows)
+        return conn.total_changes - before
+
+    def update(self, campaign_id: str, campaign_name: Optional[str] = None, spec: Optional[Dict] = None) -> bool:
+        """
+        Обновляет название (и разобранные поля нейминга) и/или спецификацию записи
+
+        Args:
+            campaign_id: ID кампании
+            campaign_name: новое название
+            spec: новая спецификация
+
+        Returns:
+            True, если запись найдена
+        """
+        assignments = []
+        params: List = []
+        if campaign_name is not None:
+            row = make_ledger_row(campaign_name)
+            values = dict(zip(LEDGER_COLUMNS, row))
+            for column in ['campaign_name'] + NAME_COLUMNS:
+                assignments.append(f"{column} = ?")
+                params.append(values[column])
+        if spec is not None:
+            assignments.append("spec = ?")
+            params.append(json.dumps(spec, ensure_ascii=False, sort_keys=True))
+        if not assignments:
+            return False
+        conn = self._connect()
+        with conn:
+            return conn.execute(
+                f"UPDATE campaigns SET {', '.join(assignments)} WHERE campaign_id = ?", [*params, str(campaign_id)]
+            ).rowcount > 0
+
+    def exists(self, campaign_name: str) -> bool:
+        """Есть ли в журнале кампания с таким названием (поиск по индексу)"""
+        row = self._connect().execute(
+            "SELECT 1 FROM campaigns WHERE campaign_name = ? LIMIT 1", (campaign_name,)
+        ).fetchone()
+        return row is not None
+
+    def existing_names(self, names: Iterable[str]) -> Set[str]:
+        """
+        Какие из названий уже есть в журнале
+
+        Args:
+            names: названия кампаний
+
+        Returns:
+            Множество найденных названий
+        """
+        names = list(dict.fromkeys(names))
+        found = set()
+        conn = self._connect()
+        for start in range(0, len(names), _IN_CHUNK):
+            chunk = names[start:start + _IN_CHUNK]
+            found.update(
+                row[0] for row in conn.execute(
+                    f"SELECT DISTINCT campaign_name FROM campaigns "
+                    f"WHERE campaign_name IN ({', '.join('?' for _ in chunk)})",
+                    chunk
+                )
+            )
+        return found
+
+    def find_by(self, column: str, values: Iterable[str]) -> Dict[str, List[Dict]]:
+        """
+        Записи по списку значений индексированной колонки
+
+        Args:
+            column: campaign_id, adset_id или campaign_name
+            values: значения (например, ID одной страницы ответа Graph API)
+
+        Returns:
+            Значение → найденные записи (значения без записей не попадают)
+        """
+        if column not in LOOKUP_COLUMNS:
+            raise KeyError(f"Lookup by '{column}' is not indexed")
+        values = list(dict.fromkeys(str(value) for value in values if value))
+        found: Dict[str, List[Dict]] = {}
+        for start in range(0, len(values), _IN_CHUNK):
+            for row in self.query(where={column: values[start:start + _IN_CHUNK]}):
+                found.setdefault(row[column], []).append(row)
+        return found
+
+    def set_account_id(self, campaign_ids: Iterable[str], account_id: str) -> int:
+        """
+        Проставляет ID аккаунта записям без него (перенесенным из logs.csv)
+
+        Returns:
+            Количество обновленных записей
+        """
+        campaign_ids = list(campaign_ids)
+        conn = self._connect()
+        updated = 0
+        with conn:
+            for start in range(0, len(campaign_ids), _IN_CHUNK):
+                chunk = campaign_ids[start:start + _IN_CHUNK]
+                updated += conn.execute(
+                    f"UPDATE campaigns SET account_id = ? WHERE account_id IS NULL "
+                    f"AND campaign_id IN ({', '.join('?' for _ in chunk)})",
+                    [account_id, *chunk]
+                ).rowcount
+        return updated
+
+    def get_watermark(self, account_id: str, kind: str) -> Optional[str]:
+        """Последний updated_time, до которого сверен аккаунт (campaign / adset)"""
+        row = self._connect().execute(
+            "SELECT watermark FROM reconcile_state WHERE account_id = ? AND kind = ?", (account_id, kind)
+        ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, account_id: str, kind: str, watermark: str):
+        """Сохраняет отметку updated_time после успешной сверки"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reconcile_state (account_id, kind, watermark, reconciled_at) "
+                "VALUES (?, ?, ?, ?)",
+                (account_id, kind, watermark, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+
+    def reset_seen(self):
+        """
+        Очищает отметки объектов, найденных в аккаунте при сверке
+
+        Отметки хранятся во временных таблицах соединения текущего потока
+        (на диске, а не в памяти процесса), поэтому сверка аккаунтов со
+        100k+ объектов не держит все ID в памяти.
+        """
+        conn = self._connect()
+        with conn:
+            for kind in ('campaign', 'adset'):
+                conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS seen_{kind} (id TEXT PRIMARY KEY)")
+                conn.execute(f"DELETE FROM seen_{kind}")
+
+    def mark_seen(self, kind: str, ids: Iterable[str]):
+        """Отмечает объекты (campaign / adset), найденные в аккаунте"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(f"INSERT OR IGNORE INTO seen_{kind} (id) VALUES (?)", ((str(i),) for i in ids))
+
+    def iter_unseen(self, account_ids: Sequence[str], include_unattributed: bool = False) -> Iterator[Dict]:
+        """
+        Записи аккаунтов, чьи кампания или адсет не отмечены mark_seen
+
+        Args:
+            account_ids: сверенные аккаунты
+            include_unattributed: также записи без account_id (сверены все аккаунты)
+
+        Returns:
+            Итератор записей с флагами campaign_seen / adset_seen
+        """
+        clauses = [f"c.account_id IN ({', '.join('?' for _ in account_ids)})"] if account_ids else []
+        if include_unattributed:
+            clauses.append("c.account_id IS NULL")
+        if not clauses:
+            return
+        sql = (
+            "SELECT c.*, sc.id IS NOT NULL AS campaign_seen, sa.id IS NOT NULL AS adset_seen "
+            "FROM campaigns c "
+            "LEFT JOIN temp.seen_campaign sc ON sc.id = c.campaign_id "
+            "LEFT JOIN temp.seen_adset sa ON sa.id = c.adset_id "
+            f"WHERE c.campaign_id IS NOT NULL AND ({' OR '.join(clauses)}) "
+            "AND (sc.id IS NULL OR sa.id IS NULL) "
+            "ORDER BY c.created_at, c.id"
+        )
+        for row in self._connect().execute(sql, list(account_ids)):
+            entry = dict(row)
+            if entry['spec']:
+                entry['spec'] = json.loads(entry['spec'])
+            yield entry
+
+    def query(
+        self,
+        where: Optional[Dict[str, Sequence[str]]] = None,
+        since: Optional[str] = None,
+        until: Optional[str] = None,
+        limit: Optional[int] = None,
+        newest_first: bool = False
+    ) -> Iterator[Dict]:
+        """
+        Ищет записи журнала (строки отдаются по мере чтения)
+
+        Args:
+            where: колонка → допустимые значения ("любое из"). Поля нейминга
+                сравниваются без учета регистра; для naming_countries — страна
+            since: created_at не раньше (YYYY-MM-DD или YYYY-MM-DD HH:MM:SS)
+            until: created_at раньше (та же форма; дата без времени — весь день включительно)
+            limit: максимум записей
+            newest_first: сначала новые
+
+        Returns:
+            Итератор словарей (колонки таблицы; spec — разобранный JSON)
+
+        Raises:
+            KeyError: если колонка не поддерживается
+        """
+        clauses = []
+        params: List = []
+        for column, values in (where or {}).items():
+            if column not in FILTER_COLUMNS:
+                raise KeyError(f"Unknown ledger field '{column}'")
+            values = [values] if isinstance(values, str) else list(values)
+            if column == 'naming_countries':
+                clauses.append("(" + " OR ".join(
+                    "(',' || naming_countries || ',') LIKE ? COLLATE NOCASE" for _ in values
+                ) + ")")
+                params.extend(f"%,{value},%" for value in values)
+                continue
+            collate = " COLLATE NOCASE" if column in NAME_COLUMNS else ""
+            clauses.append(f"{column}{collate} IN ({', '.join('?' for _ in values)})")
+            params.extend(values)
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until:
+            clauses.append("created_at < ?")
+            # Дата без времени: весь день включительно
+            params.append(until + ' 99' if len(until) == 10 else until)
+
+        sql = "SELECT * FROM campaigns"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY created_at DESC, id DESC" if newest_first else " ORDER BY created_at, id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        for row in self._connect().execute(sql, params):
+            entry = dict(row)
+            if entry['spec']:
+                entry['spec'] = json.loads(entry['spec'])
+            yield entry
+
+    def count(self) -> int:
+        """Количество записей"""
+        return self._connect().execute("SELECT COUNT(*) FROM campaigns").fetchone()[0]
+
+    def stats(self) -> Dict:
+        """Количество записей, период и разбивка по источникам, аккаунтам и тирам"""
+        conn = self._connect()
+        total, first, last = conn.execute(
+            "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM campaigns"
+        ).fetchone()
+
+        def grouped(column):
+            return {
+                (value if value is not None else '-'): count
+                for value, count in conn.execute(
+                    f"SELECT {column}, COUNT(*) FROM campaigns GROUP BY {column} ORDER BY COUNT(*) DESC"
+                )
+            }
+
+        return {
+            'path': self.path,
+            'campaigns': total,
+            'first_created_at': first,
+            'last_created_at': last,
+            'sources': grouped('source'),
+            'accounts': grouped('account_id'),
+            'tiers': grouped('tier'),
+            'unparsed_names': conn.execute("SELECT COUNT(*) FROM campaigns WHERE date IS NULL").fetchone()[0]
+        }
+
+    def migrate_csv(self, logs_file: str = 'logs.csv', chunk_size: int = 10000) -> Tuple[int, int]:
+        """
+        Переносит записи из logs.csv (повторный запуск ничего не дублирует)
+
+        Файл читается потоково и пишется пачками по chunk_size строк.
+
+        Args:
+            logs_file: путь к logs.csv
+            chunk_size: размер пачки
+
+        Returns:
+            (прочитано строк, добавлено записей)
+        """
+        read = 0
+        added = 0
+        chunk = []
+        with open(logs_file, 'r', newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                if not row.get('campaign_name'):
+                    continue
+                read += 1
+                chunk.append(make_ledger_row(
+                    row['campaign_name'],
+                    row.get('campaign_id'),
+                    row.get('adset_id'),
+                    created_at=row.get('created_at') or None,
+                    source='csv'
+                ))
+                if len(chunk) >= chunk_size:
+                    added += self.record_many(chunk)
+                    chunk = []
+        if chunk:
+            added += self.record_many(chunk)
+        return read, added
+
+    def close(self):
+        """Закрывает соединения всех потоков"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+# Журналы по пути (одно множество соединений на файл в процессе)
+_ledgers: Dict[str, Ledger] = {}
+_ledgers_lock = threading.Lock()
+
+
+def get_ledger(path: str = DEFAULT_LEDGER_PATH) -> Ledger:
+    """Общий экземпляр Ledger для файла"""
+    key = os.path.abspath(path)
+    with _ledgers_lock:
+        ledger = _ledgers.get(key)
+        if ledger is None:
+            ledger = _ledgers[key] = Ledger(path)
+        return ledger
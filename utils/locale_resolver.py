@@ -0,0 +1,242 @@
+"""
+Utility functions for resolving languages to Facebook adlocale keys with a persistent cache
+"""
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlencode
+
+from utils.config_loader import BASE_DIR, registry
+
+
+# Кэш результатов search?type=adlocale (в папке проекта, а не в текущей)
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, 'cache', 'adlocales.json')
+
+# Через сколько секунд запись кэша считается устаревшей (7 дней)
+DEFAULT_TTL = 7 * 24 * 60 * 60
+
+# Максимум операций в одном запросе Graph API /batch
+_BATCH_LIMIT = 50
+
+
+def _cache_key(language: str) -> str:
+    return language.strip().casefold()
+
+
+def select_locale_keys(language: str, results: Iterable[Dict]) -> List[int]:
+    """
+    Выбирает ключи adlocale для языка из результатов поиска
+
+    Точное совпадение имени ("English (US)") — только эта локаль; иначе все
+    варианты языка ("English" → "English (US)", "English (UK)", ...).
+
+    Args:
+        language: название языка (как в languages.json)
+        results: элементы ответа search?type=adlocale ({"key": ..., "name": ...})
+
+    Returns:
+        Список ключей adlocale
+    """
+    wanted = _cache_key(language)
+    results = list(results)
+    exact = [item['key'] for item in results if _cache_key(item.get('name', '')) == wanted]
+    if exact:
+        return exact
+    return [
+        item['key'] for item in results
+        if _cache_key(item.get('name', '')).startswith(wanted + ' (')
+    ]
+
+
+class LocaleResolver:
+    """
+    Язык → ключи adlocale с кэшем на диске
+
+    lookup() не делает запросов к API: ответ берется из кэша (даже устаревшего)
+    или из снимка locales.json, а устаревшие и отсутствующие языки
+    запоминаются. refresh() обновляет их все сразу — запросами /batch
+    (до 50 поисков в запросе), start_refresh() — то же в фоновом потоке.
+
+    Пример:
+        resolver = get_locale_resolver()
+        locales = resolver.lookup("English (US)")
+        resolver.start_refresh(client)
+    """
+
+    def __init__(
+        self,
+        cache_path: str = DEFAULT_CACHE_PATH,
+        ttl: float = DEFAULT_TTL,
+        seed: Optional[Dict] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Args:
+            cache_path: путь к файлу кэша
+            ttl: срок жизни записи кэша, сек
+            seed: снимок ответа search?type=adlocale ({"data": [...]}, как в locales.json)
+            clock: источник времени (для тестов)
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self._seed = list((seed or {}).get('data', []))
+        self._clock = clock
+        self._lock = threading.Lock()
+        # ключ языка → {"language", "fetched_at", "results"}
+        self._entries: Dict[str, Dict] = self._load()
+        # Языки, которые нужно обновить (ключ → название языка)
+        self._stale: Dict[str, str] = {}
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+        entries = data.get('entries') if isinstance(data, dict) else None
+        return entries if isinstance(entries, dict) else {}
+
+    def _save(self):
+        """Атомарная запись кэша (временный файл + переименование)"""
+        directory = os.path.dirname(self.cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            payload = {'version': 1, 'entries': dict(self._entries)}
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.cache_path)
+
+    def is_fresh(self, language: str) -> bool:
+        entry = self._entries.get(_cache_key(language))
+        return bool(entry) and self._clock() - entry.get('fetched_at', 0) < self.ttl
+
+    def lookup(self, language: str) -> List[int]:
+        """
+        Ключи adlocale для языка (без запросов к API)
+
+        Args:
+            language: название языка (например, "English (US)")
+
+        Returns:
+            Список ключей; пустой список, если язык не найден ни в кэше, ни в locales.json
+        """
+        key = _cache_key(language)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or self._clock() - entry.get('fetched_at', 0) >= self.ttl:
+                self._stale[key] = language
+
+        if entry is not None:
+            return select_locale_keys(language, entry.get('results', []))
+        return select_locale_keys(language, self._seed)
+
+    def pending(self) -> List[str]:
+        """Языки, ожидающие обновления"""
+        with self._lock:
+            return list(self._stale.values())
+
+    def refresh(self, client, languages: Optional[Iterable[str]] = None) -> int:
+        """
+        Обновляет кэш запросами search?type=adlocale через /batch
+
+        Args:
+            client: GraphClient
+            languages: языки для обновления (по умолчанию — устаревшие и
+                отсутствующие языки, встреченные в lookup())
+
+        Returns:
+            Количество обновленных языков
+        """
+        if languages is None:
+            languages = self.pending()
+        languages = list(dict.fromkeys(languages))
+        api_version = client.api_config['api_version']
+        updated = 0
+
+        for start in range(0, len(languages), _BATCH_LIMIT):
+            chunk = languages[start:start + _BATCH_LIMIT]
+            operations = [
+                {
+                    "method": "GET",
+                    "relative_url": f"{api_version}/search?" + urlencode(
+                        {'type': 'adlocale', 'q': language, 'limit': 100}
+                    )
+                }
+                for language in chunk
+            ]
+            response = client.post('', data={"batch": json.dumps(operations)})
+            if response.status_code != 200:
+                raise Exception(f"Error refreshing adlocales: {response.status_code} - {response.text}")
+
+            fetched_at = self._clock()
+            for language, item in zip(chunk, response.json()):
+                if not item or item.get('code') != 200:
+                    continue
+                try:
+                    results = json.loads(item.get('body') or '{}').get('data', [])
+                except ValueError:
+                    continue
+                with self._lock:
+                    self._entries[_cache_key(language)] = {
+                        'language': language,
+                        'fetched_at': fetched_at,
+                        'results': [{'key': r['key'], 'name': r.get('name')} for r in results if 'key' in r]
+                    }
+                    self._stale.pop(_cache_key(language), None)
+                updated += 1
+
+        if updated:
+            self._save()
+        return updated
+
+    def start_refresh(self, client, languages: Optional[Iterable[str]] = None) -> Optional[threading.Thread]:
+        """
+        Запускает refresh() в фоновом потоке (если есть что обновлять
+        и обновление еще не идет)
+
+        Returns:
+            Поток обновления или None
+        """
+        languages = list(languages) if languages is not None else self.pending()
+        if not languages:
+            return None
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return self._refresh_thread
+
+        def run():
+            try:
+                self.refresh(client, languages)
+            except Exception as e:
+                print(f"Warning: adlocale refresh failed: {e}")
+
+        self._refresh_thread = threading.Thread(target=run, name='adlocale-refresh', daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def wait(self, timeout: Optional[float] = None):
+        """Ждет завершения фонового обновления"""
+        if self._refresh_thread is not None:
+            self._refresh_thread.join(timeout)
+
+    def cached_languages(self) -> List[str]:
+        """Все языки в кэше"""
+        with self._lock:
+            return [entry.get('language', key) for key, entry in self._entries.items()]
+
+
+_resolver: Optional[LocaleResolver] = None
+_resolver_lock = threading.Lock()
+
+
+def get_locale_resolver() -> LocaleResolver:
+    """Общий резолвер (снимок locales.json используется, пока кэш не заполнен)"""
+    global _resolver
+    with _resolver_lock:
+        if _resolver is None:
+            _resolver = LocaleResolver(seed=registry.get('locales'))
+        return _resolver
@@ -1,57 +1,202 @@
 """
-Utility function for logging campaign creation to logs.csv
+Utility function for logging campaign creation to logs.csv or the SQLite ledger
 """
 import csv
+import io
 import os
+import threading
 from datetime import datetime
 
 
-def log_campaign_creation(campaign_name, campaign_id=None, adset_id=None, logs_file='logs.csv'):
+# Заголовок logs.csv
+LOG_HEADER = ['campaign_name', 'campaign_id', 'adset_id', 'created_at']
+
+# Файлы с такими расширениями — журнал SQLite (utils/ledger.py), а не CSV
+LEDGER_SUFFIXES = ('.db', '.sqlite', '.sqlite3')
+DEFAULT_LEDGER_PATH = 'ledger.db'
+
+# Запись в logs.csv из нескольких потоков (параллельное создание кампаний)
+_log_lock = threading.Lock()
+
+
+def is_ledger_path(logs_file):
+    """Путь указывает на журнал SQLite (по расширению)"""
+    return str(logs_file).lower().endswith(LEDGER_SUFFIXES)
+
+
+def _get_ledger(logs_file):
+    # sqlite3 импортируется только когда журнал действительно нужен
+    from utils.ledger import get_ledger
+    return get_ledger(logs_file)
+
+
+def _make_row(campaign_name, campaign_id=None, adset_id=None):
+    """Строка лога с текущим временем"""
+    return [
+        campaign_name,
+        campaign_id or '',
+        adset_id or '',
+        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    ]
+
+
+def _prepare_for_append(logs_file):
+    """
+    Определяет, что нужно дописать перед новыми строками, не читая весь файл
+
+    Returns:
+        Префикс: заголовок (если файла нет или он пуст), перевод строки
+        (если последняя строка не закончена) или пустая строка
+    """
+    if not os.path.exists(logs_file) or os.path.getsize(logs_file) == 0:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerow(LOG_HEADER)
+        return buffer.getvalue()
+
+    with open(logs_file, 'rb') as f:
+        first_line = f.readline().decode('utf-8-sig').strip()
+        f.seek(-1, os.SEEK_END)
+        last_byte = f.read(1)
+
+    if first_line != ','.join(LOG_HEADER):
+        print(f"Warning: Unexpected header in {logs_file}, appending anyway")
+
+    return '' if last_byte == b'\n' else '\r\n'
+
+
+def _append_rows(rows, logs_file, fsync=False):
+    """Дописывает строки в конец logs.csv (вызывается под _log_lock)"""
+    prefix = _prepare_for_append(logs_file)
+    with open(logs_file, 'a', newline='', encoding='utf-8') as f:
+        f.write(prefix)
+        csv.writer(f).writerows(rows)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+
+
+def log_campaign_creation(
+    campaign_name,
+    campaign_id=None,
+    adset_id=None,
+    logs_file='logs.csv',
+    spec=None,
+    account_id=None
+):
     """
-    Добавляет запись о создании кампании в logs.csv
-    
+    Добавляет запись о создании кампании в logs.csv или журнал SQLite
+
+    Файл открывается на дозапись: существующие строки не читаются и не
+    перезаписываются, поэтому стоимость записи не зависит от размера лога.
+    Для файлов .db / .sqlite запись идет в журнал SQLite (utils/ledger.py)
+    вместе со спецификацией и ID аккаунта.
+
     Args:
         campaign_name: Название кампании (нейминг)
         campaign_id: ID созданной кампании (из Facebook API)
         adset_id: ID созданного адсета (из Facebook API)
         logs_file: Путь к файлу логов (по умолчанию 'logs.csv')
+        spec: спецификация кампании (только для журнала SQLite)
+        account_id: ID рекламного аккаунта (только для журнала SQLite)
     """
-    created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Проверяем, существует ли файл
-    file_exists = os.path.exists(logs_file)
-    
-    # Читаем существующие записи
-    rows = []
-    if file_exists:
-        try:
-            with open(logs_file, 'r', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                rows = list(reader)
-        except Exception as e:
-            print(f"Warning: Could not read existing logs: {e}")
-            rows = []
-    
-    # Проверяем заголовок
-    if not rows or rows[0] != ['campaign_name', 'campaign_id', 'adset_id', 'created_at']:
-        rows = [['campaign_name', 'campaign_id', 'adset_id', 'created_at']]
-    
-    # Добавляем новую запись
-    new_row = [
-        campaign_name,
-        campaign_id or '',
-        adset_id or '',
-        created_at
-    ]
-    rows.append(new_row)
-    
-    # Записываем обратно
     try:
-        with open(logs_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            writer.writerows(rows)
+        if is_ledger_path(logs_file):
+            _get_ledger(logs_file).record(campaign_name, campaign_id, adset_id, account_id, spec)
+            return True
+        row = _make_row(campaign_name, campaign_id, adset_id)
+        with _log_lock:
+            _append_rows([row], logs_file)
         return True
     except Exception as e:
         print(f"Error writing to logs file: {e}")
         return False
 
+
+def logged_names(names, logs_file='logs.csv'):
+    """
+    Какие из названий уже записаны в logs.csv или журнал SQLite
+
+    Args:
+        names: названия кампаний
+        logs_file: путь к файлу логов (.csv или .db)
+
+    Returns:
+        Множество найденных названий
+    """
+    names = set(names)
+    if not names or not os.path.exists(logs_file):
+        return set()
+    if is_ledger_path(logs_file):
+        return _get_ledger(logs_file).existing_names(names)
+    with open(logs_file, 'r', newline='', encoding='utf-8-sig') as f:
+        return {row['campaign_name'] for row in csv.DictReader(f) if row.get('campaign_name') in names}
+
+
+class CampaignLogWriter:
+    """
+    Буферизованная запись в logs.csv для пакетного логирования
+
+    Строки копятся в памяти и дописываются в файл одним блоком при flush():
+    явно, при заполнении буфера или при выходе из контекстного менеджера.
+    После каждого flush() данные сбрасываются на диск (fsync).
+    Для журнала SQLite (.db / .sqlite) flush() — одна транзакция.
+
+    Пример:
+        with CampaignLogWriter() as writer:
+            for result in results:
+                writer.log(result['name'], result['campaign_id'], result['adset_id'])
+    """
+
+    def __init__(self, logs_file='logs.csv', buffer_size=100, fsync=True):
+        """
+        Args:
+            logs_file: Путь к файлу логов (по умолчанию 'logs.csv')
+            buffer_size: сколько строк копить до автоматического flush()
+            fsync: сбрасывать данные на диск после каждого flush()
+        """
+        self.logs_file = logs_file
+        self.buffer_size = buffer_size
+        self.fsync = fsync
+        self._ledger = is_ledger_path(logs_file)
+        self._rows = []
+        self._lock = threading.Lock()
+
+    def log(self, campaign_name, campaign_id=None, adset_id=None, spec=None, account_id=None):
+        """Добавляет запись в буфер (при заполнении буфера — сбрасывает его в файл)"""
+        if self._ledger:
+            from utils.ledger import make_ledger_row
+            row = make_ledger_row(campaign_name, campaign_id, adset_id, account_id=account_id, spec=spec)
+        else:
+            row = _make_row(campaign_name, campaign_id, adset_id)
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.buffer_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Дописывает накопленные строки в файл"""
+        with self._lock:
+            rows, self._rows = self._rows, []
+        if not rows:
+            return
+        try:
+            if self._ledger:
+                _get_ledger(self.logs_file).record_many(rows)
+                return
+            with _log_lock:
+                _append_rows(rows, self.logs_file, fsync=self.fsync)
+        except Exception:
+            # Возвращаем строки в буфер, чтобы не потерять их при повторном flush()
+            with self._lock:
+                self._rows = rows + self._rows
+            raise
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,297 @@
+"""
+Utility functions for run instrumentation: phase timers, counters, latency histograms and their export
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+
+# Границы корзин гистограмм задержек, сек (последняя корзина — +Inf)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Префикс имен метрик в формате Prometheus
+PROMETHEUS_PREFIX = 'fb_campaigns_'
+
+# Описания метрик (HELP в формате Prometheus)
+METRIC_HELP = {
+    'phase_seconds': 'Time spent in a phase of campaign creation',
+    'graph_request_seconds': 'Graph API request latency (one attempt)',
+    'graph_requests_total': 'Graph API requests by response status',
+    'graph_retries_total': 'Graph API request retries',
+    'graph_throttled_total': 'Graph API throttling responses',
+    'rate_limit_wait_seconds': 'Time spent waiting for rate-limit headroom',
+    'circuit_opened_total': 'Circuits opened after consecutive Graph API failures',
+    'circuit_rejected_total': 'Graph API requests rejected by an open circuit',
+    'campaigns_total': 'Campaign creation results'
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Histogram:
+    """
+    Гистограмма задержек с фиксированными корзинами
+
+    Хранит количество, сумму, минимум и максимум и число наблюдений в каждой
+    корзине (не кумулятивно; кумулятивные значения считаются при экспорте).
+    """
+
+    __slots__ = ('buckets', 'counts', 'count', 'sum', 'min', 'max')
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Оценка квантиля по корзинам (верхняя граница корзины; для +Inf — максимум)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'avg': round(self.sum / self.count, 6) if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {
+                **{str(bound): count for bound, count in zip(self.buckets, self.counts)},
+                '+Inf': self.counts[-1]
+            }
+        }
+
+
+class _NullTimer:
+    """Таймер выключенных метрик: ничего не измеряет"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class MetricsRegistry:
+    """
+    Потокобезопасный набор счетчиков и гистограмм с метками
+
+    Пока метрики выключены (enabled=False), timer() и inc() почти ничего не
+    стоят, поэтому инструментирование горячих функций остается в коде всегда.
+
+    Пример:
+        metrics.enable()
+        with metrics.timer('phase_seconds', phase='naming'):
+            name = generate_campaign_name(params)
+        metrics.inc('campaigns_total', result='created')
+        metrics.write('metrics.json')
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self.started_at = time.time()
+
+    def enable(self):
+        self.enabled = True
+        return self
+
+    def reset(self):
+        """Удаляет все собранные значения"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        """Увеличивает счетчик"""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        """Добавляет наблюдение в гистограмму"""
+        if not self.enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def timer(self, name: str, **labels):
+        """
+        Контекстный менеджер: время выполнения блока → гистограмма name
+
+        Args:
+            name: имя гистограммы
+            **labels: метки (например, phase="naming")
+        """
+        if not self.enabled:
+            return _NULL_TIMER
+        return self._timer(name, labels)
+
+    @contextmanager
+    def _timer(self, name: str, labels: Dict) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict:
+        """
+        Все метрики в виде словаря (для JSON)
+
+        Returns:
+            {"started_at", "elapsed_seconds", "counters": {имя: [{"labels", "value"}]},
+             "histograms": {имя: [{"labels", "count", "sum", ...}]}}
+        """
+        with self._lock:
+            counters = {
+                name: [{'labels': dict(key), 'value': value} for key, value in sorted(series.items())]
+                for name, series in sorted(self._counters.items())
+            }
+            histograms = {
+                name: [{'labels': dict(key), **histogram.to_dict()} for key, histogram in sorted(series.items())]
+                for name, series in sorted(self._histograms.items())
+            }
+        return {
+            'started_at': datetime.fromtimestamp(self.started_at).strftime("%Y-%m-%d %H:%M:%S"),
+            'elapsed_seconds': round(time.time() - self.started_at, 3),
+            'counters': counters,
+            'histograms': histograms
+        }
+
+    def to_prometheus(self, prefix: str = PROMETHEUS_PREFIX) -> str:
+        """Метрики в текстовом формате Prometheus (для node_exporter textfile collector)"""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                metric = prefix + name
+                _prometheus_header(lines, metric, name, 'counter')
+                for key, value in sorted(series.items()):
+                    lines.append(f"{metric}{_prometheus_labels(key)} {_prometheus_value(value)}")
+
+            for name, series in sorted(self._histograms.items()):
+                metric = prefix + name
+                _prometheus_header(lines, metric, name, 'histogram')
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        lines.append(f"{metric}_bucket{_prometheus_labels(key, le=repr(bound))} {cumulative}")
+                    lines.append(f"{metric}_bucket{_prometheus_labels(key, le='+Inf')} {histogram.count}")
+                    lines.append(f"{metric}_sum{_prometheus_labels(key)} {_prometheus_value(histogram.sum)}")
+                    lines.append(f"{metric}_count{_prometheus_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path: str, metrics_format: Optional[str] = None):
+        """
+        Атомарно записывает метрики в файл (временный файл + переименование,
+        как требует textfile collector)
+
+        Args:
+            path: путь к файлу
+            metrics_format: "json" или "prometheus" (по умолчанию — по расширению:
+                .prom → prometheus, иначе json)
+        """
+        if metrics_format is None:
+            metrics_format = 'prometheus' if path.endswith('.prom') else 'json'
+        if metrics_format == 'prometheus':
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.snapshot(), ensure_ascii=False, indent=2) + '\n'
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(content)
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+def _prometheus_header(lines: List[str], metric: str, name: str, metric_type: str):
+    if name in METRIC_HELP:
+        lines.append(f"# HELP {metric} {METRIC_HELP[name]}")
+    lines.append(f"# TYPE {metric} {metric_type}")
+
+
+def _prometheus_escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _prometheus_labels(key: LabelKey, **extra) -> str:
+    pairs = list(key) + [(name, str(value)) for name, value in extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_prometheus_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _prometheus_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def endpoint_label(path: str) -> str:
+    """
+    Имя эндпоинта Graph API для меток (без ID, чтобы не плодить ряды):
+    "act_123/campaigns" → "campaigns", "" → "batch", "120000123" → "object"
+    """
+    path = path.split('?', 1)[0].strip('/')
+    if not path:
+        return 'batch'
+    parts = path.split('/')
+    if len(parts) > 1:
+        return parts[-1]
+    return 'object' if parts[0].isdigit() else parts[0]
+
+
+# Общий набор метрик процесса (включается флагом --metrics-out)
+metrics = MetricsRegistry()
@@ -0,0 +1,496 @@
+"""
+Local mock of the Facebook Marketing API for dry runs and load tests
+
+Mimics:
+    POST   /{version}/act_{id}/campaigns
+    POST   /{version}/act_{id}/adsets
+    GET    /{version}/act_{id}/campaigns   (fields, limit, after, filtering on updated_time / effective_status)
+    GET    /{version}/act_{id}/adsets
+    POST   /{version}/            (batch, "batch" form field)
+    GET    /{version}/{object_id}
+    POST   /{version}/{object_id}  (update)
+    DELETE /{version}/{object_id}  (status DELETED)
+    GET    /{version}/search?type=adlocale&q=...
+
+Usage:
+    python -m utils.mock_graph_server --port 8899 --latency 0.05 --error-rate 0.01
+"""
+import argparse
+import base64
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlparse
+
+
+# "/v23.0/act_123/campaigns" → ("act_123/campaigns")
+_VERSION_PREFIX_RE = re.compile(r'^/?v\d+(\.\d+)?/?')
+
+# Batch-ссылка на результат другой операции: {result=name:$.id}
+_BATCH_REF_RE = re.compile(r'\{result=([^:}]+):\$\.([A-Za-z_]+)\}')
+
+
+def _strip_version(path: str) -> str:
+    return _VERSION_PREFIX_RE.sub('', path.lstrip('/'), count=1)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+0000')
+
+
+# Максимальный размер страницы списков (limit)
+LIST_PAGE_LIMIT = 5000
+
+# Статусы, которые список отдает без фильтра effective_status (как Graph API)
+_LISTED_BY_DEFAULT = {'ACTIVE', 'PAUSED', 'CAMPAIGN_PAUSED', 'ADSET_PAUSED', 'IN_PROCESS', 'WITH_ISSUES'}
+
+
+def _cursor(position: int) -> str:
+    return base64.urlsafe_b64encode(str(position).encode()).decode()
+
+
+def _position(cursor: str) -> int:
+    return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+
+
+def _timestamp(value: str) -> float:
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%S%z').timestamp()
+
+
+class MockGraphState:
+    """
+    Состояние mock-сервера: созданные объекты и счетчики использования лимитов
+
+    Args:
+        latency: задержка ответа, сек
+        latency_jitter: случайная добавка к задержке, сек (0..jitter)
+        error_rate: доля ответов с транзиентной ошибкой 500
+        throttle_rate: доля ответов с ошибкой троттлинга (code 80004)
+        calls_per_window: сколько вызовов на аккаунт соответствует 100% лимита
+        window_seconds: окно подсчета вызовов, сек
+        seed: seed генератора случайных чисел (для воспроизводимости)
+        adlocales: ответы search?type=adlocale ({"key", "name"}); по умолчанию
+            из locales.json, если он есть
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        calls_per_window: int = 1000,
+        window_seconds: float = 60.0,
+        seed: Optional[int] = None,
+        adlocales: Optional[List[Dict]] = None
+    ):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.calls_per_window = calls_per_window
+        self.window_seconds = window_seconds
+        self._adlocales = adlocales
+
+        self._random = random.Random(seed)
+        # ID зависят от времени запуска: ID разных dry-run не совпадают (уникальный индекс в журнале SQLite)
+        self._ids = itertools.count(120000000000000000 + int(time.time() * 1000) * 1000)
+        self._lock = threading.Lock()
+        # ID → объект (кампания или адсет)
+        self.objects: Dict[str, Dict] = {}
+        # (account_id, campaign / adset) → ID в порядке создания (для списков)
+        self.listing: Dict[Tuple[str, str], List[str]] = {}
+        # account_id → времена вызовов в окне
+        self._calls: Dict[str, deque] = {}
+        self.request_count = 0
+
+    def next_id(self) -> str:
+        with self._lock:
+            return str(next(self._ids))
+
+    def roll(self, rate: float) -> bool:
+        with self._lock:
+            return rate > 0 and self._random.random() < rate
+
+    def delay(self):
+        if self.latency or self.latency_jitter:
+            with self._lock:
+                jitter = self._random.uniform(0, self.latency_jitter) if self.latency_jitter else 0.0
+            time.sleep(self.latency + jitter)
+
+    def record_call(self, account_id: Optional[str]) -> float:
+        """Учитывает вызов и возвращает загрузку лимита аккаунта, %"""
+        now = time.monotonic()
+        key = account_id or '__app__'
+        with self._lock:
+            self.request_count += 1
+            calls = self._calls.setdefault(key, deque())
+            calls.append(now)
+            while calls and calls[0] < now - self.window_seconds:
+                calls.popleft()
+            return min(100.0, 100.0 * len(calls) / max(self.calls_per_window, 1))
+
+    def usage_headers(self, account_id: Optional[str], pct: float) -> Dict[str, str]:
+        """Синтетические заголовки X-*-Usage"""
+        pct = int(pct)
+        regain = int(self.window_seconds // 60) if pct >= 100 else 0
+        headers = {
+            'X-App-Usage': json.dumps({'call_count': 0, 'total_cputime': 0, 'total_time': 0})
+        }
+        if account_id:
+            headers['X-Ad-Account-Usage'] = json.dumps({
+                'acc_id_util_pct': pct,
+                'reset_time_duration': int(self.window_seconds) if pct >= 100 else 0
+            })
+            headers['X-Business-Use-Case-Usage'] = json.dumps({
+                account_id: [{
+                    'type': 'ads_management',
+                    'call_count': pct,
+                    'total_cputime': max(0, pct // 2),
+                    'total_time': max(0, pct // 2),
+                    'estimated_time_to_regain_access': regain
+                }]
+            })
+        return headers
+
+    @property
+    def adlocales(self) -> List[Dict]:
+        if self._adlocales is None:
+            from utils.config_loader import registry
+            self._adlocales = list((registry.get('locales') or {}).get('data', []))
+        return self._adlocales
+
+    def create_object(self, kind: str, account_id: str, fields: Dict) -> Dict:
+        object_id = self.next_id()
+        timestamp = _now_iso()
+        obj = dict(fields)
+        obj.pop('access_token', None)
+        obj.update({
+            'id': object_id,
+            'account_id': account_id,
+            'object_type': kind,
+            'created_time': timestamp,
+            'updated_time': timestamp
+        })
+        obj.setdefault('status', 'ACTIVE')
+        obj['effective_status'] = obj['status']
+        with self._lock:
+            self.objects[object_id] = obj
+            self.listing.setdefault((account_id, kind), []).append(object_id)
+        return obj
+
+    def update_object(self, object_id: str, fields: Dict) -> Dict:
+        """Обновляет поля объекта (status DELETED — удаление)"""
+        fields = dict(fields)
+        fields.pop('access_token', None)
+        with self._lock:
+            obj = self.objects[object_id]
+            obj.update(fields)
+            if 'status' in fields:
+                obj['effective_status'] = fields['status']
+            obj['updated_time'] = _now_iso()
+            return obj
+
+    def list_objects(self, account_id: str, kind: str, fields: Dict) -> Dict:
+        """
+        Страница списка объектов аккаунта
+
+        Поддерживаются fields, limit (до LIST_PAGE_LIMIT), курсор after и
+        filtering по updated_time (GREATER_THAN, unix time) и effective_status (IN)
+        """
+        limit = min(int(fields.get('limit') or 25), LIST_PAGE_LIMIT)
+        start = _position(fields['after']) if fields.get('after') else 0
+        requested = ['id'] + [key for key in (fields.get('fields') or '').split(',') if key and key != 'id']
+
+        updated_after = None
+        statuses = _LISTED_BY_DEFAULT
+        for condition in json.loads(fields.get('filtering') or '[]'):
+            if condition.get('field') == 'updated_time' and condition.get('operator') == 'GREATER_THAN':
+                updated_after = float(condition['value'])
+            elif condition.get('field') == 'effective_status' and condition.get('operator') == 'IN':
+                statuses = set(condition['value'])
+
+        with self._lock:
+            ids = self.listing.get((account_id, kind), [])
+            data = []
+            position = start
+            while position < len(ids) and len(data) < limit:
+                obj = self.objects[ids[position]]
+                position += 1
+                if obj.get('effective_status') not in statuses:
+                    continue
+                if updated_after is not None and _timestamp(obj['updated_time']) <= updated_after:
+                    continue
+                data.append({key: obj[key] for key in requested if key in obj})
+            more = position < len(ids)
+
+        page = {'data': data, 'paging': {'cursors': {'before': _cursor(start), 'after': _cursor(position)}}}
+        if more:
+            page['paging']['next'] = f"act_{account_id}/{kind}s?after={_cursor(position)}&limit={limit}"
+        return page
+
+
+def _error_body(message: str, code: int, is_transient: bool = False) -> Dict:
+    return {
+        'error': {
+            'message': message,
+            'type': 'OAuthException',
+            'code': code,
+            'is_transient': is_transient,
+            'fbtrace_id': 'mock'
+        }
+    }
+
+
+def handle_operation(state: MockGraphState, method: str, path: str, fields: Dict) -> Tuple[int, Dict, Dict]:
+    """
+    Обрабатывает один вызов API (отдельный запрос или операцию из batch)
+
+    Returns:
+        (HTTP статус, тело ответа, заголовки)
+    """
+    path = _strip_version(path).strip('/')
+    parts = path.split('/') if path else []
+    account_id = parts[0][len('act_'):] if parts and parts[0].startswith('act_') else None
+
+    pct = state.record_call(account_id)
+    headers = state.usage_headers(account_id, pct)
+
+    if pct >= 100 or state.roll(state.throttle_rate):
+        return 400, _error_body("User request limit reached", 80004, is_transient=True), headers
+    if state.roll(state.error_rate):
+        return 500, _error_body("An unexpected error has occurred. Please retry your request later.", 2, True), headers
+
+    if method == 'POST' and account_id and len(parts) == 2 and parts[1] in ('campaigns', 'adsets'):
+        if not fields.get('name'):
+            return 400, _error_body("Missing required field: name", 100), headers
+        if parts[1] == 'adsets':
+            if not fields.get('campaign_id') or fields['campaign_id'] not in state.objects:
+                return 400, _error_body("Invalid parameter: campaign_id", 100), headers
+        obj = state.create_object(parts[1][:-1], account_id, fields)
+        return 200, {'id': obj['id']}, headers
+
+    if method == 'GET' and account_id and len(parts) == 2 and parts[1] in ('campaigns', 'adsets'):
+        try:
+            return 200, state.list_objects(account_id, parts[1][:-1], fields), headers
+        except (ValueError, TypeError, KeyError):
+            return 400, _error_body("Invalid parameter: filtering / after", 100), headers
+
+    if method == 'GET' and parts == ['search'] and fields.get('type') == 'adlocale':
+        query = fields.get('q', '').casefold()
+        limit = int(fields.get('limit') or 25)
+        data = [item for item in state.adlocales if query in item.get('name', '').casefold()]
+        return 200, {'data': data[:limit]}, headers
+
+    if method == 'GET' and len(parts) == 1 and parts[0] in state.objects:
+        obj = state.objects[parts[0]]
+        requested = fields.get('fields')
+        if requested:
+            obj = {key: obj.get(key) for key in ['id'] + requested.split(',') if key in obj}
+        return 200, obj, headers
+
+    if method == 'POST' and len(parts) == 1 and parts[0] in state.objects:
+        state.update_object(parts[0], fields)
+        return 200, {'success': True}, headers
+
+    if method == 'DELETE' and len(parts) == 1 and parts[0] in state.objects:
+        state.update_object(parts[0], {'status': 'DELETED'})
+        return 200, {'success': True}, headers
+
+    return 400, _error_body(f"Unsupported request: {method} /{path}", 100), headers
+
+
+def handle_batch(state: MockGraphState, operations: list) -> list:
+    """Выполняет операции batch-запроса по порядку с учетом ссылок {result=...}"""
+    results = {}
+    failed = set()
+    responses = []
+
+    for operation in operations:
+        body = dict(parse_qsl(operation.get('body', ''), keep_blank_values=True))
+
+        # Подставляем результаты предыдущих операций
+        dependency_failed = False
+        for key, value in list(body.items()):
+            for ref, field in _BATCH_REF_RE.findall(value):
+                if ref in failed or ref not in results:
+                    dependency_failed = True
+                    continue
+                value = value.replace(f"{{result={ref}:$.{field}}}", str(results[ref].get(field, '')))
+            body[key] = value
+
+        name = operation.get('name')
+        if dependency_failed:
+            if name:
+                failed.add(name)
+            responses.append(None)
+            continue
+
+        relative_url = urlparse(operation.get('relative_url', ''))
+        body.update(dict(parse_qsl(relative_url.query)))
+        status, payload, headers = handle_operation(
+            state, operation.get('method', 'GET').upper(), relative_url.path, body
+        )
+
+        if name:
+            if status == 200:
+                results[name] = payload
+            else:
+                failed.add(name)
+
+        responses.append({
+            'code': status,
+            'headers': [{'name': key, 'value': value} for key, value in headers.items()],
+            'body': json.dumps(payload)
+        })
+
+    return responses
+
+
+class MockGraphHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> MockGraphState:
+        return self.server.state
+
+    def _send(self, status: int, payload, headers: Optional[Dict[str, str]] = None):
+        raw = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(raw)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _fields(self) -> Dict:
+        url = urlparse(self.path)
+        fields = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            fields.update(parse_qsl(self.rfile.read(length).decode('utf-8'), keep_blank_values=True))
+        return fields
+
+    def _handle(self, method: str):
+        fields = self._fields()
+        path = urlparse(self.path).path
+        self.state.delay()
+
+        if not fields.get('access_token'):
+            self._send(400, _error_body("An access token is required to request this resource.", 104))
+            return
+
+        if method == 'POST' and 'batch' in fields and not _strip_version(path).strip('/'):
+            try:
+                operations = json.loads(fields['batch'])
+            except ValueError:
+                self._send(400, _error_body("Invalid batch parameter", 100))
+                return
+            if len(operations) > 50:
+                self._send(400, _error_body("Too many requests in batch message. Maximum batch size is 50", 1))
+                return
+            self._send(200, handle_batch(self.state, operations))
+            return
+
+        status, payload, headers = handle_operation(self.state, method, path, fields)
+        self._send(status, payload, headers)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class MockGraphServer(ThreadingHTTPServer):
+    """
+    HTTP-сервер mock Graph API
+
+    Пример:
+        with MockGraphServer(MockGraphState(latency=0.05)) as server:
+            api_config = server.api_config()
+            ...
+    """
+
+    daemon_threads = True
+
+    def __init__(self, state: Optional[MockGraphState] = None, host: str = '127.0.0.1', port: int = 0):
+        super().__init__((host, port), MockGraphHandler)
+        self.state = state or MockGraphState()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def api_config(self, api_version: str = 'v23.0') -> Dict:
+        """Конфигурация API, направленная на mock-сервер"""
+        return {'base_url': self.base_url, 'api_version': api_version, 'access_token': 'mock-token'}
+
+    def start(self) -> 'MockGraphServer':
+        """Запускает сервер в фоновом потоке"""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local mock of the Facebook Marketing API')
+    parser.add_argument('--host', default='127.0.0.1', help='Host to bind')
+    parser.add_argument('--port', type=int, default=8899, help='Port to bind')
+    parser.add_argument('--latency', type=float, default=0.0, help='Response latency, seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Random extra latency, seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of transient 500 errors (0..1)')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='Share of throttling errors (0..1)')
+    parser.add_argument('--calls-per-window', type=int, default=1000,
+                        help='Calls per account that correspond to 100%% usage')
+    parser.add_argument('--window-seconds', type=float, default=60.0, help='Usage window, seconds')
+    parser.add_argument('--seed', type=int, help='Random seed')
+    args = parser.parse_args()
+
+    state = MockGraphState(
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        calls_per_window=args.calls_per_window,
+        window_seconds=args.window_seconds,
+        seed=args.seed
+    )
+    server = MockGraphServer(state, args.host, args.port)
+    print(f"Mock Graph API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,49 @@
 """
-Utility functions for generating campaign names according to naming rules
+Utility functions for generating and parsing campaign names according to naming rules
 """
-from typing import Dict, Optional
+import csv
+import gc
+import re
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+
+# Поля нейминга в порядке следования (см. instructions/naming.md)
+NAMING_FIELDS = [
+    'os',
+    'tier',
+    'naming_countries',
+    'gender',
+    'age',
+    'opt_model',
+    'event',
+    'date',
+    'autor',
+    'campaign_type',
+    'bid_strategy_short',
+    'lang',
+    'extra'
+]
+
+# Шаблон нейминга (без опциональных EXTRA, скобок стран и события)
+_NAME_TEMPLATE = "{os}_{tier}{countries}_{gender}_{age}_{opt_model}{event}_{date}_{autor}_{campaign_type}_{bid_strategy_short}_{lang}"
+
+# Обратный разбор: [OS]_[TIER]([COUNTRIES])_[GENDER]_[AGE]_[OPT MODEL][[EVENT?]]_[DATE]_[AUTOR]_[CBO/noCBO]_[BID STRATEGY]_[LANG]_[EXTRA?]
+# EXTRA (имя аккаунта) может содержать "_", поэтому занимает весь остаток
+_NAME_BODY = (
+    r"(?P<tier>[^_()]+)(?:\((?P<naming_countries>[^)]*)\))?"
+    r"_(?P<gender>[^_]+)"
+    r"_(?P<age>[^_]+)"
+    r"_(?P<opt_model>[^_\[]+)(?:\[(?P<event>[^\]]*)\])?"
+    r"_(?P<date>\d{8})"
+    r"_(?P<autor>[^_]+)"
+    r"_(?P<campaign_type>[^_]+)"
+    r"_(?P<bid_strategy_short>[^_]+)"
+    r"_(?P<lang>[^_]+)"
+    r"(?:_(?P<extra>.+))?"
+)
+_NAME_RE = re.compile(r"^(?P<os>[^_]+)_" + _NAME_BODY + r"$")
+# Старый формат с сегментом проекта: AND_LK_Latam_...
+_LEGACY_NAME_RE = re.compile(r"^(?P<os>[^_]+)_(?P<project>[^_]+)_" + _NAME_BODY + r"$")
 
 
 def generate_campaign_name(params: Dict) -> str:
@@ -29,65 +71,229 @@ def generate_campaign_name(params: Dict) -> str:
     Returns:
         Сгенерированное название кампании
     """
-    # OS
-    os_name = params['os']  # AND или IOS
-    
-    # TIER
-    tier = params['tier']  # Tier-1, Latam, etc.
-    
     # COUNTRIES (в скобках, если указаны)
     countries_str = ""
     if params.get('naming_countries'):
         countries_str = f"({','.join(params['naming_countries'])})"
     
-    # GENDER
-    gender = params['gender']  # M, F, MF
-    
-    # AGE
-    age = params['age']  # 18-65+, 21-65, etc.
-    
-    # OPT MODEL
-    opt_model = params['opt_model']  # CPA, CPI, tROAS
-    
     # EVENT (только для CPA)
     event_str = ""
-    if opt_model == "CPA" and params.get('event'):
+    if params['opt_model'] == "CPA" and params.get('event'):
         event_str = f"[{params['event']}]"
     
-    # DATE
-    date_str = params['date']  # DDMMYYYY
+    # Формируем нейминг (без PROJECT)
+    name = _NAME_TEMPLATE.format(
+        os=params['os'],
+        tier=params['tier'],
+        countries=countries_str,
+        gender=params['gender'],
+        age=params['age'],
+        opt_model=params['opt_model'],
+        event=event_str,
+        date=params['date'],
+        autor=params['autor'],
+        campaign_type=params['campaign_type'],
+        bid_strategy_short=params['bid_strategy_short'],
+        lang=params['lang']
+    )
     
-    # AUTOR
-    autor = params['autor']  # KH, YU, etc.
+    # EXTRA (account name)
+    extra = params.get('extra', '')
+    if extra:
+        name = f"{name}_{extra}"
     
-    # CBO/noCBO
-    campaign_type = params['campaign_type']  # CBO или noCBO
+    return name
+
+
+def parse_campaign_name(name: str) -> Optional[Dict]:
+    """
+    Разбирает нейминг кампании обратно на поля (обратная операция к generate_campaign_name)
     
-    # BID STRATEGY
-    bid_strategy_short = params['bid_strategy_short']  # bc, cc, lc, ai
+    Args:
+        name: название кампании
     
-    # LANG
-    lang = params['lang']  # ENG, ALL, etc.
+    Returns:
+        Словарь с ключами из NAMING_FIELDS (naming_countries — список, отсутствующие
+        поля — None; для старого формата дополнительно project) или None,
+        если название не соответствует формату
+    """
+    match = _NAME_RE.match(name) or _LEGACY_NAME_RE.match(name)
+    if not match:
+        return None
     
-    # EXTRA (account name)
-    extra = params.get('extra', '')  # account_1, account_2, etc.
+    fields = match.groupdict()
+    countries = fields['naming_countries']
+    fields['naming_countries'] = [code for code in countries.split(',') if code] if countries else []
+    return fields
+
+
+def _name_month(date: Optional[str]) -> Optional[str]:
+    """DDMMYYYY → YYYY-MM"""
+    if not date or len(date) != 8:
+        return None
+    return f"{date[4:]}-{date[2:4]}"
+
+
+_EMPTY: Set[int] = frozenset()
+
+
+class IndexedName(NamedTuple):
+    """
+    Запись индекса неймингов
     
-    # Формируем нейминг (без PROJECT)
-    name_parts = [
-        os_name,
-        tier + countries_str,
-        gender,
-        age,
-        opt_model + event_str,
-        date_str,
-        autor,
-        campaign_type,
-        bid_strategy_short,
-        lang
-    ]
+    Attributes:
+        name: название кампании
+        fields: поля нейминга (результат parse_campaign_name)
+        data: связанные данные (например, строка logs.csv) или None
+    """
+    name: str
+    fields: Dict
+    data: Optional[Dict]
+
+
+class CampaignNameIndex:
+    """
+    Индекс разобранных неймингов в памяти: поле → значение → номера записей
     
-    if extra:
-        name_parts.append(extra)
+    Кроме полей нейминга индексируются month (YYYY-MM), year (YYYY) и
+    project (для старого формата). Значения сравниваются без учета регистра,
+    naming_countries индексируется по каждой стране.
     
-    return "_".join(name_parts)
+    Пример:
+        index = CampaignNameIndex.from_logs('logs.csv')
+        index.query(tier='Latam', opt_model='CPA', bid_strategy_short='bc',
+                    extra='account_2', month='2025-03')
+    """
+    
+    # Поля, по которым строится индекс
+    INDEXED_FIELDS = NAMING_FIELDS + ['month', 'year', 'project']
+    _SCALAR_FIELDS = [field for field in NAMING_FIELDS if field != 'naming_countries'] + ['project']
+    
+    def __init__(self, names: Optional[Iterable[str]] = None):
+        self._entries: List[IndexedName] = []
+        self._postings: Dict[str, Dict[str, Set[int]]] = {field: {} for field in self.INDEXED_FIELDS}
+        # Названия, не соответствующие формату
+        self.unparsed = 0
+        if names:
+            self.extend((name, None) for name in names)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def add(self, name: str, data: Optional[Dict] = None) -> Optional[int]:
+        """
+        Добавляет нейминг в индекс
+        
+        Args:
+            name: название кампании
+            data: связанные данные (например, campaign_id / adset_id)
+        
+        Returns:
+            Номер записи или None, если название не удалось разобрать
+        """
+        fields = parse_campaign_name(name)
+        if fields is None:
+            self.unparsed += 1
+            return None
+        
+        position = len(self._entries)
+        self._entries.append(IndexedName(name, fields, data))
+        
+        postings = self._postings
+        month = _name_month(fields['date'])
+        if month:
+            self._post(postings['month'], month, position)
+            self._post(postings['year'], month[:4], position)
+        for field in self._SCALAR_FIELDS:
+            value = fields.get(field)
+            if value is not None:
+                self._post(postings[field], value, position)
+        for country in fields['naming_countries']:
+            self._post(postings['naming_countries'], country, position)
+        return position
+    
+    def extend(self, items: Iterable[Tuple[str, Optional[Dict]]]) -> int:
+        """
+        Добавляет нейминги пачкой
+        
+        На время загрузки отключается сборщик мусора: при сотнях тысяч
+        новых объектов его проходы занимают почти половину времени.
+        
+        Args:
+            items: пары (название кампании, связанные данные)
+        
+        Returns:
+            Количество добавленных записей
+        """
+        before = len(self._entries)
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for name, data in items:
+                self.add(name, data)
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return len(self._entries) - before
+    
+    @staticmethod
+    def _post(postings: Dict[str, Set[int]], value: str, position: int):
+        key = value.casefold()
+        bucket = postings.get(key)
+        if bucket is None:
+            bucket = postings[key] = set()
+        bucket.add(position)
+    
+    def values(self, field: str) -> List[str]:
+        """Все значения поля в индексе (в нижнем регистре)"""
+        return sorted(self._postings[field])
+    
+    def query(self, **criteria) -> List[IndexedName]:
+        """
+        Ищет нейминги по значениям полей
+        
+        Args:
+            **criteria: поле=значение; список значений означает "любое из"
+                (например, gender=['M', 'MF']); для naming_countries — страна
+        
+        Returns:
+            Подходящие записи в порядке добавления
+        
+        Raises:
+            KeyError: если поле не индексируется
+        """
+        matches = []
+        for field, wanted in criteria.items():
+            if field not in self._postings:
+                raise KeyError(f"Unknown naming field '{field}'")
+            postings = self._postings[field]
+            options = wanted if isinstance(wanted, (list, tuple, set, frozenset)) else [wanted]
+            buckets = [postings.get(str(option).casefold(), _EMPTY) for option in options]
+            # Одно значение — берем множество индекса как есть, без копирования
+            matches.append(buckets[0] if len(buckets) == 1 else set().union(*buckets))
+        
+        if not matches:
+            return list(self._entries)
+        
+        # Пересекаем, начиная с самого короткого списка
+        matches.sort(key=len)
+        result = matches[0]
+        for ids in matches[1:]:
+            if not result:
+                break
+            result = result & ids
+        return [self._entries[position] for position in sorted(result)]
+    
+    @classmethod
+    def from_logs(cls, logs_file: str = 'logs.csv') -> 'CampaignNameIndex':
+        """Строит индекс по logs.csv (строки лога сохраняются в data)"""
+        index = cls()
+        index.extend((row['campaign_name'], row) for row in _iter_log_rows(logs_file))
+        return index
+
 
+def _iter_log_rows(logs_file: str) -> Iterator[Dict]:
+    with open(logs_file, 'r', newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            if row.get('campaign_name'):
+                yield row
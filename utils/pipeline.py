@@ -0,0 +1,134 @@
+"""
+Concurrent execution engine for campaign creation
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+
+def _default_account_key(item: Dict) -> str:
+    return item['account_id']
+
+
+# Маркер "новых задач пока нет" для живых источников (очередь сервиса):
+# итератор отдает IDLE вместо блокировки, и пайплайн продолжает обрабатывать
+# завершения уже запущенных задач
+IDLE = object()
+
+
+class ConcurrentPipeline:
+    """
+    Выполняет независимые задачи параллельно в пуле потоков
+
+    Одна задача (кампания → адсет → лог) выполняется последовательно внутри
+    одного потока, а разные задачи перекрываются по сетевой задержке.
+    Ограничения:
+        - concurrency: максимум задач одновременно
+        - per_account_limit: максимум задач одновременно на один account_id
+
+    Задачи берутся из итератора лениво (с небольшим запасом), поэтому
+    длинный план не нужно материализовать целиком. Итератор может отдавать
+    IDLE, если новых задач пока нет (см. poll_interval).
+    """
+
+    def __init__(
+        self,
+        worker: Callable[[Any], Any],
+        concurrency: int = 1,
+        per_account_limit: Optional[int] = None,
+        account_key: Callable[[Any], str] = _default_account_key,
+        poll_interval: float = 0.2
+    ):
+        """
+        Args:
+            worker: функция, выполняющая одну задачу
+            concurrency: максимум задач одновременно
+            per_account_limit: максимум задач одновременно на один аккаунт
+            account_key: функция, возвращающая аккаунт задачи
+            poll_interval: как часто опрашивать итератор, отдавший IDLE, сек
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be >= 1")
+        if per_account_limit is not None and per_account_limit < 1:
+            raise ValueError("per_account_limit must be >= 1")
+
+        self.worker = worker
+        self.concurrency = concurrency
+        self.per_account_limit = per_account_limit
+        self.account_key = account_key
+        self.poll_interval = poll_interval
+        # Сколько задач держим в буфере сверх выполняющихся
+        self.lookahead = concurrency * 4
+
+    def _account_has_slot(self, in_flight: Dict[str, int], account: str) -> bool:
+        if self.per_account_limit is None:
+            return True
+        return in_flight.get(account, 0) < self.per_account_limit
+
+    def run(self, items: Iterable[Any]) -> Iterator[Tuple[int, Any, Any, Optional[BaseException]]]:
+        """
+        Запускает задачи и отдает результаты по мере завершения
+
+        Args:
+            items: итерируемый набор задач
+
+        Yields:
+            (порядковый номер с 1, задача, результат, исключение или None)
+        """
+        source = iter(enumerate(items, 1))
+        exhausted = False
+        idle = False
+        # account_id → очередь ожидающих задач (порядок аккаунтов сохраняется)
+        pending: "OrderedDict[str, deque]" = OrderedDict()
+        pending_count = 0
+        in_flight_by_account: Dict[str, int] = {}
+        futures = {}
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while True:
+                # Пополняем буфер
+                idle = False
+                while not exhausted and pending_count < self.lookahead:
+                    try:
+                        index, item = next(source)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    if item is IDLE:
+                        idle = True
+                        break
+                    pending.setdefault(self.account_key(item), deque()).append((index, item))
+                    pending_count += 1
+
+                # Запускаем задачи, для которых есть свободные слоты
+                for account in list(pending):
+                    queue = pending[account]
+                    while (
+                        queue
+                        and len(futures) < self.concurrency
+                        and self._account_has_slot(in_flight_by_account, account)
+                    ):
+                        index, item = queue.popleft()
+                        pending_count -= 1
+                        in_flight_by_account[account] = in_flight_by_account.get(account, 0) + 1
+                        futures[executor.submit(self.worker, item)] = (index, item, account)
+                    if not queue:
+                        del pending[account]
+
+                if not futures:
+                    if exhausted and not pending:
+                        return
+                    continue
+
+                # Источник ждет новых задач: просыпаемся периодически, чтобы их забрать
+                done, _ = wait(
+                    futures,
+                    timeout=self.poll_interval if idle else None,
+                    return_when=FIRST_COMPLETED
+                )
+                for future in done:
+                    index, item, account = futures.pop(future)
+                    in_flight_by_account[account] -= 1
+                    error = future.exception()
+                    result = None if error else future.result()
+                    yield index, item, result, error
@@ -0,0 +1,161 @@
+"""
+Utility functions for reading bulk campaign plans from CSV / JSONL streams
+"""
+import csv
+import json
+import re
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+
+# Поля плана (названия колонок CSV / ключей JSONL)
+PLAN_FIELDS = [
+    'project',
+    'tier',
+    'countries',
+    'os',
+    'gender',
+    'age',
+    'opt_model',
+    'event',
+    'bid_strategy',
+    'bid',
+    'budget',
+    'account',
+    'language',
+    'campaign_type',
+    'autor'
+]
+
+# Числовые поля
+_FLOAT_FIELDS = {'bid', 'budget'}
+
+# Разделители стран в одной ячейке: "US,CA", "US;CA", "US CA"
+_COUNTRIES_SPLIT_RE = re.compile(r'[\s,;]+')
+
+
+def _normalize_key(key: str) -> str:
+    """Нормализует имя колонки (например, "Opt model" / "opt-model" → opt_model)"""
+    return re.sub(r'[\s\-]+', '_', key.strip().lower())
+
+
+def normalize_plan_row(row: Dict) -> Dict:
+    """
+    Приводит строку плана к параметрам запуска
+
+    Args:
+        row: строка CSV (все значения — строки) или объект JSONL
+
+    Returns:
+        Словарь с ключами из PLAN_FIELDS (отсутствующие и пустые значения — None)
+
+    Raises:
+        ValueError: если числовое поле не является числом
+    """
+    values = {}
+    for key, value in row.items():
+        if key is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if value == '' or value is None:
+            continue
+        values[_normalize_key(key)] = value
+
+    params = {field: values.get(field) for field in PLAN_FIELDS}
+
+    for field in _FLOAT_FIELDS:
+        if params[field] is not None:
+            try:
+                params[field] = float(params[field])
+            except (TypeError, ValueError):
+                raise ValueError(f"Field '{field}' must be a number, got {params[field]!r}")
+
+    countries = params['countries']
+    if isinstance(countries, str):
+        countries = [code for code in _COUNTRIES_SPLIT_RE.split(countries.upper()) if code]
+    params['countries'] = list(countries) if countries else None
+
+    return params
+
+
+def _iter_lines(stream) -> Iterator[Tuple[int, str]]:
+    for line_no, line in enumerate(stream, 1):
+        if line.strip():
+            yield line_no, line
+
+
+def _read_jsonl(stream) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    for line_no, line in _iter_lines(stream):
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_no, None, f"invalid JSON ({e})"
+            continue
+        if not isinstance(row, dict):
+            yield line_no, None, "expected a JSON object"
+            continue
+        yield line_no, row, None
+
+
+def _read_csv(stream) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    reader = csv.DictReader(stream)
+    for row in reader:
+        if not any((value or '').strip() for value in row.values() if isinstance(value, str)):
+            continue
+        yield reader.line_num, row, None
+
+
+def detect_plan_format(path: str, first_line: Optional[str] = None) -> str:
+    """
+    Определяет формат плана: "jsonl" или "csv"
+
+    По расширению файла, а для потока без расширения (stdin) — по первой строке.
+    """
+    lowered = path.lower()
+    if lowered.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if first_line is not None and first_line.lstrip().startswith('{'):
+        return 'jsonl'
+    return 'csv'
+
+
+def read_plan(
+    path: str,
+    plan_format: Optional[str] = None
+) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """
+    Читает план построчно (файл не загружается в память целиком)
+
+    Args:
+        path: путь к CSV / JSONL файлу или "-" для stdin
+        plan_format: "csv" или "jsonl" (по умолчанию определяется автоматически)
+
+    Yields:
+        (номер строки, исходная строка плана или None, текст ошибки или None);
+        параметры приводятся через normalize_plan_row, поэтому ошибка одной
+        строки не останавливает чтение остальных
+    """
+    stream = sys.stdin if path == '-' else open(path, 'r', encoding='utf-8', newline='')
+    try:
+        if plan_format is None:
+            # Для stdin смотрим первую строку и возвращаем ее в поток
+            first_line = stream.readline()
+            plan_format = detect_plan_format(path, first_line)
+            lines = _chain_first(first_line, stream)
+        else:
+            lines = stream
+
+        reader = _read_jsonl if plan_format == 'jsonl' else _read_csv
+        yield from reader(lines)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def _chain_first(first_line: str, stream) -> Iterator[str]:
+    if first_line:
+        yield first_line
+    yield from stream
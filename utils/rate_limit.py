@@ -0,0 +1,191 @@
+"""
+Adaptive rate-limit scheduler driven by Graph API usage headers
+"""
+import json
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+
+# Ключ для лимитов уровня приложения (X-App-Usage)
+APP_KEY = '__app__'
+
+
+def _load_header(headers: Mapping[str, str], name: str):
+    """Читает JSON-заголовок (без учета регистра имени)"""
+    for key, value in headers.items():
+        if key.lower() == name.lower():
+            try:
+                return json.loads(value)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _max_pct(values: Dict, fields=('call_count', 'total_cputime', 'total_time')) -> float:
+    return max((float(values.get(field) or 0) for field in fields), default=0.0)
+
+
+def parse_usage_headers(headers: Mapping[str, str]) -> Dict[str, Optional[float]]:
+    """
+    Разбирает заголовки использования лимитов Graph API
+
+    Args:
+        headers: заголовки ответа
+
+    Returns:
+        Словарь (значения None, если заголовка нет):
+            - app_pct: загрузка лимита приложения, % (X-App-Usage)
+            - account_pct: загрузка лимита аккаунта, % (X-Ad-Account-Usage,
+              X-Business-Use-Case-Usage — берется максимум)
+            - regain_seconds: через сколько секунд лимит восстановится
+    """
+    result = {'app_pct': None, 'account_pct': None, 'regain_seconds': None}
+
+    app_usage = _load_header(headers, 'X-App-Usage')
+    if isinstance(app_usage, dict):
+        result['app_pct'] = _max_pct(app_usage)
+
+    account_pcts = []
+    regain = []
+
+    account_usage = _load_header(headers, 'X-Ad-Account-Usage')
+    if isinstance(account_usage, dict):
+        account_pcts.append(float(account_usage.get('acc_id_util_pct') or 0))
+        if account_usage.get('reset_time_duration'):
+            regain.append(float(account_usage['reset_time_duration']))
+
+    business_usage = _load_header(headers, 'X-Business-Use-Case-Usage')
+    if isinstance(business_usage, dict):
+        for entries in business_usage.values():
+            for entry in entries or []:
+                account_pcts.append(_max_pct(entry))
+                if entry.get('estimated_time_to_regain_access'):
+                    # В заголовке — минуты
+                    regain.append(float(entry['estimated_time_to_regain_access']) * 60)
+
+    if account_pcts:
+        result['account_pct'] = max(account_pcts)
+    if regain:
+        result['regain_seconds'] = max(regain)
+    return result
+
+
+class UsageScheduler:
+    """
+    Планировщик отправки запросов по оценке оставшегося лимита
+
+    После каждого ответа обновляется загрузка лимитов приложения и аккаунта.
+    Перед каждым запросом acquire() решает, сколько подождать:
+        - загрузка ниже slow_threshold → без паузы
+        - между slow_threshold и pause_threshold → пауза растет линейно до max_delay
+        - выше pause_threshold → ждем восстановления лимита (regain / default_pause)
+
+    Так отправка замедляется до того, как API начнет возвращать ошибки
+    троттлинга.
+    """
+
+    def __init__(
+        self,
+        slow_threshold: float = 75.0,
+        pause_threshold: float = 95.0,
+        max_delay: float = 5.0,
+        default_pause: float = 60.0,
+        clock=time.monotonic,
+        sleep=time.sleep
+    ):
+        """
+        Args:
+            slow_threshold: загрузка лимита (%), с которой начинается замедление
+            pause_threshold: загрузка лимита (%), с которой отправка приостанавливается
+            max_delay: максимальная пауза между запросами в зоне замедления, сек
+            default_pause: пауза, если API не сообщил время восстановления, сек
+            clock: источник времени (для тестов)
+            sleep: функция ожидания (для тестов)
+        """
+        self.slow_threshold = slow_threshold
+        self.pause_threshold = pause_threshold
+        self.max_delay = max_delay
+        self.default_pause = default_pause
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        # Ключ (account_id или APP_KEY) → загрузка, %
+        self._usage: Dict[str, float] = {}
+        # Ключ → момент, до которого отправка приостановлена
+        self._paused_until: Dict[str, float] = {}
+
+    def _set_usage(self, key: str, pct: float, regain_seconds: Optional[float]):
+        self._usage[key] = pct
+        if pct >= self.pause_threshold:
+            pause = regain_seconds if regain_seconds else self.default_pause
+            self._paused_until[key] = max(self._paused_until.get(key, 0), self._clock() + pause)
+
+    def observe(self, account_id: Optional[str], headers: Mapping[str, str]):
+        """
+        Обновляет оценку лимитов по заголовкам ответа
+
+        Args:
+            account_id: ID аккаунта запроса (None, если запрос не к аккаунту)
+            headers: заголовки ответа
+        """
+        usage = parse_usage_headers(headers)
+        with self._lock:
+            if usage['app_pct'] is not None:
+                self._set_usage(APP_KEY, usage['app_pct'], usage['regain_seconds'])
+            if account_id and usage['account_pct'] is not None:
+                self._set_usage(str(account_id), usage['account_pct'], usage['regain_seconds'])
+
+    def observe_throttled(self, account_id: Optional[str], retry_after: Optional[float] = None):
+        """Отмечает ошибку троттлинга: лимит считается исчерпанным"""
+        with self._lock:
+            self._set_usage(str(account_id) if account_id else APP_KEY, 100.0, retry_after)
+
+    def headroom(self, account_id: Optional[str] = None) -> float:
+        """
+        Оставшийся лимит, % (минимум из лимитов приложения и аккаунта)
+
+        Args:
+            account_id: ID аккаунта (None — только лимит приложения)
+        """
+        with self._lock:
+            return 100.0 - self._current_usage(account_id)
+
+    def _current_usage(self, account_id: Optional[str]) -> float:
+        """Текущая загрузка с учетом истекших пауз (вызывается под _lock)"""
+        now = self._clock()
+        keys = [APP_KEY] + ([str(account_id)] if account_id else [])
+        usage = 0.0
+        for key in keys:
+            paused_until = self._paused_until.get(key)
+            if paused_until is not None and now >= paused_until:
+                # Пауза закончилась: оценка устарела, пропускаем запросы в режиме замедления
+                del self._paused_until[key]
+                self._usage[key] = min(self._usage.get(key, 0.0), self.slow_threshold)
+            usage = max(usage, self._usage.get(key, 0.0))
+        return usage
+
+    def delay_for(self, account_id: Optional[str] = None) -> float:
+        """Сколько секунд подождать перед следующим запросом к аккаунту"""
+        with self._lock:
+            usage = self._current_usage(account_id)
+            now = self._clock()
+            keys = [APP_KEY] + ([str(account_id)] if account_id else [])
+            paused = [self._paused_until[key] - now for key in keys if key in self._paused_until]
+        if paused:
+            return max(paused)
+        if usage <= self.slow_threshold:
+            return 0.0
+        span = max(self.pause_threshold - self.slow_threshold, 1e-9)
+        return self.max_delay * min(1.0, (usage - self.slow_threshold) / span)
+
+    def acquire(self, account_id: Optional[str] = None):
+        """Ждет, пока по оценке лимита можно отправить запрос"""
+        delay = self.delay_for(account_id)
+        if delay > 0:
+            self._sleep(delay)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Текущая оценка загрузки по всем ключам"""
+        with self._lock:
+            return dict(self._usage)
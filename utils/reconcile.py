@@ -0,0 +1,308 @@
+"""
+Utility functions for reconciling the campaign ledger against live ad account state
+"""
+import json
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence
+
+from utils.ledger import Ledger
+
+if TYPE_CHECKING:
+    from utils.http_client import GraphClient
+
+
+# Наибольший размер страницы списков Graph API; при ошибке "reduce the amount of data" уменьшается вдвое
+LIST_PAGE_LIMIT = 5000
+MIN_PAGE_LIMIT = 25
+
+# Минимальная проекция полей: только то, что нужно для сверки
+CAMPAIGN_FIELDS = ['id', 'name', 'effective_status', 'updated_time']
+ADSET_FIELDS = ['id', 'name', 'campaign_id', 'effective_status', 'updated_time', 'daily_budget', 'bid_amount']
+
+# Все статусы, включая удаленные: без фильтра Graph API не отдает DELETED / ARCHIVED
+LIST_STATUSES = {
+    'campaign': ['ACTIVE', 'PAUSED', 'DELETED', 'ARCHIVED', 'IN_PROCESS', 'WITH_ISSUES'],
+    'adset': ['ACTIVE', 'PAUSED', 'DELETED', 'ARCHIVED', 'IN_PROCESS', 'WITH_ISSUES', 'CAMPAIGN_PAUSED']
+}
+REMOVED_STATUSES = {'DELETED', 'ARCHIVED'}
+
+# Типы расхождений
+FINDING_TYPES = {
+    'orphan_campaign': 'campaign in the account, not in the ledger',
+    'orphan_adset': 'ad set in the account, not in the ledger',
+    'missing_campaign': 'campaign in the ledger, not found in the account',
+    'missing_adset': 'campaign found, its ad set is not',
+    'removed_campaign': 'campaign deleted or archived in the account',
+    'removed_adset': 'ad set deleted or archived in the account',
+    'id_drift': 'campaign name in the ledger under a different ID',
+    'name_drift': 'renamed in the account',
+    'parent_drift': 'ad set belongs to a different campaign than in the ledger',
+    'budget_drift': 'daily budget differs from the ledger spec',
+    'bid_drift': 'bid amount differs from the ledger spec'
+}
+
+
+def _error_code(response) -> Optional[int]:
+    try:
+        return response.json()['error']['code']
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _updated_after(watermark: str) -> int:
+    """Отметка updated_time → unix time для filtering (на секунду раньше: изменения в ту же секунду не теряются)"""
+    return int(datetime.strptime(watermark, '%Y-%m-%dT%H:%M:%S%z').timestamp()) - 1
+
+
+def iter_account_pages(
+    client: 'GraphClient',
+    account_id: str,
+    kind: str,
+    fields: Sequence[str],
+    updated_since: Optional[str] = None,
+    page_size: int = LIST_PAGE_LIMIT
+) -> Iterator[List[Dict]]:
+    """
+    Постранично читает кампании или адсеты аккаунта (страницы отдаются по мере получения)
+
+    Args:
+        client: HTTP клиент
+        account_id: ID рекламного аккаунта (без префикса "act_")
+        kind: campaign или adset
+        fields: запрашиваемые поля (fields=)
+        updated_since: только объекты с updated_time позже отметки (ISO, как в ответах API)
+        page_size: размер страницы (limit)
+
+    Returns:
+        Итератор страниц (списков объектов)
+
+    Raises:
+        Exception: при ошибке запроса
+    """
+    filtering = [{'field': 'effective_status', 'operator': 'IN', 'value': LIST_STATUSES[kind]}]
+    if updated_since:
+        filtering.append({'field': 'updated_time', 'operator': 'GREATER_THAN', 'value': _updated_after(updated_since)})
+
+    params = {
+        'fields': ','.join(fields),
+        'limit': page_size,
+        'filtering': json.dumps(filtering)
+    }
+    path = f"act_{account_id}/{kind}s"
+    while True:
+        response = client.get(path, params=params)
+        if response.status_code != 200:
+            # Code 1: "Please reduce the amount of data you're asking for"
+            if _error_code(response) == 1 and params['limit'] > MIN_PAGE_LIMIT:
+                params['limit'] = max(MIN_PAGE_LIMIT, params['limit'] // 2)
+                continue
+            raise Exception(f"Error listing {kind}s of act_{account_id}: {response.status_code} - {response.text}")
+
+        body = response.json()
+        yield body.get('data', [])
+
+        paging = body.get('paging') or {}
+        if not paging.get('next'):
+            return
+        params['after'] = paging['cursors']['after']
+
+
+def _finding(kind: str, account_id: str, obj: Dict, detail: Optional[str] = None, **extra) -> Dict:
+    finding = {
+        'type': kind,
+        'account_id': account_id,
+        'id': obj.get('id'),
+        'name': obj.get('name'),
+        'detail': detail
+    }
+    finding.update(extra)
+    return finding
+
+
+def _cents(value) -> Optional[int]:
+    """Сумма из спецификации (в валюте) → центы, как в ответах API"""
+    if value in (None, ''):
+        return None
+    return int(round(float(value) * 100))
+
+
+def _int(value) -> Optional[int]:
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+class Reconciler:
+    """
+    Сверяет журнал SQLite с кампаниями и адсетами в рекламных аккаунтах
+
+    Объекты читаются страницами с минимальной проекцией полей; каждая
+    страница сверяется с журналом поиском по индексам (ID, затем название),
+    найденные ID отмечаются во временных таблицах SQLite. Поэтому память не
+    растет с числом объектов в аккаунте. Отметка updated_time сохраняется в
+    журнале после каждого аккаунта: инкрементальная сверка читает только
+    объекты, измененные с прошлого раза.
+
+    Пример:
+        reconciler = Reconciler(get_ledger('ledger.db'), client)
+        for finding in reconciler.run({'account_1': '1828845960619189'}):
+            print(finding['type'], finding['id'], finding['name'])
+    """
+
+    def __init__(
+        self,
+        ledger: Ledger,
+        client: 'GraphClient',
+        incremental: bool = False,
+        page_size: int = LIST_PAGE_LIMIT
+    ):
+        """
+        Args:
+            ledger: журнал созданных кампаний
+            client: HTTP клиент
+            incremental: читать только объекты, измененные после прошлой сверки
+                (удаленные кампании видны по статусу; пропавшие бесследно — только при полной сверке)
+            page_size: размер страницы списков
+        """
+        self.ledger = ledger
+        self.client = client
+        self.incremental = incremental
+        self.page_size = page_size
+        # Сколько объектов прочитано по аккаунтам: account_id → {campaign, adset}
+        self.listed: Dict[str, Dict[str, int]] = {}
+        self.counts: Dict[str, int] = dict.fromkeys(FINDING_TYPES, 0)
+
+    def run(self, accounts: Dict[str, str], include_unattributed: bool = False) -> Iterator[Dict]:
+        """
+        Сверяет аккаунты (расхождения отдаются по мере нахождения)
+
+        Args:
+            accounts: название аккаунта → ID
+            include_unattributed: записи журнала без account_id (перенесенные из
+                logs.csv и не найденные ни в одном аккаунте) считать пропавшими;
+                имеет смысл, только если сверяются все аккаунты
+
+        Returns:
+            Итератор расхождений (type, account_id, id, name, detail, ...)
+        """
+        self.ledger.reset_seen()
+        for account_id in accounts.values():
+            account_id = str(account_id)
+            self.listed[account_id] = {'campaign': 0, 'adset': 0}
+            yield from self._count(self._reconcile_kind(account_id, 'campaign', CAMPAIGN_FIELDS, self._check_campaigns))
+            yield from self._count(self._reconcile_kind(account_id, 'adset', ADSET_FIELDS, self._check_adsets))
+            if not self.incremental:
+                yield from self._count(self._check_missing([account_id]))
+
+        if include_unattributed and not self.incremental:
+            yield from self._count(self._check_missing([], include_unattributed=True))
+
+    def _count(self, findings: Iterator[Dict]) -> Iterator[Dict]:
+        for finding in findings:
+            self.counts[finding['type']] += 1
+            yield finding
+
+    def _reconcile_kind(self, account_id, kind, fields, check):
+        watermark = self.ledger.get_watermark(account_id, kind) if self.incremental else None
+        newest = watermark
+        for page in iter_account_pages(self.client, account_id, kind, fields, watermark, self.page_size):
+            self.listed[account_id][kind] += len(page)
+            yield from check(account_id, page)
+            self.ledger.mark_seen(kind, (obj['id'] for obj in page))
+            page_newest = max((obj.get('updated_time') or '' for obj in page), default='')
+            if page_newest and (newest is None or page_newest > newest):
+                newest = page_newest
+        # Отметка сохраняется только после полного прохода
+        if newest:
+            self.ledger.set_watermark(account_id, kind, newest)
+
+    def _check_campaigns(self, account_id: str, page: List[Dict]) -> Iterator[Dict]:
+        by_id = self.ledger.find_by('campaign_id', (obj['id'] for obj in page))
+        unmatched = [obj for obj in page if obj['id'] not in by_id]
+        by_name = self.ledger.find_by('campaign_name', (obj.get('name') for obj in unmatched)) if unmatched else {}
+
+        # Записи из logs.csv получают account_id при первой встрече
+        unattributed = [obj['id'] for obj in page if any(row['account_id'] is None for row in by_id.get(obj['id'], []))]
+        if unattributed:
+            self.ledger.set_account_id(unattributed, account_id)
+
+        for obj in page:
+            rows = by_id.get(obj['id'])
+            removed = obj.get('effective_status') in REMOVED_STATUSES
+            if not rows:
+                if removed:
+                    continue
+                named = by_name.get(obj.get('name'))
+                if named:
+                    ledger_ids = ', '.join(row['campaign_id'] or '-' for row in named)
+                    yield _finding('id_drift', account_id, obj, f"ledger ID {ledger_ids}")
+                else:
+                    yield _finding('orphan_campaign', account_id, obj)
+                continue
+
+            row = rows[0]
+            if removed:
+                yield _finding('removed_campaign', account_id, obj, obj['effective_status'])
+            elif obj.get('name') != row['campaign_name']:
+                yield _finding('name_drift', account_id, obj, f"ledger name {row['campaign_name']}")
+
+    def _check_adsets(self, account_id: str, page: List[Dict]) -> Iterator[Dict]:
+        by_id = self.ledger.find_by('adset_id', (obj['id'] for obj in page))
+        unmatched = [obj for obj in page if obj['id'] not in by_id]
+        parents = self.ledger.find_by('campaign_id', (obj.get('campaign_id') for obj in unmatched)) if unmatched else {}
+
+        for obj in page:
+            rows = by_id.get(obj['id'])
+            removed = obj.get('effective_status') in REMOVED_STATUSES
+            if not rows:
+                if not removed:
+                    managed = obj.get('campaign_id') in parents
+                    yield _finding(
+                        'orphan_adset',
+                        account_id,
+                        obj,
+                        f"in ledger campaign {obj.get('campaign_id')}" if managed else None,
+                        campaign_id=obj.get('campaign_id')
+                    )
+                continue
+
+            row = rows[0]
+            if removed:
+                yield _finding('removed_adset', account_id, obj, obj['effective_status'])
+                continue
+            if obj.get('campaign_id') and obj['campaign_id'] != row['campaign_id']:
+                yield _finding('parent_drift', account_id, obj,
+                               f"campaign {obj['campaign_id']}, ledger {row['campaign_id']}")
+            if obj.get('name') != row['campaign_name']:
+                yield _finding('name_drift', account_id, obj, f"ledger name {row['campaign_name']}")
+
+            params = (row['spec'] or {}).get('adset_params') or {}
+            expected = _cents(params.get('daily_budget'))
+            actual = _int(obj.get('daily_budget'))
+            if expected is not None and actual is not None and actual != expected:
+                yield _finding('budget_drift', account_id, obj, f"{actual} cents, ledger {expected}")
+            if params.get('bid_strategy') == 'LOWEST_COST_WITH_BID_CAP':
+                expected = _cents(params.get('bid_amount'))
+                actual = _int(obj.get('bid_amount'))
+                if expected is not None and actual is not None and actual != expected:
+                    yield _finding('bid_drift', account_id, obj, f"{actual} cents, ledger {expected}")
+
+    def _check_missing(self, account_ids: List[str], include_unattributed: bool = False) -> Iterator[Dict]:
+        for row in self.ledger.iter_unseen(account_ids, include_unattributed):
+            account_id = row['account_id'] or '-'
+            if not row['campaign_seen']:
+                yield _finding(
+                    'missing_campaign',
+                    account_id,
+                    {'id': row['campaign_id'], 'name': row['campaign_name']},
+                    f"created {row['created_at']}",
+                    adset_id=row['adset_id']
+                )
+            else:
+                yield _finding(
+                    'missing_adset',
+                    account_id,
+                    {'id': row['adset_id'], 'name': row['campaign_name']},
+                    f"campaign {row['campaign_id']}",
+                    campaign_id=row['campaign_id']
+                )
@@ -0,0 +1,94 @@
+"""
+Utility functions for spreading campaigns across a project's ad accounts by rate-limit headroom
+"""
+import threading
+from typing import Dict, Mapping, Optional, Sequence
+
+from utils.rate_limit import UsageScheduler
+
+
+class AccountBalancer:
+    """
+    Выбирает аккаунт для очередной кампании
+
+    Вес аккаунта — оставшийся лимит (headroom, %) по оценке планировщика
+    лимитов, то есть по заголовкам X-*-Usage последних ответов. Аккаунты
+    выбираются по smooth weighted round-robin: при равных весах — по кругу,
+    иначе пропорционально весам, без серий подряд на один аккаунт.
+    Аккаунт с исчерпанным лимитом (пауза после троттлинга) не выбирается,
+    пока у других есть запас.
+
+    Пример:
+        balancer = AccountBalancer(registry['accounts'], client.scheduler)
+        account_name = balancer.choose(project['account_names'])
+    """
+
+    def __init__(self, accounts: Mapping[str, str], scheduler: Optional[UsageScheduler] = None):
+        """
+        Args:
+            accounts: название аккаунта → ID (accounts.json)
+            scheduler: планировщик лимитов общего клиента (None — равные веса)
+        """
+        self.accounts = accounts
+        self.scheduler = scheduler
+        self._lock = threading.Lock()
+        # Текущие веса smooth round-robin (название аккаунта → вес)
+        self._current: Dict[str, float] = {}
+        self._assigned: Dict[str, int] = {}
+
+    def weights(self, names: Sequence[str]) -> Dict[str, float]:
+        """
+        Веса аккаунтов (оставшийся лимит, %)
+
+        Args:
+            names: названия аккаунтов
+
+        Returns:
+            Название → вес; если лимит исчерпан у всех, веса равны
+        """
+        if self.scheduler is None:
+            return {name: 1.0 for name in names}
+        weights = {
+            name: max(self.scheduler.headroom(str(self.accounts[name])), 0.0)
+            for name in names
+        }
+        if not any(weights.values()):
+            return {name: 1.0 for name in names}
+        return weights
+
+    def choose(self, names: Sequence[str]) -> str:
+        """
+        Выбирает аккаунт из списка
+
+        Args:
+            names: названия аккаунтов (пул проекта)
+
+        Returns:
+            Название выбранного аккаунта
+
+        Raises:
+            ValueError: если список пуст
+        """
+        if not names:
+            raise ValueError("No accounts to choose from")
+        if len(names) == 1:
+            chosen = names[0]
+        else:
+            weights = self.weights(names)
+            total = sum(weights.values())
+            with self._lock:
+                chosen = None
+                for name in names:
+                    self._current[name] = self._current.get(name, 0.0) + weights[name]
+                    if weights[name] and (chosen is None or self._current[name] > self._current[chosen]):
+                        chosen = name
+                self._current[chosen] -= total
+
+        with self._lock:
+            self._assigned[chosen] = self._assigned.get(chosen, 0) + 1
+        return chosen
+
+    def assigned(self) -> Dict[str, int]:
+        """Сколько кампаний назначено каждому аккаунту"""
+        with self._lock:
+            return dict(self._assigned)
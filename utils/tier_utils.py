@@ -1,15 +1,113 @@
 """
 Utility functions for working with tiers and countries
 """
-import json
-import os
+import time
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, FrozenSet, Optional, Tuple
+
+from utils.config_loader import registry
+from utils.country_set import cover_mask, get_country_universe
 
 
 def load_tiers():
-    """Загружает словарь tiers.json"""
-    tiers_file = os.path.join(os.path.dirname(__file__), '..', 'dictionares', 'tiers.json')
-    with open(tiers_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """Загружает словарь tiers.json (через общий реестр словарей)"""
+    return registry['tiers']
+
+
+class TierIndex(NamedTuple):
+    """
+    Неизменяемый индекс тиров
+    
+    Attributes:
+        country_to_tier: ISO код страны → название тира
+        tier_to_countries: название тира → frozenset ISO кодов
+        tier_country_list: название тира → кортеж ISO кодов в порядке tiers.json
+    """
+    country_to_tier: Mapping[str, str]
+    tier_to_countries: Mapping[str, FrozenSet[str]]
+    tier_country_list: Mapping[str, Tuple[str, ...]]
+
+
+# Как часто индекс сверяется с tiers.json на диске (stat через реестр), сек:
+# тир ищется для каждой кампании, а словарь меняется редко
+TIER_INDEX_RECHECK_SECONDS = 1.0
+
+# Индекс строится один раз на процесс и перестраивается,
+# только если реестр перечитал tiers.json
+_tier_index: Optional[TierIndex] = None
+_tier_index_source = None
+# Когда индекс последний раз сверялся с файлом, и поколение реестра на тот момент
+_tier_index_checked = 0.0
+_tier_index_generation = -1
+
+
+def extract_country_code(entry):
+    """
+    Извлекает ISO код страны из записи tiers.json
+    
+    Args:
+        entry: строка с кодом ("US") или объект {"Country": "US", "Human readable Country": ...}
+    
+    Returns:
+        ISO код страны
+    """
+    if isinstance(entry, dict):
+        return entry['Country']
+    return entry
+
+
+def build_tier_index(tiers_data):
+    """
+    Строит индекс страна → тир и тир → страны
+    
+    Args:
+        tiers_data: словарь тиров из tiers.json
+    
+    Returns:
+        TierIndex
+    """
+    country_to_tier = {}
+    tier_country_list = {}
+    for tier, entries in tiers_data.items():
+        codes = tuple(extract_country_code(entry) for entry in entries)
+        tier_country_list[tier] = codes
+        for code in codes:
+            # Как и при линейном поиске, выигрывает первый тир в файле
+            country_to_tier.setdefault(code, tier)
+    
+    return TierIndex(
+        country_to_tier=MappingProxyType(country_to_tier),
+        tier_to_countries=MappingProxyType(
+            {tier: frozenset(codes) for tier, codes in tier_country_list.items()}
+        ),
+        tier_country_list=MappingProxyType(tier_country_list),
+    )
+
+
+def get_tier_index():
+    """
+    Возвращает индекс тиров (строится при первом обращении)
+    
+    tiers.json сверяется с диском не чаще раза в TIER_INDEX_RECHECK_SECONDS
+    и сразу после сброса кэша реестра (registry.invalidate / clear_cache)
+    """
+    global _tier_index, _tier_index_source, _tier_index_checked, _tier_index_generation
+    now = time.monotonic()
+    if (
+        _tier_index is not None
+        and _tier_index_generation == registry.generation
+        and now - _tier_index_checked < TIER_INDEX_RECHECK_SECONDS
+    ):
+        return _tier_index
+    
+    generation = registry.generation
+    tiers_data = load_tiers()
+    if _tier_index is None or tiers_data is not _tier_index_source:
+        _tier_index = build_tier_index(tiers_data)
+        _tier_index_source = tiers_data
+    _tier_index_checked = now
+    _tier_index_generation = generation
+    return _tier_index
 
 
 def get_tier_for_country(country_code):
@@ -22,11 +120,7 @@ def get_tier_for_country(country_code):
     Returns:
         Название тира или None если страна не найдена
     """
-    tiers = load_tiers()
-    for tier, countries in tiers.items():
-        if country_code in countries:
-            return tier
-    return None
+    return get_tier_index().country_to_tier.get(country_code)
 
 
 def get_tier_for_countries(country_codes):
@@ -44,35 +138,57 @@ def get_tier_for_countries(country_codes):
     if not country_codes:
         return None
     
-    tiers = load_tiers()
-    tier_counts = {}
+    country_to_tier = get_tier_index().country_to_tier
+    found_tier = None
     
     for country in country_codes:
-        tier = get_tier_for_country(country)
+        tier = country_to_tier.get(country)
         if tier is None:
             return None  # Страна не найдена
-        tier_counts[tier] = tier_counts.get(tier, 0) + 1
-    
-    # Если все страны из одного тира
-    if len(tier_counts) == 1:
-        return list(tier_counts.keys())[0]
+        if found_tier is None:
+            found_tier = tier
+        elif tier != found_tier:
+            return None  # Страны из разных тиров
     
-    # Страны из разных тиров
-    return None
+    # Все страны из одного тира
+    return found_tier
 
 
-def get_all_countries_for_tier(tier_name):
+def get_all_countries_for_tier(tier_name, excluded_countries=()):
     """
     Получает все страны для указанного тира
     
     Args:
         tier_name: название тира (например, "LatAm")
+        excluded_countries: страны, которые нужно убрать (например, запрещенные)
     
     Returns:
-        Список ISO кодов стран или пустой список
+        Список ISO кодов стран в порядке tiers.json или пустой список
     """
-    tiers = load_tiers()
-    return tiers.get(tier_name, [])
+    countries = get_tier_index().tier_country_list.get(tier_name, ())
+    if not excluded_countries:
+        return list(countries)
+    
+    universe = get_country_universe()
+    excluded = universe.table.mask(excluded_countries)
+    if not universe.tier_masks.get(tier_name, 0) & excluded:
+        return list(countries)
+    return universe.table.filter(countries, excluded)
+
+
+def filter_countries(countries, excluded_countries):
+    """
+    Убирает страны из списка (проверка вхождения по битсету, порядок сохраняется)
+    
+    Args:
+        countries: список ISO кодов стран
+        excluded_countries: страны, которые нужно убрать
+    
+    Returns:
+        Отфильтрованный список
+    """
+    table = get_country_universe().table
+    return table.filter(countries, table.mask(excluded_countries), table.unknown(excluded_countries))
 
 
 def format_tier_for_naming(tier_name):
@@ -93,44 +209,61 @@ def format_tier_for_naming(tier_name):
     return mapping.get(tier_name, tier_name)
 
 
-def get_all_worldwide_countries(tiers_data=None):
+def get_all_worldwide_countries(tiers_data=None, excluded_countries=()):
     """
     Собирает все страны из всех тиров для таргетинга на весь мир
     
     Args:
-        tiers_data: словарь тиров из tiers.json (если None, загружается автоматически)
+        tiers_data: словарь тиров из tiers.json (если None, берется из реестра)
+        excluded_countries: страны, которые нужно убрать (например, запрещенные)
     
     Returns:
         Отсортированный список всех стран из всех тиров
     """
-    if tiers_data is None:
-        tiers_data = load_tiers()
+    if tiers_data is None or tiers_data is load_tiers():
+        # Объединение тиров посчитано при загрузке словаря: остается одна разность битсетов
+        universe = get_country_universe()
+        return universe.table.codes_of(universe.worldwide & ~universe.table.mask(excluded_countries))
     
-    all_countries = []
+    all_countries = set()
     for tier_name, countries in tiers_data.items():
-        all_countries.extend(countries)
-    # Убираем дубликаты и сортируем
-    return sorted(list(set(all_countries)))
+        all_countries.update(extract_country_code(entry) for entry in countries)
+    all_countries.difference_update(excluded_countries)
+    # Сортируем уникальные коды
+    return sorted(all_countries)
 
 
-def get_country_groups_for_tier(tier_raw):
+def get_geo_cover_for_tier(tier_raw, excluded_countries=()):
     """
-    Возвращает список country_group keys для указанного тира (если есть маппинг).
+    Подбирает country_groups, точно покрывающие страны тира (см. utils/country_set.py)
+    
+    Args:
+        tier_raw: название тира из tiers.json (например, "Africa", "LatAm")
+        excluded_countries: страны, которые исключаются в любом случае (запрещенные)
+    
+    Returns:
+        GeoCover: country_groups, страны поштучно и исключенные страны
+    """
+    universe = get_country_universe()
+    excluded = universe.table.mask(excluded_countries)
+    target = universe.tier_masks.get(tier_raw, 0) & ~excluded
+    return cover_mask(target, universe.table, universe.groups, excluded)
+
 
+def get_country_groups_for_tier(tier_raw):
+    """
+    Возвращает список country_group keys для указанного тира.
+    
+    Группы подбираются по country_groups.json; страны тира, не покрытые
+    группами, и лишние страны групп см. в get_geo_cover_for_tier.
+    
     Args:
         tier_raw: название тира из tiers.json (например, "Africa", "Asia", "Europe", "LatAm")
-
+    
     Returns:
-        Список ключей из country_groups.json или None, если для данного тира не используется country_group.
+        Список ключей из country_groups.json или None, если группы не выгодны для данного тира.
     """
-    mapping = {
-        "Africa": ["africa"],
-        "Asia": ["asia"],
-        "Europe": ["europe"],
-        # Для LatAm используем комбинацию региональных групп
-        "LatAm": ["south_america", "central_america", "caribbean"],
-    }
-    return mapping.get(tier_raw)
+    return get_geo_cover_for_tier(tier_raw).country_groups or None
 
 
 def determine_tier_and_countries(user_countries, user_tier=None):
@@ -148,7 +281,7 @@ def determine_tier_and_countries(user_countries, user_tier=None):
         - countries: список стран для таргетинга
         - naming_countries: список стран для нейминга (может быть пустым)
     """
-    tiers = load_tiers()
+    index = get_tier_index()
     
     # Если указан тир напрямую
     if user_tier:
@@ -161,11 +294,11 @@ def determine_tier_and_countries(user_countries, user_tier=None):
         }
         tier_raw = tier_mapping.get(user_tier, user_tier)
         
-        if tier_raw in tiers:
+        if tier_raw in index.tier_country_list:
             return {
                 "tier": format_tier_for_naming(tier_raw),
                 "tier_raw": tier_raw,
-                "countries": tiers[tier_raw],  # Все страны тира
+                "countries": list(index.tier_country_list[tier_raw]),  # Все страны тира
                 "naming_countries": []  # В нейминге не перечисляем
             }
     
@@ -174,7 +307,7 @@ def determine_tier_and_countries(user_countries, user_tier=None):
         # Определяем тиры для всех стран
         country_tiers = {}
         for country in user_countries:
-            tier = get_tier_for_country(country)
+            tier = index.country_to_tier.get(country)
             if tier:
                 country_tiers[tier] = country_tiers.get(tier, 0) + 1
         